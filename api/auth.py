@@ -1,7 +1,12 @@
 import datetime
+import hashlib
 import json
+import os
+import signal
+import threading
+import time
 from functools import wraps
-from flask import request, abort, Response, jsonify
+from flask import request, abort, Response, jsonify, g
 from typing import Callable
 
 
@@ -10,9 +15,82 @@ from typing import Callable
 
 import jwt
 
-from api.config import CREDENTIALS_FILE
+from api.cache import ExpiringLRUCache
+from api.config import CREDENTIALS_FILE, CREDENTIALS_CHECK_INTERVAL, TOKEN_CACHE_SIZE
 from api.main import app
-from api.utils import serialize_datetime
+from api.streaming import TOKEN_HEADER, to_json
+
+
+class CredentialsProvider:
+    """
+    Keeps the content of the credentials file in memory, so the tokens can be generated and verified without reading
+    the file. The file is read again when its modification time changes (checked at most once every check_interval
+    seconds) or when the worker receives the signal SIGUSR2, thus the keys can be rotated without restarting the API.
+    """
+
+    def __init__(self, path: str, check_interval: float):
+        """
+        :param path: the credentials file, a json object.
+        :param check_interval: the minimum time, in seconds, between two checks of the modification time of the file.
+        """
+        self._path = path
+        self._check_interval = check_interval
+        self._credentials = None
+        self._mtime = None
+        self._checked = 0
+        self._stale = False
+        self._version = 0
+        self._lock = threading.Lock()
+
+    def _refresh(self):
+        """
+        Reload the file if it has changed. It must be called with the lock acquired.
+        :return:
+        """
+        now = time.monotonic()
+        if self._credentials is None or self._stale or now - self._checked >= self._check_interval:
+            self._checked = now
+            mtime = os.stat(self._path).st_mtime_ns
+            if self._credentials is None or self._stale or mtime != self._mtime:
+                with open(self._path, "r") as fin:
+                    self._credentials = json.load(fin)
+                self._mtime = mtime
+                self._stale = False
+                self._version += 1
+
+    def get(self, field):
+        """
+        Get a credential, reloading the file if it has changed.
+        :param field: the credential desired
+        :return: the value if exists
+        """
+        with self._lock:
+            self._refresh()
+            credentials = self._credentials
+        return credentials[field]
+
+    def version(self) -> int:
+        """
+        :return: a number that changes every time the credentials are reloaded, the file is checked as in get.
+        """
+        with self._lock:
+            self._refresh()
+            return self._version
+
+    def invalidate(self, *args):
+        """
+        Force the reload of the file the next time a credential is requested. It can be used as a signal handler, so
+        it doesn't read the file itself.
+        :return:
+        """
+        self._stale = True
+
+
+credentials_provider = CredentialsProvider(CREDENTIALS_FILE, CREDENTIALS_CHECK_INTERVAL)
+
+# The signal handlers can only be installed from the main thread of the worker
+if threading.current_thread() is threading.main_thread():
+    signal.signal(signal.SIGUSR2, credentials_provider.invalidate)
 
 
 def get_credentials(field):
@@ -21,9 +99,7 @@ def get_credentials(field):
     :param field: the credential desired
     :return: the value if exists
     """
-    with open(CREDENTIALS_FILE, "r") as fin:
-        credentials = json.load(fin)
-    return credentials[field]
+    return credentials_provider.get(field)
 
 def generate_valid_token(uid):
     new_token = jwt.encode(
@@ -37,14 +113,33 @@ def generate_valid_token(uid):
     )
     return new_token
 
+# Tokens already verified, by their digest and the version of the credentials used to verify them. The entries expire
+# with the tokens, so a cached token is always valid.
+token_cache = ExpiringLRUCache(TOKEN_CACHE_SIZE)
+
+
+def get_token_cache_stats() -> dict:
+    """
+    :return: the hits, misses and size of the cache of verified tokens of this worker.
+    """
+    return token_cache.stats()
+
+
 def verify_token(token, abort_if_expired=True):
     if token == '':
         abort(403, "Invalid token")
+
+    key = (hashlib.sha256(token.encode()).digest(), credentials_provider.version())
+    decoded_token = token_cache.get(key)
+    if decoded_token is not None:
+        return decoded_token
+
     try:
         decoded_token = jwt.decode(token, get_credentials('private_key'), algorithms=['HS256'])
         time_remaining = time_elapsed(decoded_token['exp'])
         if time_remaining < 0 and abort_if_expired:
             abort(404, "Expired token")
+        token_cache.put(key, decoded_token, decoded_token['exp'])
         return decoded_token
     except jwt.exceptions.ExpiredSignatureError:
         abort(403, "Expired token")
@@ -68,7 +163,7 @@ def update_token(decoded_token, current_token):
 
     # If the expiration time is less than 5 minutes from now, generate a new token
     if time_remaining < app.config['SESSION_MIN_TIME_IN_SECONDS'] :
-        token = generate_valid_token(decoded_token['user_id'])
+        token = generate_valid_token(decoded_token['uid'])
     else:
         token = current_token
 
@@ -85,6 +180,7 @@ def required_token(func: Callable) -> Callable:
             abort(401, 'Invalid token type')
         token = token.split(' ')[1]
         decoded_token = verify_token(token, True)
+        g.uid = decoded_token['uid']
 
         payload, status = func(*args, **kwargs, **decoded_token)
 
@@ -107,14 +203,22 @@ def not_required_token(func: Callable) -> Callable:
                 abort(403, 'Invalid token type')
             token = token.split(' ')[1]
             decoded_token = verify_token(token, False)
+            g.uid = decoded_token['uid']
         else:
             decoded_token = {'uid': None}
 
-        payload, status = func(*args, **kwargs, **decoded_token)
+        result = func(*args, **kwargs, **decoded_token)
+
+        # A bare Response (the files) is sent as is, with its own status (206 for the ranges, 304...)
+        if isinstance(result, Response):
+            result = (result, 200)
+        payload, status = result
 
         # Test is payload is already a Response object (that means it was already processed)
-        # and the status is 200, then send the payload as is
+        # and the status is 200, then send the payload as is, with the token in a header
         if type(payload) is Response and status == 200:
+            if token is not None:
+                payload.headers[TOKEN_HEADER] = update_token(decoded_token, token)
             return payload
 
         if token is not None:
@@ -122,7 +226,7 @@ def not_required_token(func: Callable) -> Callable:
         else:
             message = {'message':payload}
 
-        response = Response(response=json.dumps(message, default=serialize_datetime),
+        response = Response(response=to_json(message),
                             status=status,
                             mimetype="application/json")
         return response
@@ -0,0 +1,140 @@
+import bisect
+import struct
+import zlib
+
+# BGZF is the blocked gzip format of samtools: a series of gzip members of at most 64 KiB, each one with its compressed
+# size in an extra field, so a reader can seek to the start of any block. Any gzip reader can decompress it.
+
+# Maximum number of uncompressed bytes per block, so any block fits in 64 KiB once compressed
+max_block_data = 0xff00
+
+# Empty block that marks the end of the file
+eof_block = bytes.fromhex('1f8b08040000000000ff0600424302001b0003000000000000000000')
+
+
+class BgzfWriter:
+    """
+    Writer of BGZF files. The data is buffered until a block is full, so the memory used doesn't depend on the size of
+    the file. The position of each block is recorded, to write the .gzi index used to seek in the file.
+    """
+
+    def __init__(self, fileobj, level: int = 6):
+        """
+        :param fileobj: the binary file where the compressed data is written.
+        :param level: the compression level of zlib (1 to 9).
+        """
+        self._file = fileobj
+        self._level = level
+        self._buffer = bytearray()
+        self.size = 0
+        self._uncompressed = 0
+        # Pairs (compressed offset, uncompressed offset) of the start of each block
+        self.blocks = []
+
+    def write(self, data: bytes):
+        """
+        Compress some data, writing all the blocks that are full.
+        :param data: the data to compress.
+        :return:
+        """
+        self._buffer += data
+        if len(self._buffer) < max_block_data:
+            return
+
+        view = memoryview(self._buffer)
+        start = 0
+        while len(self._buffer) - start >= max_block_data:
+            self._write_block(view[start:start + max_block_data])
+            start += max_block_data
+        view.release()
+        del self._buffer[:start]
+
+    def close(self):
+        """
+        Write the remaining data and the end of file block. The underlying file is not closed.
+        :return:
+        """
+        if len(self._buffer) > 0:
+            self._write_block(self._buffer)
+            self._buffer = bytearray()
+        self._file.write(eof_block)
+        self.size += len(eof_block)
+
+    def _write_block(self, data):
+        compressor = zlib.compressobj(self._level, zlib.DEFLATED, -15)
+        compressed = compressor.compress(data) + compressor.flush()
+        # Header with the extra field BC, whose value is the size of the whole block minus 1
+        block_size = 18 + len(compressed) + 8
+        self._file.write(struct.pack('<BBBBIBBHBBHH', 0x1f, 0x8b, 8, 4, 0, 0, 0xff, 6, ord('B'), ord('C'), 2,
+                                     block_size - 1))
+        self._file.write(compressed)
+        self._file.write(struct.pack('<II', zlib.crc32(data) & 0xffffffff, len(data)))
+        self.blocks.append((self.size, self._uncompressed))
+        self.size += block_size
+        self._uncompressed += len(data)
+
+    def write_index(self, path: str):
+        """
+        Write the .gzi index of the file, in the format of samtools: the number of entries and the pairs (compressed
+        offset, uncompressed offset) of all the blocks but the first one, as little endian 64 bits integers.
+        :param path: the path of the index.
+        :return:
+        """
+        entries = self.blocks[1:]
+        with open(path, 'wb') as fout:
+            fout.write(struct.pack('<Q', len(entries)))
+            for entry in entries:
+                fout.write(struct.pack('<QQ', *entry))
+
+
+def read_index(path: str) -> list:
+    """
+    Read a .gzi index.
+    :param path: the path of the index.
+    :return: the list of pairs (compressed offset, uncompressed offset) of the blocks, including the first one.
+    """
+    with open(path, 'rb') as fin:
+        data = fin.read()
+    count = struct.unpack_from('<Q', data)[0]
+    return [(0, 0)] + [struct.unpack_from('<QQ', data, 8 + 16 * i) for i in range(count)]
+
+
+def read_range(path: str, index: list, offset: int, length: int, chunk_size: int = 1024 * 1024):
+    """
+    Read a range of the uncompressed content of a BGZF file, decompressing only from the block that contains it.
+    :param path: the BGZF file.
+    :param index: its blocks, as returned by read_index.
+    :param offset: the position of the range in the uncompressed content.
+    :param length: the number of bytes to read.
+    :param chunk_size: the number of compressed bytes read at a time.
+    :return: a generator of the chunks of the range.
+    """
+    block = bisect.bisect_right([entry[1] for entry in index], offset) - 1
+    compressed_offset, skip = index[block]
+    skip = offset - skip
+
+    with open(path, 'rb') as fin:
+        fin.seek(compressed_offset)
+        decompressor = zlib.decompressobj(31)
+        pending = b''
+        while length > 0:
+            if len(pending) == 0:
+                pending = fin.read(chunk_size)
+                if len(pending) == 0:
+                    return
+            output = decompressor.decompress(pending, chunk_size)
+            if decompressor.eof:
+                # The next block is a new gzip member
+                pending = decompressor.unused_data
+                decompressor = zlib.decompressobj(31)
+            else:
+                pending = decompressor.unconsumed_tail
+
+            if skip > 0:
+                skipped = min(skip, len(output))
+                output = output[skipped:]
+                skip -= skipped
+            if len(output) > 0:
+                output = output[:length]
+                length -= len(output)
+                yield output
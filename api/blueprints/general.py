@@ -1,18 +1,20 @@
 import json
+import math
 
 from flask import Blueprint
 from flask import Response, request
 from flask import jsonify
-from sqlalchemy import func
 
 from api import log
 from api.controllers.GroupController import GroupController
+from api.controllers.LookupController import LookupController
 from api.controllers.UserController import UserController
 from api.db.models import Temperature, Ph, Salinity, Target, Method, Extraction, Assembly, Sequencing, Binning, Oxygen, \
     Fraction, Keywords, Dois, Hkgenes
 from api.decorators import wrap_error, get_params, log_params, error, ok_message
 from api.field_utils import sequences, multi_complementaries
-from api.utils import serialize_datetime, normalize
+from api.streaming import get_stream_format, stream_chunks
+from api.utils import serialize_datetime, normalize, commas_to_dot
 from api.utils import to_dict
 
 general_page = Blueprint('general_page', __name__)
@@ -35,6 +37,8 @@ def users(params: dict, **kwargs):
     TODO: This method should be protected and only available for admin users. Or also the information should be
     restricted to the user itself. Or the provided information should be restricted (no password, no email, etc.)
 
+    With the parameter stream=ndjson (or stream=json) the list is streamed while it's read from the database.
+
     :param params:
     :param kwargs:
     :return:
@@ -42,6 +46,15 @@ def users(params: dict, **kwargs):
     message = ''
     result_status = 200
 
+    try:
+        stream_format = get_stream_format(params)
+    except ValueError as e:
+        return error(str(e), 400)
+
+    if stream_format is not None:
+        log.info('Request received for streaming the list of users')
+        return stream_chunks(UserController.iter_users(), stream_format)
+
     if request.method == 'GET':
         log.info('Request received for list of users')
         resp = UserController.list_users()
@@ -205,16 +218,126 @@ def get_classification_data(table: str, value: float):
         error(f"Table {table} not found", 404)
     else:
         dbtable = valid_tables[table]
-        element = dbtable.query.filter(dbtable.vmin < value, value <= dbtable.vmax).first()
+        value = classify_values(dbtable, [value])[0]
 
-        if element is not None:
-            value = element.description
-        else:
-            vmin, vmax = dbtable.query.with_entities(func.min(dbtable.vmin), func.max(dbtable.vmax)).first()
+        return jsonify(value)
+
+
+# Maximum number of values that can be classified in a single request
+max_classification_values = 100000
+
+
+def classify_values(dbtable, values: list) -> list:
+    """
+    Classify a list of values into the categories of a classification table. The values out of the ranges of the table
+    are described as less than the minimum or more than the maximum of the table. The values between two ranges that
+    don't meet, or of an empty table, have no category.
+    :param dbtable: the classification table (Temperature, Ph or Salinity).
+    :param values: the list of values (floats or None).
+    :return: the list of categories (None for the values without one), in the same order as the values.
+    """
+    categories = LookupController.classify_many(dbtable, values)
+    vmin, vmax = LookupController.get_bounds(dbtable)
+    if vmin is None:
+        return categories
+
+    result = []
+    for value, category in zip(values, categories):
+        if category is None and value is not None:
             if value <= vmin:
-                value = f"Less than minimum ({vmin})"
-            else: # value > vmax
-                value = f"More than maximum ({vmax})"
+                category = f"Less than minimum ({vmin})"
+            elif value > vmax:
+                category = f"More than maximum ({vmax})"
+        result.append(category)
+    return result
 
-        return jsonify(value)
 
+def parse_values(values) -> list:
+    """
+    Convert the values received to classify into floats. The values can be numbers or strings, that can use a comma as
+    decimal separator. Empty values are kept as None, and the values that are not finite (nan, inf) are rejected.
+    :param values: the list of values.
+    :return: the list of floats.
+    """
+    if not isinstance(values, list):
+        raise ValueError("A list of values has to be provided")
+
+    if len(values) > max_classification_values:
+        raise ValueError(f"No more than {max_classification_values} values can be classified at once")
+
+    parsed = []
+    for value in values:
+        if value is None or (isinstance(value, str) and len(value.strip()) == 0):
+            parsed.append(None)
+        elif isinstance(value, str):
+            parsed.append(float(commas_to_dot(value)))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            parsed.append(float(value))
+        else:
+            raise ValueError(f"The value {value} is not a number")
+        if parsed[-1] is not None and not math.isfinite(parsed[-1]):
+            raise ValueError(f"The value {value} is not a finite number")
+    return parsed
+
+
+@general_page.route('/query/<string:table>/classify/', methods=['POST'])
+@wrap_error
+# @limiter.limit("100/minute")
+@get_params
+# @log_params
+def get_classification_list(params, table: str):
+    """
+    Given a classification and a list of values, returns the range corresponding to each value.
+    The values are received as a json list, or as a json object with the list in the field 'values'.
+
+    :param params: the list of values, or an object with the field 'values'.
+    :param table: the categories table where look for the values.
+    :return: the list of categories, in the same order as the values.
+    """
+    table = table.lower()
+
+    if table not in valid_tables:
+        return error(f"Table {table} not found", 404)
+
+    values = params.get('values') if isinstance(params, dict) else params
+    try:
+        values = parse_values(values)
+    except ValueError as e:
+        return error(str(e), 400)
+
+    return ok_message(message=classify_values(valid_tables[table], values))
+
+
+@general_page.route('/query/classify/', methods=['POST'])
+@wrap_error
+# @limiter.limit("100/minute")
+@get_params
+# @log_params
+def get_classification_tables(params):
+    """
+    Classify lists of values of several classifications at once. The values are received as a json object whose keys
+    are the classifications (temperature, ph, salinity) and whose values are the lists of values to classify, e.g.
+
+        {"temperature": [12.5, 80], "ph": ["7,1"]}
+
+    :param params: the object with the values of each classification.
+    :return: an object with the same keys, containing the lists of categories.
+    """
+    if not isinstance(params, dict):
+        return error("An object with the values of each classification has to be provided", 400)
+
+    invalid = [table for table in params if table.lower() not in valid_tables]
+    if len(invalid) > 0:
+        return error(f"Tables {invalid} not found", 404)
+
+    try:
+        values = {table: parse_values(table_values) for table, table_values in params.items()}
+    except ValueError as e:
+        return error(str(e), 400)
+
+    if sum(len(table_values) for table_values in values.values()) > max_classification_values:
+        return error(f"No more than {max_classification_values} values can be classified at once", 400)
+
+    result = {table: classify_values(valid_tables[table.lower()], table_values)
+              for table, table_values in values.items()}
+    return ok_message(message=result)
@@ -35,7 +35,7 @@ def add_group(params: dict, **kwargs):
             result_status = 400
         else:
             log.info(f'GET group request received for user { uid = } with { params = }')
-            user = UserController.get_user_by_uid(uid)
+            user = UserController.get_identity_by_uid(uid)
 
             new_group = GroupController.create_group(params, user)
             message = {'status': 'success',
@@ -77,7 +77,7 @@ def group_handle(params: dict, **kwargs):
         result_status = 400
     else:
         log.info(f'GET group request received for user { uid = } with { params = }')
-        user = UserController.get_user_by_uid(uid)
+        user = UserController.get_identity_by_uid(uid)
         if user is None:
             message = {'status': 'error',
                        'message': 'User with {uid =} not found'
@@ -148,7 +148,7 @@ def group_edit(group_id: int, **kwargs):
 
     log.info(f'PUT/PATCH request received for group {group_id = } from user with uid {uid}') # with {params = }
 
-    user = UserController.get_user_by_uid(uid)
+    user = UserController.get_identity_by_uid(uid)
 
     request_form = json.loads(request.data)
 
@@ -251,7 +251,7 @@ def accept(group: int, **kwargs):
     """
     try:
         uid = kwargs['uid']
-        user_id = UserController.get_user_by_uid(uid).id
+        user_id = UserController.get_identity_by_uid(uid).id
 
         answer = request.method != 'DELETE'
 
@@ -275,8 +275,8 @@ def invite(group: int, invited_uid: int,  **kwargs):
     """
     try:
         owner_uid = kwargs['uid']
-        owner_id = UserController.get_user_by_uid(owner_uid).id
-        user_invited_id = UserController.get_user_by_uid(invited_uid).id
+        owner_id = UserController.get_identity_by_uid(owner_uid).id
+        user_invited_id = UserController.get_identity_by_uid(invited_uid).id
 
         log.info(f"Invitation request from user {owner_uid} to user {invited_uid} to join group {group}")
         GroupController.invite(owner_id, user_invited_id, group)
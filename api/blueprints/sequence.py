@@ -1,18 +1,26 @@
 import datetime
 import json
+import mimetypes
+import os
 
 from flask import Blueprint
 from flask import Response, request
 from flask import abort, send_file
+from werkzeug.http import dump_options_header
 from werkzeug.utils import secure_filename
 
 from api import log
 from api.auth import required_token, not_required_token
+from api.config import FILE_SERVING_MODE, FILE_SERVING_PREFIX, FILE_SERVING_GZIP_PREFIX, UPLOADS_DIR
 from api.controllers.SampleController import SampleController
+from api.controllers.UploadController import UploadController
 from api.controllers.UserController import UserController
 from api.decorators import wrap_error, get_params, log_params
+from api.fasta_index import format_region
 from api.field_utils import exclude_param_files, exclude_forbidden_fields, valid_field, is_valid_sequence, \
-    is_valid_step, get_step_table, are_valid_sequence_step, filter_coordinates, filter_floats
+    is_valid_step, get_step_table, are_valid_sequence_step, filter_coordinates, filter_floats, get_file_name_field
+from api.storage import read_decompressed
+from api.streaming import get_stream_format, stream_chunks
 from api.utils import normalize
 from api.utils import serialize_datetime
 
@@ -50,6 +58,8 @@ def validate_sequence_step(sequence: str, step: str):
 def get_public_sequence_step(params: dict, step: str, **kwargs):
     """
     This method is used to get the public omic sequence step. The step is identified by its name.
+    With the parameter stream=ndjson (or stream=json) only the list of ids is streamed while it's read from the
+    database, instead of being returned in the usual message.
     :param step:
     :return:
     """
@@ -57,6 +67,16 @@ def get_public_sequence_step(params: dict, step: str, **kwargs):
     if not is_valid_step(step):
         abort(400, f"Invalid step {step}")
 
+    try:
+        stream_format = get_stream_format(params)
+    except ValueError as e:
+        abort(400, str(e))
+
+    if stream_format is not None:
+        log.info(f'Request received for streaming the public {step} sequence steps')
+        chunks = ([element['id'] for element in chunk] for chunk in SampleController.iter_public(step, fields=['id']))
+        return stream_chunks(chunks, stream_format), 200
+
     log.info(f'Request received for getting public {step} sequence step')
 
     # The uid is not needed, as the data is public
@@ -90,7 +110,7 @@ def upload_sequence_step(params: dict, step: str, **kwargs):
     :return:
     """
     uid: str = kwargs['uid']
-    user_id = UserController.get_user_by_uid(uid).id
+    user_id = UserController.get_identity_by_uid(uid).id
 
     step = normalize(step)
     if step == 'SAMPLE':
@@ -155,7 +175,7 @@ def upload_sequence_step(params: dict, step: str, **kwargs):
 
             message = {'status': 'success',
                        'message': f'{step} created',
-                       'step': SampleController.filter_description_fields(sequence_created)
+                       'step': SampleController.filter_description_fields(step, sequence_created)
                        }
             result_status = 200
         except Exception as e:
@@ -185,7 +205,7 @@ def get_user_and_step_by_uuid(sequence_step, uid, step_id):
     """
     table = get_step_table(sequence_step)
 
-    user = UserController.get_user_by_uid(uid)
+    user = UserController.get_identity_by_uid(uid)
     if user is None:
         abort(400, f'User with uid {uid} not found')
     else:
@@ -196,7 +216,8 @@ def get_user_and_step_by_uuid(sequence_step, uid, step_id):
     if step is None:
         abort(400, f'{step} with id {step_id} not found')
 
-    if SampleController.get_step_access_mode(sequence_step, user_id, step_id) is None:
+    # Any access is enough here, the public steps included; the modifications check get_step_access_mode
+    if SampleController.get_access_mode(table, user_id, step_id) is None:
         abort(403, f"User {user_id} doesn't have access to the sequence step {sequence_step} with id {step_id}")
 
     return user_id, step
@@ -248,7 +269,7 @@ def update_fields_step(params: dict, step: str, step_id: int, **kwargs):
             step_updated = SampleController.update_sequence_step(sequence, step, step_id, params)
             message = {'status': 'success',
                        'message': f'{sequence} sequence {step} with id {step_id} updated',
-                       step: SampleController.filter_description_fields(step_updated)
+                       step: SampleController.filter_description_fields(step, step_updated)
                        }
             result_status = 200
         except Exception as e:
@@ -297,8 +318,10 @@ def get_step(step: str, step_id: int, **kwargs):
 
         log.info(f'user with {uid = } has requested {step} with {step_id = }')
 
+    # The size, checksum and statistics of the sequences of the files, computed when they were uploaded
     message = {'status': 'success',
-               step: SampleController.filter_description_fields(the_step.as_dict())
+               step: SampleController.filter_description_fields(step, the_step.as_dict()),
+               'files': SampleController.get_files_info(the_step)
                }
     result_status = 200
 
@@ -312,10 +335,25 @@ def get_step(step: str, step_id: int, **kwargs):
 # @log_params
 @required_token
 def upload_step_file(step: str, step_id: int, input_type: str, **kwargs):
+    """
+    Upload the file of a field of a sequence step. The file can be sent in two ways:
 
+    * As a multipart form, with the field 'file' and the field 'sequence'.
+    * As the raw body of the request (any other content type, such as application/octet-stream), with the sequence
+      and the original name of the file in the parameters 'sequence' and 'filename' of the url. The body is written
+      to the uploads directory while it's received, without being stored in a temporary file first, so it's the
+      preferred way to upload big files.
+
+    :param step: the sequence step.
+    :param step_id: the identifier of the step.
+    :param input_type: the file field (rreads, rreads2, treads, assembled, pgenes).
+    :return:
+    """
     uid: str = kwargs['uid']
 
-    params = dict(request.form)
+    streaming = request.mimetype != 'multipart/form-data'
+    # In streaming mode the form must not be read, it would consume the body
+    params = dict(request.args) if streaming else dict(request.form)
 
     if 'sequence' not in params:
         abort(400, "Sequence not provided")
@@ -328,17 +366,24 @@ def upload_step_file(step: str, step_id: int, input_type: str, **kwargs):
 
     log.info(f'Request received for uploading a {step} file')
     try:
-        if 'file' not in request.files:
-            abort(401, "No file provided")
-        file = request.files['file']
-        filename = secure_filename(file.filename)
-
-        user_id = UserController.get_user_by_uid(uid).id
+        user_id = UserController.get_identity_by_uid(uid).id
         access = SampleController.get_step_access_mode(step, user_id, step_id)
         if access is None or access != 'readwrite':
             abort(403, f"User {user_id} doesn't have the privileges to modify the {step} {step_id} uploading files")
 
-        SampleController.update_file(sequence, step, step_id, input_type, filename, file)
+        if streaming:
+            filename = secure_filename(params.get('filename', ''))
+            if len(filename) == 0:
+                abort(400, "No file name provided")
+            file_data = request.stream
+        else:
+            if 'file' not in request.files:
+                abort(401, "No file provided")
+            file = request.files['file']
+            filename = secure_filename(file.filename)
+            file_data = file.stream
+
+        SampleController.update_file(sequence, step, step_id, input_type, filename, file_data, user_id)
         message = {'status': 'success',
                    'message': f'file for {input_type} ({filename}) added to  the {step} {step_id}'
                    }
@@ -353,6 +398,256 @@ def upload_step_file(step: str, step_id: int, input_type: str, **kwargs):
     return message, result_status
 
 
+# ##########################
+# Resumable uploads
+# ##########################
+
+def get_own_upload(upload_id: str, uid: str) -> dict:
+    """
+    Get an upload in progress of the user, aborting the request if it doesn't exist.
+    :param upload_id: the identifier of the upload.
+    :param uid: the user.
+    :return: the description of the upload.
+    """
+    description = UploadController.get_upload(upload_id, uid)
+    if description is None:
+        abort(404, f"Upload {upload_id} not found")
+    return description
+
+
+@sequence_page.route('/uploads/', methods=['POST'])
+@wrap_error
+@get_params
+@log_params
+@required_token
+def create_upload(params: dict, **kwargs):
+    """
+    Initiate a resumable upload of the file of a sequence step. The parameters are the sequence, the step, the id of
+    the step, the file field and the original name of the file (filename).
+
+    Then, the parts of the file are uploaded with PUT /uploads/<upload_id>/<part>/ (numbered from 1, in any order
+    and in parallel if desired, a failed part can be uploaded again), and the upload is finished with
+    POST /uploads/<upload_id>/complete/. GET /uploads/<upload_id>/ returns the parts already received, to resume it.
+
+    If the checksum of the file is sent (sha256, in hexadecimal) and the user has already uploaded the same content,
+    the file is set in the step at once and no upload is needed (deduplicated is true). Otherwise, the parts received
+    are checked against the checksum when the upload is completed.
+    :param params: sequence, step, id, field, filename and optionally sha256.
+    :return: the identifier of the upload, or the size of the file if it has been deduplicated.
+    """
+    uid: str = kwargs['uid']
+
+    missing = [key for key in ['sequence', 'step', 'id', 'field', 'filename'] if key not in params]
+    if len(missing) > 0:
+        abort(400, f"Parameters {missing} not provided")
+
+    sequence, step = validate_sequence_step(normalize(params['sequence']), normalize(params['step']))
+    try:
+        step_id = int(params['id'])
+    except (TypeError, ValueError):
+        abort(400, "The id of the step has to be an integer")
+
+    filename = secure_filename(params['filename'])
+    if len(filename) == 0:
+        abort(400, "No file name provided")
+
+    user_id = UserController.get_identity_by_uid(uid).id
+    access = SampleController.get_step_access_mode(step, user_id, step_id)
+    if access is None or access != 'readwrite':
+        abort(403, f"User {user_id} doesn't have the privileges to modify the {step} {step_id} uploading files")
+
+    sha256 = params['sha256'].lower() if params.get('sha256') else None
+    try:
+        if sha256 is not None:
+            size = UploadController.reuse_content(user_id, sequence, step, step_id, params['field'], filename, sha256)
+            if size is not None:
+                log.info(f'Content {sha256} reused for the {params["field"]} of the {step} {step_id}')
+                return {'status': 'success', 'deduplicated': True, 'size': size, 'sha256': sha256}, 200
+        upload_id = UploadController.create_upload(uid, sequence, step, step_id, params['field'], filename, sha256)
+    except Exception as e:
+        abort(400, str(e))
+
+    log.info(f'Upload {upload_id} of the {params["field"]} of the {step} {step_id} initiated')
+    return {'status': 'success', 'deduplicated': False, 'upload_id': upload_id}, 200
+
+
+@sequence_page.route('/uploads/<string:upload_id>/', methods=['GET'])
+@wrap_error
+@required_token
+def get_upload_status(upload_id: str, **kwargs):
+    """
+    Get the state of an upload in progress.
+    :param upload_id: the identifier of the upload.
+    :return: the description of the upload and the list of parts received, with their sizes.
+    """
+    description = get_own_upload(upload_id, kwargs['uid'])
+    return {'status': 'success',
+            'upload': {key: value for key, value in description.items() if key != 'uid'},
+            'parts': UploadController.list_parts(upload_id)}, 200
+
+
+@sequence_page.route('/uploads/<string:upload_id>/<int:part>/', methods=['PUT'])
+@wrap_error
+@required_token
+def upload_part(upload_id: str, part: int, **kwargs):
+    """
+    Upload a part of a file, as the raw body of the request. If the part was already uploaded, it's replaced.
+    :param upload_id: the identifier of the upload.
+    :param part: the number of the part, starting at 1.
+    :return: the size and the checksum (sha256) of the part received.
+    """
+    get_own_upload(upload_id, kwargs['uid'])
+
+    try:
+        size, sha256 = UploadController.store_part(upload_id, part, request.stream)
+    except Exception as e:
+        abort(400, str(e))
+
+    return {'status': 'success', 'part': part, 'size': size, 'sha256': sha256}, 200
+
+
+@sequence_page.route('/uploads/<string:upload_id>/complete/', methods=['POST'])
+@wrap_error
+@required_token
+def complete_upload(upload_id: str, **kwargs):
+    """
+    Finish an upload: the parts are concatenated and the file is set in the sequence step. Optionally, the number of
+    parts can be sent in the field 'parts' of a json body, to check that all of them have been received.
+    :param upload_id: the identifier of the upload.
+    :return: the size and the checksum (sha256) of the file.
+    """
+    uid: str = kwargs['uid']
+    description = get_own_upload(upload_id, uid)
+
+    user_id = UserController.get_identity_by_uid(uid).id
+    access = SampleController.get_step_access_mode(description['step'], user_id, description['id'])
+    if access is None or access != 'readwrite':
+        abort(403, f"User {user_id} doesn't have the privileges to modify the {description['step']} "
+                   f"{description['id']} uploading files")
+
+    params = request.get_json(silent=True) or {}
+    try:
+        size, sha256 = UploadController.complete_upload(upload_id, description, user_id, params.get('parts'))
+    except Exception as e:
+        abort(400, str(e))
+
+    log.info(f'Upload {upload_id} completed, {size} bytes')
+    return {'status': 'success',
+            'message': f'file for {description["field"]} ({description["filename"]}) added to the '
+                       f'{description["step"]} {description["id"]}',
+            'size': size, 'sha256': sha256}, 200
+
+
+@sequence_page.route('/uploads/<string:upload_id>/', methods=['DELETE'])
+@wrap_error
+@required_token
+def abort_upload(upload_id: str, **kwargs):
+    """
+    Cancel an upload in progress, removing the parts received.
+    :param upload_id: the identifier of the upload.
+    :return:
+    """
+    get_own_upload(upload_id, kwargs['uid'])
+    UploadController.abort_upload(upload_id)
+    return {'status': 'success', 'message': f'Upload {upload_id} cancelled'}, 200
+
+
+def send_stored_file(path: str, filename: str, etag: str = None, last_modified=None, mimetype: str = None,
+                     content_encoding: str = None) -> Response:
+    """
+    Build the response that sends a stored file as it is, according to FILE_SERVING_MODE. In the x-accel-redirect and
+    x-sendfile modes the response has no body, the proxy sends the file (and handles the range requests), so the
+    thread of the API is released at once.
+    :param path: the absolute path of the file.
+    :param filename: the name of the download.
+    :param etag: the strong ETag of the file, None for the files uploaded before the stored_file table existed.
+    :param last_modified: the date the file was stored, if it's known.
+    :param mimetype: the type of the content, guessed from the file name if it's not provided.
+    :param content_encoding: the Content-Encoding of the file (gzip), if the clients have to decompress it.
+    :return: the response.
+    """
+    mimetype = mimetype or mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+
+    if FILE_SERVING_MODE in ('x-accel-redirect', 'x-sendfile'):
+        # The revalidations of unchanged files are answered without involving the proxy
+        if etag is not None and request.if_none_match.contains(etag):
+            response = Response(status=304)
+            response.set_etag(etag)
+            return response
+
+        response = Response(status=200, mimetype=mimetype)
+        response.headers['Content-Disposition'] = dump_options_header('attachment', {'filename': filename})
+        if FILE_SERVING_MODE == 'x-accel-redirect':
+            # nginx doesn't keep the Content-Encoding of the API, the gzip location sets it
+            prefix = FILE_SERVING_GZIP_PREFIX if content_encoding == 'gzip' else FILE_SERVING_PREFIX
+            response.headers['X-Accel-Redirect'] = prefix + os.path.relpath(path, os.path.abspath(UPLOADS_DIR))
+        else:
+            response.headers['X-Sendfile'] = path
+            if content_encoding is not None:
+                response.headers['Content-Encoding'] = content_encoding
+        if etag is not None:
+            response.set_etag(etag)
+            response.last_modified = last_modified
+        return response
+
+    # With conditional, the Range, If-Range, If-None-Match and If-Modified-Since headers are honoured (206 and 304
+    # responses). The checksum of the content is a strong ETag, the older files get the one generated by Flask.
+    response = send_file(path, mimetype=mimetype, download_name=filename, conditional=True,
+                         etag=etag if etag is not None else True, last_modified=last_modified)
+    if content_encoding is not None:
+        response.headers['Content-Encoding'] = content_encoding
+    return response
+
+
+def send_step_file(path: str, filename: str, stored, encoding: str = 'identity') -> Response:
+    """
+    Build the response that sends a file of a step. The files stored compressed (bgzf) are sent in the way chosen with
+    the parameter 'encoding' of the url:
+
+    * bgzf: as they are stored, a gzip file named after the original one with the extension .gz.
+    * gzip: with the header Content-Encoding: gzip, the clients decompress them while they're received.
+    * identity: decompressed on the fly, for the clients that can't decompress them. Range requests are not supported.
+
+    By default, they are sent with gzip if the client accepts it (Accept-Encoding), and decompressed otherwise.
+    :param path: the absolute path of the file.
+    :param filename: the original name of the file, used as the name of the download.
+    :param stored: the stored_file row of the file, or None for the files uploaded before the table existed.
+    :param encoding: how the file is stored, identity or bgzf.
+    :return: the response.
+    """
+    if stored is None:
+        return send_stored_file(path, filename)
+    if encoding != 'bgzf':
+        return send_stored_file(path, filename, stored.sha256, stored.created)
+
+    requested = request.args.get('encoding')
+    if requested is None:
+        requested = 'gzip' if request.accept_encodings['gzip'] > 0 else 'identity'
+
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    if requested == 'bgzf':
+        response = send_stored_file(path, f'{filename}.gz', f'{stored.sha256}.bgzf', stored.created,
+                                    'application/gzip')
+    elif requested == 'gzip':
+        # The same file as bgzf, sent by the proxy too (see FILE_SERVING_GZIP_PREFIX)
+        response = send_stored_file(path, filename, f'{stored.sha256}.gz', stored.created, mimetype, 'gzip')
+    elif requested == 'identity':
+        if request.if_none_match.contains(stored.sha256):
+            response = Response(status=304)
+        else:
+            response = Response(read_decompressed(path), status=200, mimetype=mimetype)
+            response.headers['Content-Disposition'] = dump_options_header('attachment', {'filename': filename})
+            response.headers['Accept-Ranges'] = 'none'
+            response.content_length = stored.size
+            response.last_modified = stored.created
+        response.set_etag(stored.sha256)
+    else:
+        abort(400, f"Unknown encoding {requested}, it has to be bgzf, gzip or identity")
+
+    response.vary.add('Accept-Encoding')
+    return response
+
+
 @sequence_page.route('/<string:step>/<int:step_id>/<string:input_type>/', methods=['GET'])
 @wrap_error
 # @limiter.limit("100/minute")
@@ -381,12 +676,58 @@ def get_step_file(step: str, step_id:int, input_type: str, **kwargs):
         access = SampleController.get_access_mode(table, user_id, step_id)
 
     if access is not None:
-        filename, filedata = SampleController.get_file_data(the_step, input_type)
-        return send_file(filedata, download_name=filename), 200
+        filename, filedata, stored, encoding = SampleController.get_file_data(the_step, input_type)
+        # Without a status: the one of the response is kept (206 for the ranges, 304 for the revalidations)
+        return send_step_file(filedata, filename, stored, encoding)
+    else:
+        abort(403, f'User {user_id} has no access to the sequence step {step}')
+
+
+@sequence_page.route('/<string:step>/<int:step_id>/assembled/region/', methods=['GET'])
+@wrap_error
+@not_required_token
+def get_assembled_region(step: str, step_id: int, **kwargs):
+    """
+    Get a sequence, or a range of it, of the assembled file (FASTA) of a step, without downloading the whole file.
+    The file is read from the position of the range, found with the index built when the file was uploaded.
+    The parameters of the url are the name of the sequence (name, the first word of its header) and optionally the
+    range (start and end, starting at 1 and both included, as in samtools faidx).
+
+    :param step: the sequence step (CONTIGS, GENOME, SINGLE CELL GENOME or PLASMID).
+    :param step_id: the identifier of the step.
+    :return: the range as a FASTA record, with the header >name:start-end.
+    """
+    uid: str = kwargs['uid']
+    step = normalize(step)
+    if get_file_name_field(step, 'assembled') is None:
+        abort(400, f"The sequence step {step} has no assembled file")
 
+    name = request.args.get('name')
+    if name is None or len(name) == 0:
+        abort(400, "The name of the sequence is not provided")
+    try:
+        start = int(request.args['start']) if 'start' in request.args else None
+        end = int(request.args['end']) if 'end' in request.args else None
+    except ValueError:
+        abort(400, "The start and the end of the range have to be integers")
 
+    if uid is None:
+        the_step = SampleController.get_step_by_id(get_step_table(step), step_id)
+        if the_step is None:
+            abort(400, f'Sequence step {step} with id {step_id} not found')
+        if not the_step.is_public:
+            abort(403, f'Sequence step {step} is not public')
     else:
-        abort(403, f'User {user_id} has no access to the sequence step {step}')
+        user_id, the_step = get_user_and_step_by_uuid(step, uid, step_id)
+
+    try:
+        entry, start, end, chunks = SampleController.get_sequence_region(the_step, 'assembled', name, start, end)
+    except Exception as e:
+        abort(400, str(e))
+
+    log.info(f'Range {name}:{start}-{end} of the assembled file of the {step} {step_id} requested')
+    return Response(format_region(entry.name, start, end, chunks, entry.linebases or 60), status=200,
+                    mimetype='text/plain'), 200
 
 
 # ##############################################################
@@ -412,7 +753,7 @@ def make_step_public(step: str, step_id: int, **kwargs):
     """
     try:
         uid = kwargs['uid']
-        user_id = UserController.get_user_by_uid(uid).id
+        user_id = UserController.get_identity_by_uid(uid).id
 
         step = normalize(step)
 
@@ -454,7 +795,7 @@ def share_step_user(params: dict, step: str, step_id: int, **kwargs):
         step = normalize(step)
 
         uid = kwargs['uid']
-        owner = UserController.get_user_by_uid(uid).id
+        owner = UserController.get_identity_by_uid(uid).id
 
         if not is_valid_step(step):
             abort(400, f"Invalid step {step}")
@@ -463,7 +804,7 @@ def share_step_user(params: dict, step: str, step_id: int, **kwargs):
             abort(400, 'No user provided')
 
         user_uuid = params['user_uuid']
-        user_id = UserController.get_user_by_uid(user_uuid).id
+        user_id = UserController.get_identity_by_uid(user_uuid).id
         if user_id is None:
             abort(400, 'No invited user provided')
 
@@ -501,14 +842,14 @@ def unshare_step_other_user(step:str, step_id: int, user_uuid: str, **kwargs):
         step = normalize(step)
 
         uid = kwargs['uid']
-        owner = UserController.get_user_by_uid(uid).id
+        owner = UserController.get_identity_by_uid(uid).id
 
         # step_id = params['step_id']
         if step_id is None:
             abort(400, 'No omic sequence step id provided')
 
         # id_user = params['user_id']
-        user_id = UserController.get_user_by_uid(user_uuid).id
+        user_id = UserController.get_identity_by_uid(user_uuid).id
         if user_id is None:
             abort(400, 'No invited user provided')
 
@@ -550,7 +891,7 @@ def share_step_group(params: dict, step: str, step_id: int, **kwargs):
         step = normalize(step)
 
         uid = kwargs['uid']
-        owner = UserController.get_user_by_uid(uid).id
+        owner = UserController.get_identity_by_uid(uid).id
 
         group_id = params.get('group_id', None)
         if group_id is None:
@@ -587,7 +928,7 @@ def unshare_step_group(step: str, step_id: int, group_id: int, **kwargs):
     try:
         step = normalize(step)
         uid = kwargs['uid']
-        owner = UserController.get_user_by_uid(uid).id
+        owner = UserController.get_identity_by_uid(uid).id
 
         log.info(f"User {owner} ends sharing {step} with id {step_id} with group {group_id}")
 
@@ -9,14 +9,16 @@ from flask_limiter.util import get_remote_address
 
 from api import log
 from api.auth import required_token, not_required_token, generate_valid_token
+from api.controllers.AccessController import AccessController
 from api.controllers.GroupController import GroupController
 from api.controllers.ProjectController import ProjectController
 from api.controllers.SampleController import SampleController
 from api.controllers.UserController import UserController
-from api.decorators import wrap_error, get_params, log_params
-from api.field_utils import get_step_table, filter_dict
+from api.decorators import wrap_error, get_params, log_params, AbortError
+from api.field_utils import get_step_table, filter_dict, invalid_projection_fields, sequence_step_sharings
 from api.main import app
-from api.utils import serialize_datetime
+from api.streaming import get_stream_format, stream_chunks
+from api.utils import serialize_datetime, normalize, parse_id
 
 user_page = Blueprint('user_page', __name__)
 
@@ -95,6 +97,8 @@ def add_user(params: dict, **kwargs):
         result_status = 200
         uid = new_user['uid']
         log.info(f'User with uid "{uid}" created, not yet verified')
+    except AbortError:
+        raise
     except Exception as e:
         message = {'status': 'error',
                    'message': str(e)
@@ -165,14 +169,16 @@ def user_edit(params: dict, **kwargs):
 
     request_form = json.loads(request.data)
     try:
+        # update_user already returns the updated (and filtered) user, there's no need to read it again
         returned = UserController.update_user(uid, request_form)
-        updated = UserController.get_user_by_uid(uid)
         message = {'status': 'success',
                    'message': 'User updated',
-                   'user': filter_dict(updated.as_dict())
+                   'user': returned
                    }
         result_status = 200
-        log.info(f'User with id = {updated.id} updated')
+        log.info(f'User with id = {returned["id"]} updated')
+    except AbortError:
+        raise
     except Exception as e:
         log.info(f'Error updating user with {uid = }: {str(e)}')
         message = {'status': 'error',
@@ -187,15 +193,53 @@ def user_edit(params: dict, **kwargs):
 #  Querying information related to a user
 # ##############################################################
 
+def get_listing_params(params: dict, step: str):
+    """
+    Extract the keyset pagination and projection parameters of a listing of steps:
+
+    * after_id: only the steps with an id greater than this one are returned (0 by default).
+    * limit: the maximum number of steps to return (all of them by default).
+    * fields: comma separated list of the fields to return (all of them by default). The id is always returned.
+
+    The steps are sorted by id, so the next page is requested using the id of the last step received as after_id.
+    :param params: the parameters of the request.
+    :param step: the kind of step listed.
+    :return: the tuple (after_id, limit, fields)
+    """
+    try:
+        after_id = int(params.get('after_id', 0))
+        limit = int(params['limit']) if 'limit' in params else None
+    except ValueError:
+        abort(400, "after_id and limit have to be integers")
+
+    if limit is not None and limit <= 0:
+        abort(400, "limit has to be greater than 0")
+
+    if 'fields' in params:
+        fields = [fld.strip() for fld in params['fields'].split(',') if len(fld.strip()) > 0]
+        invalid = invalid_projection_fields(step, fields)
+        if len(invalid) > 0:
+            abort(400, f"Fields {invalid} are not valid for {step}")
+    else:
+        fields = None
+
+    return after_id, limit, fields
+
+
 @user_page.route('/user/list/<string:query_table>/', methods=['GET'])
-# @get_params
 @wrap_error
+@get_params
 @not_required_token
-def get_table_list_by_user(query_table: str, **kwargs):
+def get_table_list_by_user(params: dict, query_table: str, **kwargs):
     """
     Given a user id and a related element (group, experiment, project or sample), return the list of elements related
      to the user. If no valid token, and the query is for samples, the list of public samples is returned.
 
+    The lists of sequence steps can be paginated and projected with the parameters after_id, limit and fields (see
+    get_listing_params). With the parameter stream=ndjson (or stream=json) the list of steps is streamed while it's
+    read from the database, instead of being returned in the usual message.
+
+    :param params: the parameters of the request.
     :param query_table: the table to get the related data.
     :return: the list of elements of the table related to the user. Or the list of public samples
     """
@@ -206,15 +250,24 @@ def get_table_list_by_user(query_table: str, **kwargs):
     else:
         table = get_step_table(query_table)
 
+    try:
+        stream_format = get_stream_format(params)
+    except ValueError as e:
+        abort(400, str(e))
+
     if uid is None:
         if table is not None:
             log.info('Request received for list of public {query_table}')
-            result = SampleController.list_public(table)
+            step = query_table.upper()
+            after_id, limit, fields = get_listing_params(params, step)
+            if stream_format is not None:
+                return stream_chunks(SampleController.iter_public(step, after_id, limit, fields), stream_format), 200
+            result = SampleController.list_public(step, after_id, limit, fields)
         else:
             abort(403, "No token provided")
     else:
         # uid: str = kwargs['uid']
-        user_id = UserController.get_user_by_uid(uid).id
+        user_id = UserController.get_identity_by_uid(uid).id
 
         if table is None:
             abort(405, f"Table {query_table} not found")
@@ -227,7 +280,59 @@ def get_table_list_by_user(query_table: str, **kwargs):
         # elif query_table == "samples":
         #     result = SampleController.get_samples_shared_with_user(user_id)
         else:
-            result = SampleController.get_shared_with_user(query_table.upper(), user_id)
+            step = query_table.upper()
+            after_id, limit, fields = get_listing_params(params, step)
+            if stream_format is not None:
+                chunks = SampleController.iter_shared_with_user(step, user_id, after_id, limit, fields)
+                return stream_chunks(chunks, stream_format), 200
+            result = SampleController.get_shared_with_user(step, user_id, after_id, limit, fields)
 
     return result, 200
     # return json.dumps(result, default=serialize_datetime), 200
+
+
+# Maximum number of steps whose access can be checked in a single request
+max_access_steps = 1000
+
+
+@user_page.route('/user/access/', methods=['POST'])
+@wrap_error
+@get_params
+@log_params
+@required_token
+def get_access_modes(params, **kwargs):
+    """
+    Get the access mode of the user to many sequence steps at once, maybe of different kinds. The steps are received
+    as a json list, or as a json object with the list in the field 'steps', e.g.
+
+        [{"step": "SAMPLE", "id": 3}, {"step": "RAW READS", "id": 12}]
+
+    :param params: the list of steps.
+    :return: the list of steps with the field access_mode added (readwrite, read or null if the user has no access).
+    """
+    uid: str = kwargs['uid']
+
+    steps = params.get('steps') if isinstance(params, dict) else params
+    if not isinstance(steps, list):
+        abort(400, "A list of steps has to be provided")
+
+    if len(steps) > max_access_steps:
+        abort(400, f"No more than {max_access_steps} steps can be checked at once")
+
+    pairs = []
+    for item in steps:
+        if not isinstance(item, dict) or not isinstance(item.get('step'), str) or 'id' not in item:
+            abort(400, "Each step has to be an object with the fields step and id")
+        step = normalize(item['step'])
+        if step not in sequence_step_sharings:
+            abort(400, f"Step '{item['step']}' is not valid")
+        step_id = parse_id(item['id'])
+        if step_id is None:
+            abort(400, f"The id {item['id']} of the step {step} is not an integer")
+        pairs.append((step, step_id))
+
+    user_id = UserController.get_identity_by_uid(uid).id
+    modes = AccessController.get_access_modes(user_id, pairs)
+
+    result = [{'step': step, 'id': step_id, 'access_mode': mode} for (step, step_id), mode in zip(pairs, modes)]
+    return {'status': 'success', 'access': result}, 200
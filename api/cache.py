@@ -0,0 +1,182 @@
+import bisect
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable
+
+
+class TimedCache:
+    """
+    Small per-worker cache for data that rarely changes. Each entry is built on demand by the loader function and
+    kept for ttl seconds, or until it is explicitly invalidated. It is safe to use from the gunicorn threads.
+    """
+
+    def __init__(self, loader: Callable[[Hashable], Any], ttl: float):
+        """
+        :param loader: the function used to build the value of a key that is not cached (or has expired).
+        :param ttl: the time, in seconds, an entry is kept. A value lower or equal than 0 disables the expiration.
+        """
+        self._loader = loader
+        self._ttl = ttl
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable):
+        """
+        Get the value associated with a key, loading it if it's not cached or if it has expired.
+        :param key: the key to look for.
+        :return: the cached value.
+        """
+        return self._get(key)[0]
+
+    def lookup(self, key: Hashable, item: Hashable):
+        """
+        Get an item of a cached dictionary. If the item is not found, the dictionary is loaded again, as the item could
+        have been added after it was cached. That is done once until the entry expires: the items not found afterwards
+        are taken as missing, so looking up unknown items doesn't load the dictionary on every call.
+        :param key: the key of the dictionary.
+        :param item: the key of the item in the dictionary.
+        :return: the item, None if it doesn't exist.
+        """
+        value, reloaded = self._get(key)
+        if item in value or reloaded:
+            return value.get(item)
+        return self._load(key, True).get(item)
+
+    def _get(self, key: Hashable):
+        # The value and whether it was loaded again because an item was missing (see lookup)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and (self._ttl <= 0 or now - entry[0] < self._ttl):
+                return entry[1], entry[2]
+        return self._load(key, False), False
+
+    def _load(self, key: Hashable, reloaded: bool):
+        # The loader runs without the lock, two threads can load the same key at the same time, but none of them
+        # blocks the others while the database is queried.
+        value = self._loader(key)
+
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value, reloaded)
+        return value
+
+    def invalidate(self, key: Hashable = None):
+        """
+        Remove an entry from the cache, so it's loaded again the next time it's requested.
+        :param key: the key to remove. If None, the whole cache is emptied.
+        :return:
+        """
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+
+class IntervalIndex:
+    """
+    In-memory classification of numbers into left-open intervals (vmin, vmax], as the categories of temperature, ph
+    and salinity are defined. The intervals are sorted by their lower bound, so a value is classified with a binary
+    search instead of a query.
+    """
+
+    def __init__(self, intervals):
+        """
+        :param intervals: an iterable of tuples (vmin, vmax, value). The intervals with an undefined bound are ignored,
+                          as the database wouldn't match them either.
+        """
+        self._intervals = sorted([interval for interval in intervals
+                                  if interval[0] is not None and interval[1] is not None],
+                                 key=lambda interval: interval[0])
+        self._starts = [interval[0] for interval in self._intervals]
+
+    def find(self, x):
+        """
+        Get the value of the interval that contains x, that is vmin < x <= vmax.
+        :param x: the number to classify.
+        :return: the value associated with the interval, or None if no interval contains x.
+        """
+        # The candidates are the intervals whose lower bound is strictly less than x. Usually the intervals don't
+        # overlap and the last candidate is the right one, but the previous ones are checked just in case.
+        position = bisect.bisect_left(self._starts, x)
+        for i in range(position - 1, -1, -1):
+            vmin, vmax, value = self._intervals[i]
+            if x <= vmax:
+                return value
+        return None
+
+    def bounds(self):
+        """
+        :return: the pair (minimum, maximum) of the bounds of the intervals, or (None, None) if there's no interval.
+        """
+        if len(self._intervals) == 0:
+            return None, None
+        return self._starts[0], max(interval[1] for interval in self._intervals)
+
+
+class ExpiringLRUCache:
+    """
+    Bounded cache whose entries have their own expiration time, given as a timestamp (as the exp claim of a token).
+    When the cache is full, the least recently used entry is dropped. It counts the hits and misses, to check how
+    effective it is.
+    """
+
+    def __init__(self, max_size: int):
+        """
+        :param max_size: the maximum number of entries kept.
+        """
+        self._max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def get(self, key: Hashable):
+        """
+        Get the value associated with a key, if it's cached and it hasn't expired.
+        :param key: the key to look for.
+        :return: the cached value, None if it's not found.
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= now:
+                if entry is not None:
+                    del self._entries[key]
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return entry[1]
+
+    def put(self, key: Hashable, value, expires_at: float):
+        """
+        Add an entry to the cache.
+        :param key: the key of the entry.
+        :param value: the value to cache.
+        :param expires_at: the timestamp (seconds since the epoch) when the entry expires.
+        :return:
+        """
+        if self._max_size <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """
+        Remove all the entries of the cache.
+        :return:
+        """
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        """
+        :return: the number of hits, misses and entries of the cache.
+        """
+        with self._lock:
+            return {'hits': self._hits, 'misses': self._misses, 'size': len(self._entries)}
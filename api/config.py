@@ -26,13 +26,92 @@ def get_secret(var: str, file_var: str, default: Optional[str]) -> Optional[str]
 
 APP_ENV = os.getenv('APP_ENV', 'development')
 UPLOADS_DIR = os.getenv('UPLOADS_DIR', './uploads')
+# How the files of the steps are sent, once the access has been checked:
+#   direct: the API sends the file (default)
+#   x-accel-redirect: the API answers with the header X-Accel-Redirect, FILE_SERVING_PREFIX followed by the path of the
+#       file in UPLOADS_DIR (blobs/ab/cd/abcd...), and nginx sends it. The prefix has to be an internal location
+#       aliased to UPLOADS_DIR, e.g.
+#           location /protected-uploads/ { internal; alias /opt/halodb-api/uploads/; }
+#   x-sendfile: the API answers with the header X-Sendfile, the absolute path of the file (Apache, lighttpd)
+# The files stored in BGZF (see STORAGE_COMPRESSION) are sent by the proxy too when they are requested as bgzf or gzip,
+# gzip being the default of the clients that accept it. nginx doesn't keep the Content-Encoding of the API, so the gzip
+# ones are redirected to FILE_SERVING_GZIP_PREFIX, a second internal location that sets it and must not compress again:
+#           location /protected-uploads-gzip/ { internal; alias /opt/halodb-api/uploads/; gzip off;
+#                                               add_header Content-Encoding gzip; }
+# Only the identity encoding, for the clients that don't accept gzip, is always decompressed and sent by the API.
+FILE_SERVING_MODE = os.getenv('FILE_SERVING_MODE', 'direct').lower()
+FILE_SERVING_PREFIX = os.getenv('FILE_SERVING_PREFIX', '/protected-uploads/')
+FILE_SERVING_GZIP_PREFIX = os.getenv('FILE_SERVING_GZIP_PREFIX', '/protected-uploads-gzip/')
+
+# Number of bytes read at a time from the body of the requests when a file is uploaded
+UPLOAD_CHUNK_SIZE = int(os.getenv('UPLOAD_CHUNK_SIZE', 1024 * 1024))
+# Hours after which the resumable uploads that have not been completed are removed, with their parts
+UPLOAD_EXPIRY_HOURS = float(os.getenv('UPLOAD_EXPIRY_HOURS', 48))
+# Seconds after which the completion of an upload that has not finished is considered interrupted (the worker died),
+# so its parts can be completed again
+UPLOAD_COMPLETION_TIMEOUT = float(os.getenv('UPLOAD_COMPLETION_TIMEOUT', 2 * 60 * 60))
+
+# Compression of the uploaded files in the blob store:
+#   none: the files are stored as they are received (default)
+#   bgzf: the uncompressed FASTA and FASTQ files are stored compressed in BGZF (blocked gzip), with the given level
+STORAGE_COMPRESSION = os.getenv('STORAGE_COMPRESSION', 'none').lower()
+STORAGE_COMPRESSION_LEVEL = int(os.getenv('STORAGE_COMPRESSION_LEVEL', 6))
+
+# Directory where the reflected schema of the database is stored, so the workers don't reflect it on every start. It
+# must be private to the user of the API (see schema_cache.is_private). An empty value disables the snapshots.
+SCHEMA_CACHE_DIR = os.getenv('SCHEMA_CACHE_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'halodb-api'))
 
 MYSQL_HOST = os.getenv('MYSQL_HOST', 'db')
 
 MYSQL_PORT = int(os.getenv('MYSQL_PORT', 3306))
 MYSQL_DATABASE = os.getenv('MYSQL_DATABASE', 'halodb')
 
+# Optional read replicas, a comma separated list of host or host:port. The GET requests read from them, except the ones
+# of a user that has modified data during the last REPLICA_STICKY_SECONDS, that keep reading from the primary. Every
+# worker knows about the write through a signed cookie (halodb_last_write); the clients that don't send it back only
+# stick to the primary in the worker that answered the write.
+MYSQL_REPLICA_HOSTS = [host.strip() for host in os.getenv('MYSQL_REPLICA_HOSTS', '').split(',') if host.strip()]
+REPLICA_STICKY_SECONDS = float(os.getenv('REPLICA_STICKY_SECONDS', 5))
+
 MYSQL_USER = os.getenv('MYSQL_USER_NAME', 'halodb')
 MYSQL_PASSWORD = get_secret('MYSQL_PASSWORD', 'MYSQL_PASSWORD_FILE', 'halodb')
 
+# Connection pool of each worker, shared by the ORM queries, the sessions and the stored procedure calls. With the
+# default values a worker opens up to 16 connections, one for each gunicorn thread.
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 8))
+DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', 8))
+# Time, in seconds, a request waits for a free connection
+DB_POOL_TIMEOUT = int(os.getenv('DB_POOL_TIMEOUT', 30))
+# Connections older than this number of seconds are replaced, before the server closes them (wait_timeout)
+DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', 3600))
+DB_POOL_PRE_PING = os.getenv('DB_POOL_PRE_PING', 'true').lower() in ('1', 'true', 'yes')
+
+# Connections of the pool opened when a worker starts, before it reports itself ready
+DB_WARM_CONNECTIONS = int(os.getenv('DB_WARM_CONNECTIONS', 4))
+# Maximum time, in seconds, between two attempts to connect to the database while waiting for it at startup, and
+# between two attempts to warm up a worker
+DB_WAIT_MAX_SECONDS = float(os.getenv('DB_WAIT_MAX_SECONDS', 30))
+
 CREDENTIALS_FILE = os.getenv('CREDENTIALS_FILE')
+
+# Minimum time, in seconds, between two checks of the modification time of the credentials file
+CREDENTIALS_CHECK_INTERVAL = float(os.getenv('CREDENTIALS_CHECK_INTERVAL', 5))
+
+# Maximum number of verified tokens each worker remembers, so they aren't decoded again on every request
+TOKEN_CACHE_SIZE = int(os.getenv('TOKEN_CACHE_SIZE', 10000))
+
+# Time, in seconds, the complementary tables (method, extraction, temperature, ...) are kept in memory by each worker
+LOOKUP_CACHE_TTL = int(os.getenv('LOOKUP_CACHE_TTL', 10 * 60))
+
+# Threads of each worker that hash passwords, and number of password operations that can wait for them. When both are
+# busy, the logins are rejected with 429 instead of taking the threads that serve the rest of the requests.
+PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', 2))
+PASSWORD_HASH_QUEUE = int(os.getenv('PASSWORD_HASH_QUEUE', 8))
+# Maximum time, in seconds, a request waits for a password operation (503 if exceeded)
+PASSWORD_HASH_TIMEOUT = float(os.getenv('PASSWORD_HASH_TIMEOUT', 5))
+
+# Time, in seconds, each worker keeps the identity (id, email, verified) of the users that make requests
+IDENTITY_CACHE_TTL = int(os.getenv('IDENTITY_CACHE_TTL', 60))
+
+# Number of rows read from the database at a time when a listing is streamed
+STREAM_CHUNK_SIZE = int(os.getenv('STREAM_CHUNK_SIZE', 500))
@@ -0,0 +1,298 @@
+from flask import g, has_app_context
+from sqlalchemy import select, delete, literal, func, case
+from sqlalchemy.dialects.mysql import insert
+
+from api.db.db import DatabaseInstance
+from api.db.models import Effective_Access, User_Has_Group
+from api.field_utils import get_step_table, sequence_step_sharings
+
+# The user id of the rows granting access to everybody, that is, the public steps
+public_user = 0
+
+# The access mode of a user to a step, from its rows of effective_access. As in the procedures get_*_available, the
+# public steps can only be read, whatever the other sources grant. Otherwise the most permissive mode is taken (MAX of
+# the ENUM compares the strings, so 'readwrite' > 'read').
+access_mode_column = case((func.max(Effective_Access.source == 'public') == 1, literal('read')),
+                          else_=func.max(Effective_Access.access_mode))
+
+
+def get_step_type(step: str) -> str:
+    """
+    Get the value of the column step_type for a sequence step.
+    :param step: the sequence step (SAMPLE, RAW READS, ...).
+    :return: the name of the table of the step.
+    """
+    return get_step_table(step).__table__.name
+
+
+def get_group_sharing_tables() -> dict:
+    """
+    :return: a dictionary from the step types to their group sharing tables. Some steps share the same table (RAW READS
+             and PEPTIDES), so they appear only once.
+    """
+    tables = {}
+    for step, sharing in sequence_step_sharings.items():
+        tables[get_step_type(step)] = sharing['group']
+    return tables
+
+
+def forget_access_modes():
+    """
+    Empty the memo of access modes of the current request, as the accesses have changed.
+    :return:
+    """
+    if has_app_context():
+        g.pop('access_modes', None)
+
+
+class AccessController:
+    """
+    Maintenance of the table effective_access, the projection of the public, owned and shared sequence steps that
+    the procedures get_*_available read. Each row states that a user can access a step for a reason (the source): the
+    step is public (the user is 0), the user owns it, or it's shared with the user or with one of the groups the user
+    is a member of.
+
+    The methods that change the table don't commit, they receive the session of the operation that changes the
+    accesses, so the table is updated in the same transaction.
+    """
+
+    @classmethod
+    def get_access_mode(cls, step_type: str, user_id: int, step_id: int):
+        """
+        Get the access mode of a user to a sequence step with a single query. The answer is kept until the end of the
+        request, as the same check is usually done several times while serving it.
+        :param step_type: the table of the step (see get_step_type).
+        :param user_id: the user.
+        :param step_id: the identifier of the step.
+        :return: the access mode of the user (readwrite or read, only read if the step is public), None if the user has
+                 no access.
+        """
+        return cls._get_access_mode(access_mode_column, [public_user, user_id], step_type, user_id, step_id)
+
+    @classmethod
+    def get_own_access_mode(cls, step_type: str, user_id: int, step_id: int):
+        """
+        Get the access mode a user has been granted to a sequence step, as owner or through a share, without taking
+        into account whether it's public. It's the one checked before modifying the step: the owner of a public step
+        can still edit it.
+        :param step_type: the table of the step (see get_step_type).
+        :param user_id: the user.
+        :param step_id: the identifier of the step.
+        :return: the most permissive access mode granted to the user (readwrite or read), None if it has none.
+        """
+        # MAX of the ENUM compares the strings, so 'readwrite' > 'read'
+        return cls._get_access_mode(func.max(Effective_Access.access_mode), [user_id], step_type, user_id, step_id)
+
+    @classmethod
+    def _get_access_mode(cls, column, users: list, step_type: str, user_id: int, step_id: int):
+        # The answers are kept by the rows they are computed from, public ones included or not
+        key = (step_type, user_id, step_id, public_user in users)
+        memo = g.setdefault('access_modes', {}) if has_app_context() else {}
+        if key in memo:
+            return memo[key]
+
+        stmt = (select(column)
+                .where(Effective_Access.user_id.in_(users))
+                .where(Effective_Access.step_type == step_type)
+                .where(Effective_Access.step_id == step_id))
+        with DatabaseInstance.get().new_session() as session:
+            access_mode = session.execute(stmt).scalar()
+
+        memo[key] = access_mode
+        return access_mode
+
+    @classmethod
+    def get_access_modes(cls, user_id: int, steps: list) -> list:
+        """
+        Get the access modes of a user to many sequence steps at once, with one grouped query for each kind of step.
+        :param user_id: the user.
+        :param steps: a list of pairs (sequence step, step id), the steps can be of different kinds.
+        :return: the list of access modes (readwrite, read or None), in the same order as the steps.
+        """
+        ids_by_type = {}
+        for step, step_id in steps:
+            ids_by_type.setdefault(get_step_type(step), set()).add(step_id)
+
+        memo = g.setdefault('access_modes', {}) if has_app_context() else {}
+        with DatabaseInstance.get().new_session() as session:
+            for step_type, ids in ids_by_type.items():
+                ids = [step_id for step_id in ids if (step_type, user_id, step_id, True) not in memo]
+                if len(ids) == 0:
+                    continue
+                stmt = (select(Effective_Access.step_id, access_mode_column)
+                        .where(Effective_Access.user_id.in_([public_user, user_id]))
+                        .where(Effective_Access.step_type == step_type)
+                        .where(Effective_Access.step_id.in_(ids))
+                        .group_by(Effective_Access.step_id))
+                modes = dict(session.execute(stmt).all())
+                for step_id in ids:
+                    memo[(step_type, user_id, step_id, True)] = modes.get(step_id)
+
+        return [memo[(get_step_type(step), user_id, step_id, True)] for step, step_id in steps]
+
+    @classmethod
+    def execute(cls, session, stmt):
+        """
+        Run a statement that changes the table.
+        :param session: the session of the current transaction.
+        :param stmt: the insert or delete statement.
+        :return:
+        """
+        session.execute(stmt)
+        forget_access_modes()
+
+    @classmethod
+    def upsert(cls, session, rows: list):
+        """
+        Add rows to the table, updating the access mode of the ones that already exist.
+        :param session: the session of the current transaction.
+        :param rows: a list of dictionaries with the columns of effective_access.
+        :return:
+        """
+        if len(rows) == 0:
+            return
+        stmt = insert(Effective_Access).values(rows)
+        cls.execute(session, stmt.on_duplicate_key_update(access_mode=stmt.inserted.access_mode))
+
+    @classmethod
+    def grant_owner(cls, session, step: str, step_id: int, user_id: int):
+        """
+        Register the owner of a new sequence step.
+        :param session: the session of the current transaction.
+        :param step: the sequence step.
+        :param step_id: the identifier of the step.
+        :param user_id: the owner.
+        :return:
+        """
+        cls.upsert(session, [{'user_id': user_id, 'step_type': get_step_type(step), 'step_id': step_id,
+                              'source': 'owned', 'source_id': 0, 'access_mode': 'readwrite'}])
+
+    @classmethod
+    def make_public(cls, session, step: str, step_id: int):
+        """
+        Give read access to a sequence step to everybody.
+        :param session: the session of the current transaction.
+        :param step: the sequence step.
+        :param step_id: the identifier of the step.
+        :return:
+        """
+        cls.upsert(session, [{'user_id': public_user, 'step_type': get_step_type(step), 'step_id': step_id,
+                              'source': 'public', 'source_id': 0, 'access_mode': 'read'}])
+
+    @classmethod
+    def share_user(cls, session, step: str, step_id: int, user_id: int, access_mode: str):
+        """
+        Give access to a sequence step to a user, or change the access mode if it was already shared.
+        :param session: the session of the current transaction.
+        :param step: the sequence step.
+        :param step_id: the identifier of the step.
+        :param user_id: the user.
+        :param access_mode: read or readwrite.
+        :return:
+        """
+        cls.upsert(session, [{'user_id': user_id, 'step_type': get_step_type(step), 'step_id': step_id,
+                              'source': 'user', 'source_id': 0, 'access_mode': access_mode}])
+
+    @classmethod
+    def unshare_user(cls, session, step: str, step_id: int, user_id: int):
+        """
+        Remove the access to a sequence step given directly to a user. The user can still access the step through
+        other sources.
+        :param session: the session of the current transaction.
+        :param step: the sequence step.
+        :param step_id: the identifier of the step.
+        :param user_id: the user.
+        :return:
+        """
+        cls.execute(session, delete(Effective_Access)
+                             .where(Effective_Access.user_id == user_id)
+                             .where(Effective_Access.step_type == get_step_type(step))
+                             .where(Effective_Access.step_id == step_id)
+                             .where(Effective_Access.source == 'user'))
+
+    @classmethod
+    def share_group(cls, session, step: str, step_id: int, group_id: int, access_mode: str):
+        """
+        Give access to a sequence step to the members of a group (the invited users are not members yet).
+        :param session: the session of the current transaction.
+        :param step: the sequence step.
+        :param step_id: the identifier of the step.
+        :param group_id: the group.
+        :param access_mode: read or readwrite.
+        :return:
+        """
+        members = (select(User_Has_Group.user_id, literal(get_step_type(step)), literal(step_id), literal('group'),
+                          User_Has_Group.group_id, literal(access_mode))
+                   .where(User_Has_Group.group_id == group_id)
+                   .where((User_Has_Group.relation == None) | (User_Has_Group.relation != 'invited')))
+        stmt = insert(Effective_Access).from_select(
+            ['user_id', 'step_type', 'step_id', 'source', 'source_id', 'access_mode'], members)
+        cls.execute(session, stmt.on_duplicate_key_update(access_mode=stmt.inserted.access_mode))
+
+    @classmethod
+    def unshare_group(cls, session, step: str, step_id: int, group_id: int):
+        """
+        Remove the access to a sequence step given to the members of a group.
+        :param session: the session of the current transaction.
+        :param step: the sequence step.
+        :param step_id: the identifier of the step.
+        :param group_id: the group.
+        :return:
+        """
+        cls.execute(session, delete(Effective_Access)
+                             .where(Effective_Access.step_type == get_step_type(step))
+                             .where(Effective_Access.step_id == step_id)
+                             .where(Effective_Access.source == 'group')
+                             .where(Effective_Access.source_id == group_id))
+
+    @classmethod
+    def add_member(cls, session, user_id: int, group_id: int):
+        """
+        Give a new member of a group access to all the sequence steps shared with the group.
+        :param session: the session of the current transaction.
+        :param user_id: the new member.
+        :param group_id: the group.
+        :return:
+        """
+        for step_type, shared_table in get_group_sharing_tables().items():
+            shared = (select(literal(user_id), literal(step_type), shared_table.shared_id, literal('group'),
+                             shared_table.group_id, func.coalesce(shared_table.access_mode, 'read'))
+                      .where(shared_table.group_id == group_id))
+            stmt = insert(Effective_Access).from_select(
+                ['user_id', 'step_type', 'step_id', 'source', 'source_id', 'access_mode'], shared)
+            cls.execute(session, stmt.on_duplicate_key_update(access_mode=stmt.inserted.access_mode))
+
+    @classmethod
+    def remove_group(cls, session, group_id: int):
+        """
+        Remove all the accesses given through a group.
+        :param session: the session of the current transaction.
+        :param group_id: the group.
+        :return:
+        """
+        cls.execute(session, delete(Effective_Access)
+                             .where(Effective_Access.source == 'group')
+                             .where(Effective_Access.source_id == group_id))
+
+    @classmethod
+    def remove_step(cls, session, step: str, step_id: int):
+        """
+        Remove all the accesses to a sequence step, when it is deleted.
+        :param session: the session of the current transaction.
+        :param step: the sequence step.
+        :param step_id: the identifier of the step.
+        :return:
+        """
+        cls.execute(session, delete(Effective_Access)
+                             .where(Effective_Access.step_type == get_step_type(step))
+                             .where(Effective_Access.step_id == step_id))
+
+    @classmethod
+    def remove_user(cls, session, user_id: int):
+        """
+        Remove all the accesses of a user, when it is deleted.
+        :param session: the session of the current transaction.
+        :param user_id: the user.
+        :return:
+        """
+        cls.execute(session, delete(Effective_Access).where(Effective_Access.user_id == user_id))
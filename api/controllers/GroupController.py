@@ -4,6 +4,7 @@ from sqlalchemy import select
 from sqlalchemy.orm import Session
 from sqlalchemy.sql.type_api import to_instance
 
+from api.controllers.AccessController import AccessController
 from api.db.db import DatabaseInstance
 from api.db.models import Group, User, User_Has_Group
 from api.utils import to_dict
@@ -88,6 +89,7 @@ class GroupController:
                 if accept:
                     setattr(user_has_group[0], 'relation', 'member')
                     setattr(user_has_group[0], 'addition_date', datetime.datetime.utcnow())
+                    AccessController.add_member(session, user_id, group_id)
                 else:
                     session.delete(user_has_group[0])
                 session.commit()
@@ -216,12 +218,15 @@ class GroupController:
                 if group is None:
                     raise Exception(f"Group with (group_id) does not exist")
 
-                group_to_delete = group
+                group_to_delete = group[0]
 
                 # Remove the group from all its users
                 for relation_to_user in group_to_delete.user_has_group:
                     session.delete(relation_to_user)
 
+                # And the access of its members to the steps shared with the group
+                AccessController.remove_group(session, group_id)
+
                 # Remove the group
                 session.delete(group_to_delete)
                 session.commit()
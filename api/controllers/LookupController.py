@@ -0,0 +1,117 @@
+from sqlalchemy import select
+
+from api.cache import TimedCache, IntervalIndex
+from api.config import LOOKUP_CACHE_TTL
+from api.db.db import DatabaseInstance
+from api.db.models import Method, Extraction, Assembly, Sequencing, Binning, Oxygen, Fraction, Target, \
+    Temperature, Ph, Salinity
+from api.utils import parse_id
+
+
+def _load_descriptions(table) -> dict:
+    with DatabaseInstance.get().new_session() as session:
+        rows = session.execute(select(table.id, table.description)).all()
+    return {row[0]: row[1] for row in rows}
+
+
+def _load_ranges(table) -> IntervalIndex:
+    with DatabaseInstance.get().new_session() as session:
+        rows = session.execute(select(table.vmin, table.vmax, table.description)).all()
+    return IntervalIndex((row[0], row[1], row[2]) for row in rows)
+
+
+class LookupController:
+    """
+    Access to the complementary tables (method, extraction, assembly, sequencing, binning, oxygen, fraction, target)
+    and to the classification tables (temperature, ph, salinity). These tables are small and almost never change, so
+    each worker keeps them in memory and neither the translation of an id into its description nor the classification
+    of a value need to query the database.
+    """
+
+    _descriptions = TimedCache(_load_descriptions, LOOKUP_CACHE_TTL)
+    _ranges = TimedCache(_load_ranges, LOOKUP_CACHE_TTL)
+
+    @classmethod
+    def get_descriptions(cls, table) -> dict:
+        """
+        Get the whole content of a complementary table.
+        :param table: the complementary table (a model class, such as Method).
+        :return: a dictionary from the ids of the table to their descriptions.
+        """
+        return cls._descriptions.get(table)
+
+    @classmethod
+    def get_description(cls, table, element_id):
+        """
+        Get the description of an element of a complementary table. If the id is not found, the table is loaded again
+        once until it expires, as the element could have been added after the table was cached (see TimedCache.lookup).
+        :param table: the complementary table (a model class, such as Method).
+        :param element_id: the id of the element, an integer or a string of digits.
+        :return: the description of the element, None if it doesn't exist or the id is not an integer.
+        """
+        element_id = parse_id(element_id)
+        if element_id is None:
+            return None
+        return cls._descriptions.lookup(table, element_id)
+
+    @classmethod
+    def exists(cls, table, element_id) -> bool:
+        """
+        Test if an id is a valid element of a complementary table.
+        :param table: the complementary table.
+        :param element_id: the id to test.
+        :return: true if the element exists, false otherwise.
+        """
+        return cls.get_description(table, element_id) is not None
+
+    @classmethod
+    def invalidate(cls, table=None):
+        """
+        Forget the cached content of a complementary table, so it's read again from the database the next time.
+        :param table: the table to forget. If None, all the complementary and classification tables are forgotten.
+        :return:
+        """
+        cls._descriptions.invalidate(table)
+        cls._ranges.invalidate(table)
+
+    @classmethod
+    def classify(cls, table, value):
+        """
+        Get the category of a classification table (temperature, ph, salinity) that contains a value, that is, the one
+        with vmin < value <= vmax.
+        :param table: the classification table (a model class, such as Temperature).
+        :param value: the value to classify.
+        :return: the description of the category, None if the value is out of the ranges.
+        """
+        return cls._ranges.get(table).find(value)
+
+    @classmethod
+    def classify_many(cls, table, values: list) -> list:
+        """
+        Get the categories of a list of values at once.
+        :param table: the classification table.
+        :param values: the values to classify. The None values are kept as None.
+        :return: the list of descriptions of the categories, in the same order as the values.
+        """
+        index = cls._ranges.get(table)
+        return [index.find(value) if value is not None else None for value in values]
+
+    @classmethod
+    def get_bounds(cls, table):
+        """
+        Get the limits of a classification table.
+        :param table: the classification table.
+        :return: the pair (minimum vmin, maximum vmax) of the table.
+        """
+        return cls._ranges.get(table).bounds()
+
+    @classmethod
+    def preload(cls):
+        """
+        Load all the complementary and classification tables, so the first requests find them in memory.
+        :return:
+        """
+        for table in [Method, Extraction, Assembly, Sequencing, Binning, Oxygen, Fraction, Target]:
+            cls.get_descriptions(table)
+        for table in [Temperature, Ph, Salinity]:
+            cls.get_bounds(table)
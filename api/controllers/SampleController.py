@@ -1,21 +1,31 @@
 import datetime
 import logging
 import os
-
 import uuid
 
-from sqlalchemy import select, delete
 
-from api.config import UPLOADS_DIR
+from sqlalchemy import select, delete, func
+from sqlalchemy.dialects.mysql import insert
+
+from api.config import UPLOADS_DIR, STREAM_CHUNK_SIZE
+from api.controllers.AccessController import AccessController, get_step_type
+from api.controllers.LookupController import LookupController
 from api.db.db import DatabaseInstance
 from api.db.models import Sample, User_Shared_Sample, Group, User_Has_Group, Temperature, Ph, Salinity, \
     Method, Oxygen, Fraction, Target, Extraction, Assembly, Sequencing, Binning, Group_Shared_Sample, Project, User, \
-    Keywords, Hkgenes, Dois
+    Keywords, Hkgenes, Dois, Stored_File, Stored_Blob
 from api.field_utils import valid_field, fix_times, complementaries, supplementaries, multi_complementaries, \
     get_reference_tables, get_step_table, get_sharing_tables, is_file_field, get_file_name_field, get_stored_procedure, \
-    merge_extra_fields, sequence_step_sharings, filter_dict, get_file_name_field_raw, multi_complementaries_by_Step
+    merge_extra_fields, sequence_step_sharings, filter_dict, get_file_name_field_raw, multi_complementaries_by_Step, \
+    projection_source_fields, project_fields, file_fields, file_stats_fields
+from api.storage import receive_stream, compress_received, place_blob, remove_placed_blob, detach_blob, restore_blob, \
+    discard_file, remove_file, get_blob_path, blob_exists, get_path, read_blob_range
+from api.fasta_index import FastaIndexer, find_entry, get_base_offset
+from api.sequence_stats import SequenceStats
 from api.utils import convert_to_dict, to_dict, normalize
 
+# Number of rows requested to the get_*_available procedures when a listing is not paginated (the maximum INT)
+max_procedure_rows = 2 ** 31 - 1
 
 
 class SampleController:
@@ -54,55 +64,37 @@ class SampleController:
         wrong_list = []
         for key, value in complementaries.items():
             if key in sample and sample[key] is not None:
-                element = value.query.filter_by(id=sample[key]).first()
-
-                if element is None:
+                if not LookupController.exists(value, sample[key]):
                     wrong_list.append(key)
 
         return wrong_list
 
     @classmethod
-    def filter_description_fields(cls, step_id, step):
+    def filter_description_fields(cls, step_id, step, multiples=None):
         # This method is used to replace the ids of the fields that are supposed to be ids to other tables
         # with the description of the element in the other table. This way the user can see the description
         # of the element instead of the id.
-
-        # TODO: implement keyword, publication and hkgn handling.
+        # When a whole list of steps is decorated, the multiple values (keywords, dois, hkgenes) of all of them are
+        # loaded in advance by filter_description_fields_list and received in multiples.
 
         for key, value in complementaries.items():
             if key in step and step[key] is not None:
-                element = value.query.filter_by(id=step[key]).first()
-
-                if element is not None:
-                    step[key] = element.description
-                else:
-                    step[key] = None
+                step[key] = LookupController.get_description(value, step[key])
 
         for key, value in supplementaries.items():
             if key in step:
                 if value['field'] in step:
                     v = step[value['field']]
                     if v is not None:
-                        element = value['table'].query.filter(value['table'].vmin < v, v <= value['table'].vmax).first()
-
-                        if element is not None:
-                            step[key] = element.description
-                        else:
-                            step[key] = None
+                        step[key] = LookupController.classify(value['table'], float(v))
 
         # keywords, publication and hkgn are slightly more complex than the others
         if multi_complementaries_by_Step[step_id] is not None:
-            table = get_step_table(step_id)
-            the_step = table.query.get(step['id'])
-
-            for key, value in multi_complementaries.items():
-                if key in multi_complementaries_by_Step[step_id]:
-                    result = None
-                    values = getattr(the_step, key)
-                    if values is not None and len(values) > 0:
-                        result = [{value['id']:getattr(item, value['id']),
-                                   value['value']:getattr(item, value['value'])} for item in values if isinstance(item, value['class'])]
-                    step[key] = result
+            if multiples is None:
+                multiples = cls.get_multi_complementaries(step_id, [step['id']])
+
+            for key, values in multiples.items():
+                step[key] = values.get(step['id'])
 
         # finally keep only the fields that are not None
         step = {k: v for k, v in step.items() if v is not None}
@@ -110,20 +102,112 @@ class SampleController:
         return step
 
     @classmethod
-    def get_shared_with_user(cls, step, user_id):
-        with DatabaseInstance.get().cursor() as cursor:
+    def filter_description_fields_list(cls, step_id, steps: list, fields: list = None) -> list:
+        """
+        Apply filter_description_fields to a whole list of steps of the same kind. The multiple values of the steps
+        (keywords, dois, hkgenes) are loaded at once for the whole list, so the number of queries doesn't depend on
+        the number of steps.
+        :param step_id: the kind of the steps (SAMPLE, RAW READS, ...).
+        :param steps: the list of steps, as dictionaries.
+        :param fields: if provided, only these fields (and the id) are returned.
+        :return: the list of steps with the descriptions.
+        """
+        if fields is not None:
+            source_fields = projection_source_fields(fields)
+            steps = [project_fields(step, source_fields) for step in steps]
+
+        if multi_complementaries_by_Step[step_id] is not None:
+            multiples = cls.get_multi_complementaries(step_id, [step['id'] for step in steps], fields)
+        else:
+            multiples = None
+
+        result = [cls.filter_description_fields(step_id, step, multiples) for step in steps]
+
+        if fields is not None:
+            returned_fields = set(fields) | {'id'}
+            result = [project_fields(step, returned_fields) for step in result]
+
+        return result
+
+    @classmethod
+    def get_multi_complementaries(cls, step_id, ids: list, fields: list = None) -> dict:
+        """
+        Get the multiple values (keywords, dois, hkgenes) associated to a list of steps. A single query is done for
+        each kind of multiple value.
+        :param step_id: the kind of the steps (SAMPLE, RAW READS, ...).
+        :param ids: the ids of the steps.
+        :param fields: if provided, only the kinds of multiple values in this list are loaded.
+        :return: a dictionary from the kind of multiple value to a dictionary from the step id to the list of values
+        of the step. The steps without values of a kind are not included.
+        """
+        table = get_step_table(step_id)
+        multiples = {}
+
+        with DatabaseInstance.get().new_session() as session:
+            for key in multi_complementaries_by_Step[step_id]:
+                if fields is not None and key not in fields:
+                    continue
+
+                value = multi_complementaries[key]
+                related = value['class']
+                grouped = {}
+
+                if len(ids) > 0:
+                    stmt = (select(table.id, getattr(related, value['id']), getattr(related, value['value']))
+                            .join(getattr(table, key))
+                            .where(table.id.in_(ids)))
+                    for the_id, item_id, item_value in session.execute(stmt):
+                        grouped.setdefault(the_id, []).append({value['id']: item_id, value['value']: item_value})
+
+                multiples[key] = grouped
+
+        return multiples
+
+    @classmethod
+    def get_shared_with_user(cls, step, user_id, after_id: int = 0, limit: int = None, fields: list = None):
+        """
+        Get the steps of a kind that a user can access, sorted by id.
+        :param step: the kind of step (SAMPLE, RAW READS, ...).
+        :param user_id: the user.
+        :param after_id: only the steps with an id greater than this one are returned (keyset pagination).
+        :param limit: the maximum number of steps returned, None to return all of them.
+        :param fields: if provided, only these fields (and the id) of each step are returned.
+        :return: the list of steps.
+        """
+        return [element for chunk in cls.iter_shared_with_user(step, user_id, after_id, limit, fields)
+                for element in chunk]
+
+    @classmethod
+    def iter_shared_with_user(cls, step, user_id, after_id: int = 0, limit: int = None, fields: list = None,
+                              chunk_size: int = STREAM_CHUNK_SIZE):
+        """
+        Generator version of get_shared_with_user. The steps are read from the database and decorated in chunks, so
+        the whole listing is never in memory at once.
+        :param chunk_size: the number of steps of each chunk.
+        :return: a generator of lists of steps.
+        """
+        with DatabaseInstance.get().cursor(streaming=True) as cursor:
             procedure = get_stored_procedure(step)
-            cursor.callproc(procedure, [user_id])
+            cursor.callproc(procedure, [user_id, after_id, limit if limit is not None else max_procedure_rows])
             column_names = [desc[0] for desc in cursor.description]
-            result = list(cursor.fetchall())
 
-        data = [cls.filter_description_fields
-                (step, merge_extra_fields(convert_to_dict(row, column_names))) for row in result]
-
-        return data
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                yield cls.filter_description_fields_list(
+                    step, [merge_extra_fields(convert_to_dict(row, column_names)) for row in rows], fields)
 
     @classmethod
     def get_file_data(cls, step, field):
+        """
+        Get the name and the path of the file set in a field of a step.
+        :param step: the step.
+        :param field: the file field (rreads, treads, assembled, ...).
+        :return: the tuple (file name, absolute path, stored_file row, encoding). The row is None for the files uploaded
+                 before the table existed, which are stored in the uploads directory named after their uuid. The
+                 encoding is how the file is stored: identity or bgzf (see compress_received).
+        """
         if not is_file_field(field):
             raise Exception("The field is not a file")
 
@@ -131,53 +215,286 @@ class SampleController:
         filename = getattr(step, get_file_name_field_raw(field))
         if filedata is None or filename is None:
             raise Exception("The file is not set")
-        if not os.path.exists(os.path.join(UPLOADS_DIR, filedata)):
+
+        stored, encoding = cls.get_stored_file(filedata)
+        path = get_blob_path(stored.sha256) if stored is not None else get_path(filedata)
+        if not os.path.exists(path):
             raise Exception("The file doesn't exist")
 
-        #return filename, open(os.path.join(UPLOADS_DIR, filedata), 'rb')
-        return filename, os.path.abspath(os.path.join(UPLOADS_DIR, filedata))
+        return filename, os.path.abspath(path), stored, encoding
+
+    @classmethod
+    def get_stored_file(cls, file_uuid: str):
+        """
+        Get the size and checksum of a stored file, and how its content is stored.
+        :param file_uuid: the identifier of the file.
+        :return: the pair (stored_file row, encoding). The row is None for the files uploaded before the table existed,
+                 which are not encoded (identity).
+        """
+        stmt = (select(Stored_File, Stored_Blob.encoding)
+                .outerjoin(Stored_Blob, Stored_Blob.sha256 == Stored_File.sha256)
+                .where(Stored_File.uuid == file_uuid))
+        with DatabaseInstance.get().new_session() as session:
+            row = session.execute(stmt).first()
+        if row is None:
+            return None, 'identity'
+        return row[0], row[1] or 'identity'
+
+    @classmethod
+    def get_files_info(cls, step) -> dict:
+        """
+        Get the size, checksum and statistics (see SequenceStats) of the files of a step, with a single query.
+        :param step: the step.
+        :return: a dictionary from the file fields that are set to their size, sha256 and stats. The files uploaded
+                 before the stored_file table existed are not included.
+        """
+        uuids = {field: getattr(step, field) for field in file_fields if getattr(step, field, None) is not None}
+        if len(uuids) == 0:
+            return {}
+
+        stmt = (select(Stored_File.uuid, Stored_File.size, Stored_File.sha256, Stored_Blob.stats)
+                .outerjoin(Stored_Blob, Stored_Blob.sha256 == Stored_File.sha256)
+                .where(Stored_File.uuid.in_(list(uuids.values()))))
+        with DatabaseInstance.get().new_session() as session:
+            rows = {row.uuid: row for row in session.execute(stmt)}
 
+        return {field: {'size': rows[file_uuid].size, 'sha256': rows[file_uuid].sha256, 'stats': rows[file_uuid].stats}
+                for field, file_uuid in uuids.items() if file_uuid in rows}
 
     @classmethod
-    def add_file(cls, step, field, file_data, filename_field, filename):
+    def get_stored_content(cls, user_id: int, sha256: str):
+        """
+        Find a content the user has already uploaded, so it doesn't need to be uploaded again. Only the files of the
+        same user are considered, otherwise knowing the checksum of a file would be enough to get a copy of it.
+        :param user_id: the user.
+        :param sha256: the checksum of the content.
+        :return: the size of the content, None if the user has no stored file with it or the blob doesn't exist.
+        """
+        stmt = (select(Stored_File.size)
+                .where(Stored_File.user_id == user_id)
+                .where(Stored_File.sha256 == sha256)
+                .limit(1))
+        with DatabaseInstance.get().new_session() as session:
+            size = session.execute(stmt).scalar()
+        if size is None or not blob_exists(sha256):
+            return None
+        return size
+
+
+    @classmethod
+    def add_file(cls, step, field, file_uuid, filename, stats: dict = None):
+        """
+        Set the file of a field of a step.
+        :param step: the step to modify.
+        :param field: the file field (rreads, treads, assembled, ...).
+        :param file_uuid: the identifier of the stored file.
+        :param filename: the original name of the file.
+        :param stats: the statistics of the file (see SequenceStats), used to fill the columns of file_stats_fields.
+        :return: the identifier of the file previously set, None if there wasn't any.
+        """
         if not is_file_field(field):
             raise Exception("The field is not a file")
 
-        uuid_file = getattr(step, field)
-        if uuid_file is None:
-            uuid_file = str(uuid.uuid4())
-            setattr(step, field, uuid_file)
-
+        previous_uuid = getattr(step, field)
+        setattr(step, field, file_uuid)
         setattr(step, get_file_name_field_raw(field), filename)
+        if stats is not None:
+            for key, column in file_stats_fields.get(field, {}).items():
+                if hasattr(step, column):
+                    setattr(step, column, stats[key])
         setattr(step, 'updated', datetime.datetime.now())
-        file_data.save(os.path.join(UPLOADS_DIR, uuid_file))
+        return previous_uuid
 
     @classmethod
-    def update_file(cls, sequence: str, step: str, step_id: int, file_id: str, file_name: str, file_data: bytes):
-
-        # Get the reference tables for the sequence and the step
+    def check_file_field(cls, sequence: str, step: str, step_id: int, file_id: str):
+        """
+        Test that a file can be set in a field of a sequence step, before the file is received.
+        :param sequence: the omic sequence.
+        :param step: the sequence step.
+        :param step_id: the identifier of the step.
+        :param file_id: the file field (rreads, treads, assembled, ...).
+        :return:
+        """
         current_class, parent_class = get_reference_tables(sequence, step)
 
-        with DatabaseInstance.get().session() as session:
-            try:
-                if not is_file_field(file_id):
-                    raise Exception("The field {file_id} is not a file field")
+        if not is_file_field(file_id):
+            raise Exception(f"The field {file_id} is not a file field")
 
-                filename_field = get_file_name_field(step, file_id)
+        if get_file_name_field(step, file_id) is None:
+            raise Exception(f"The field {file_id} is not a file of {step}")
 
-                step_to_edit = current_class.query.filter_by(id=step_id).first()
+        # No connection is kept while the file is received
+        with DatabaseInstance.get().new_session() as session:
+            if session.execute(select(current_class.id).filter_by(id=step_id)).first() is None:
+                raise Exception(f"Sequence step {step} with id {step_id} not found")
 
+    @classmethod
+    def update_file(cls, sequence: str, step: str, step_id: int, file_id: str, file_name: str, file_data,
+                    user_id: int):
+        """
+        Store a file and set it in a field of a sequence step. The data is written to the uploads directory while it's
+        read, and the step is updated once the file is safely stored.
+        :param sequence: the omic sequence.
+        :param step: the sequence step.
+        :param step_id: the identifier of the step.
+        :param file_id: the file field (rreads, treads, assembled, ...).
+        :param file_name: the original name of the file.
+        :param file_data: a binary stream with the content of the file (the body of the request or an uploaded file).
+        :param user_id: the user that uploads the file.
+        :return:
+        """
+        cls.check_file_field(sequence, step, step_id, file_id)
+
+        temp_path, size, sha256, stats = cls.receive_file(receive_stream, file_data)
+
+        cls.set_stored_file(sequence, step, step_id, file_id, file_name, sha256, size, user_id, temp_path, stats)
+
+    @classmethod
+    def receive_file(cls, receive, source):
+        """
+        Receive a file into a temporary file of the uploads directory, computing the statistics of its sequences and
+        its FASTA index while it's written, so the file is read only once.
+        :param receive: the function that receives the file, receive_stream or receive_parts.
+        :param source: the stream or the list of parts to receive.
+        :return: the tuple (temporary path, size, sha256, stats). The index, if the file is a FASTA file that can be
+                 indexed, is written next to the temporary file (.fai) and placed along with it.
+        """
+        stats = SequenceStats()
+        indexer = FastaIndexer()
+        temp_path, size, sha256 = receive(source, observers=[stats.update, indexer.update])
+        try:
+            indexer.write(temp_path + '.fai')
+        except Exception as e:
+            discard_file(temp_path)
+            raise e
+        return temp_path, size, sha256, stats.result()
+
+    @classmethod
+    def get_sequence_region(cls, step, field: str, name: str, start: int = None, end: int = None):
+        """
+        Read a sequence, or a range of it, from the FASTA file of a step, seeking directly to its bytes with the index
+        built when the file was stored.
+        :param step: the step.
+        :param field: the file field (assembled).
+        :param name: the name of the sequence (the first word of its header).
+        :param start: the first position of the range, starting at 1. By default, the start of the sequence.
+        :param end: the last position of the range, included. By default (or if it's beyond), the end of the sequence.
+        :return: the tuple (fai entry of the sequence, start, end, generator of the chunks of the range). The chunks
+                 keep the line breaks of the file.
+        """
+        filename, path, stored, encoding = cls.get_file_data(step, field)
+        if stored is None or not os.path.exists(path + '.fai'):
+            raise Exception(f"The file {filename} has no index, it's not a FASTA file or it was uploaded before the "
+                            f"indexes were built")
+
+        entry = find_entry(path + '.fai', name)
+        if entry is None:
+            raise Exception(f"Sequence {name} not found in {filename}")
+
+        start = 1 if start is None else start
+        end = entry.length if end is None else min(end, entry.length)
+        if start < 1 or start > end:
+            raise Exception(f"Invalid range {start}-{end} of the sequence {name}, of length {entry.length}")
+
+        first = get_base_offset(entry, start - 1)
+        last = get_base_offset(entry, end - 1)
+        return entry, start, end, read_blob_range(path, encoding, first, last - first + 1)
+
+    @classmethod
+    def set_stored_file(cls, sequence: str, step: str, step_id: int, file_id: str, file_name: str, sha256: str,
+                        size: int, user_id: int, temp_path: str = None, stats: dict = None):
+        """
+        Set a content in a field of a sequence step. The content is stored once in the blob store, and each field that
+        uses it has its own stored_file row, counted in the refcount of the blob. The field, the file name, the rows and
+        the refcounts are changed in the same transaction. The blob of the file previously set is removed if nothing
+        else uses it.
+        :param sequence: the omic sequence.
+        :param step: the sequence step.
+        :param step_id: the identifier of the step.
+        :param file_id: the file field (rreads, treads, assembled, ...).
+        :param file_name: the original name of the file.
+        :param sha256: the checksum of the content.
+        :param size: its size in bytes.
+        :param user_id: the user that uploads the file.
+        :param temp_path: the received file, moved to the blob store if the content is not stored yet. None if the
+                          content is already stored (see get_stored_content).
+        :param stats: the statistics of the content (see SequenceStats), kept with the blob. If None, the ones of the
+                      blob are used, if it's already stored.
+        :return:
+        """
+        current_class, parent_class = get_reference_tables(sequence, step)
+        file_uuid = str(uuid.uuid4())
+        previous_uuid = None
+        previous_stored = None
+        detached = None
+        placed = None
+
+        # The compression is done before the transaction, so the row of the blob isn't locked meanwhile. If another
+        # upload stores the same content first, its row and blob are kept and this file is discarded; otherwise this
+        # file is placed, so the encoding of the row is always the one of the stored blob.
+        encoding, stored_size = 'identity', size
+        if temp_path is not None and not blob_exists(sha256):
+            try:
+                temp_path, encoding, stored_size = compress_received(temp_path)
+            except Exception as e:
+                discard_file(temp_path)
+                raise e
+
+        with DatabaseInstance.get().session() as session:
+            try:
+                stmt = select(current_class).filter_by(id=step_id)
+                step_to_edit = session.execute(stmt).scalar_one_or_none()
                 if step_to_edit is None:
                     raise Exception(f"Sequence step {step} with id {step_id} not found")
 
-                cls.add_file(step_to_edit, file_id, file_data, filename_field, file_name)
-
-                session.query(current_class).filter_by(id=step_id).update(step_to_edit.as_dict())
+                # The upsert locks the row of the blob until the commit, so the blob can't be detached meanwhile
+                stmt = insert(Stored_Blob).values(sha256=sha256, size=size, refcount=1, encoding=encoding,
+                                                  stored_size=stored_size, stats=stats)
+                stmt = stmt.on_duplicate_key_update(refcount=Stored_Blob.refcount + 1,
+                                                    stats=func.coalesce(Stored_Blob.stats, stmt.inserted.stats))
+                session.execute(stmt)
+                blob = session.execute(select(Stored_Blob.refcount, Stored_Blob.stats)
+                                       .where(Stored_Blob.sha256 == sha256)).one()
+                stats = blob.stats
+                # A refcount of 1 means the row has just been inserted: any blob found is not backed by a row
+                inserted = blob.refcount == 1
+                if temp_path is not None:
+                    placed = place_blob(temp_path, sha256, replace=inserted)
+                    temp_path = None
+                elif inserted or not blob_exists(sha256):
+                    raise Exception("The file doesn't exist")
+
+                session.add(Stored_File(uuid=file_uuid, size=size, sha256=sha256, user_id=user_id))
+                previous_uuid = cls.add_file(step_to_edit, file_id, file_uuid, file_name, stats)
+
+                if previous_uuid is not None:
+                    previous_stored = session.execute(
+                        select(Stored_File).where(Stored_File.uuid == previous_uuid)).scalar_one_or_none()
+                if previous_stored is not None:
+                    previous_sha256 = previous_stored.sha256
+                    session.delete(previous_stored)
+                    blob = session.execute(
+                        select(Stored_Blob).where(Stored_Blob.sha256 == previous_sha256).with_for_update()
+                    ).scalar_one_or_none()
+                    if blob is not None:
+                        blob.refcount -= 1
+                        if blob.refcount <= 0:
+                            session.delete(blob)
+                            detached = detach_blob(previous_sha256)
                 session.commit()
             except Exception as e:
                 session.rollback()
+                remove_placed_blob(sha256, placed)
+                if detached is not None:
+                    restore_blob(detached, previous_sha256)
+                discard_file(temp_path)
                 raise e
 
+        discard_file(detached)
+        if previous_uuid is not None and previous_stored is None:
+            # Stored before the blob store existed
+            remove_file(previous_uuid)
+
     # @classmethod
     # def update_sample(cls, sample_id: int, new_data: dict):
     #     with DatabaseInstance.get().session() as session:
@@ -256,6 +573,7 @@ class SampleController:
                     raise Exception("Sample with id {sample_id} not found")
                 sample_to_delete = sample[0]
                 session.delete(sample_to_delete)
+                AccessController.remove_step(session, 'SAMPLE', sample_id)
                 session.commit()
             except Exception as e:
                 session.rollback()
@@ -263,92 +581,70 @@ class SampleController:
 
     @classmethod
     def get_access_mode(cls, table, user_id, step_id: int):
-        # accessible_list = cls.get_samples_shared_with_user(user_id)
-        # for sample in accessible_list:
-        #     if sample['id'] == sample_id:
-        #         return sample['access_mode']
-        # return None
-        the_step = table.query.get(step_id)
-
-        if the_step.is_public:
-            return 'read'
-
-        if the_step.user_id == user_id:
-            return 'readwrite'
-
-        for shared_user in the_step.user_shared_sample:
-            if shared_user.user_id == user_id:
-                return shared_user.access_mode
-
-        for shared_group in the_step.group_shared_sample:
-            for user_group in shared_group.group.user_has_group:
-                if user_id == user_group.user_id and user_group.relation != 'invited':
-                    return shared_group.access_mode
-
-        return None
+        """
+        Check the access mode of the user to a step, given its table.
+        :param table: the table of the step
+        :param user_id: the user
+        :param step_id: the step id
+        :return: the corresponding access mode o None if the user doesn't have access to the step
+        """
+        return AccessController.get_access_mode(table.__table__.name, user_id, step_id)
 
     @classmethod
     def get_step_access_mode(cls, sequence_step: str, user_id, step_id: int):
         """
-        Check the access mode of the user to the sequence step
+        Check the access mode of the user to the sequence step, as owner or through a share, to modify it. Being public
+        doesn't grant any access here, nor limits the owner to read it (see AccessController.get_own_access_mode).
         :param sequence_step: the kind of step
         :param user_id: the user
         :param step_id: the step id
         :return: the corresponding access mode o None if the user doesn't have access to the step
         """
-        # TODO: implement this method correctly
-
-        # accessible_list = cls.get_samples_shared_with_user(user_id)
-        # for sample in accessible_list:
-        #     if sample['id'] == sample_id:
-        #         return sample['access_mode']
-        # return None
-
-        # user = User.query.get(user_id)
-        table = get_step_table(sequence_step)
-        step = table.query.get(step_id)
-
-        if step.user_id == user_id:
-            return 'readwrite'
-
-        sharing = get_sharing_tables(sequence_step)
-        sharing_groups_table = sharing['group']
-        sharing_users_table = sharing['user']
-
-        if sharing_users_table is not None:
-            shared_user = sharing_users_table.query.filter(
-                sharing_users_table.user_id == step.user_id and sharing_users_table.shared_id == step_id).first()
-            if shared_user is not None:
-                return shared_user.access_mode
-
-        if sharing_groups_table is not None:
-            for shared_group in sharing_groups_table.query.filter(sharing_groups_table.shared_id == step_id):
-                for user_group in shared_group.group.user_has_group:
-                    if user_id.id == user_group.user_id and user_group.relation != 'invited':
-                        return shared_group.access_mode
-
-        # for shared_user in step.user_shared_experiment:
-        #    if shared_user.user_id == user_id:
-        #        return shared_user.access_mode
-
-        # for shared_group in step.group_shared_experiment:
-        #    for user_group in shared_group.group.user_has_group:
-        #        if user_id.id == user_group.user_id and user_group.relation != 'invited':
-        #            return shared_group.access_mode
-
-        return None
+        return AccessController.get_own_access_mode(get_step_type(sequence_step), user_id, step_id)
 
     @classmethod
     def list_samples(cls):
         return to_dict(Sample.query.all())
 
     @classmethod
-    def list_public(cls, step):
+    def list_public(cls, step, after_id: int = 0, limit: int = None, fields: list = None):
+        """
+        Get the public steps of a kind, sorted by id.
+        :param step: the kind of step (SAMPLE, RAW READS, ...).
+        :param after_id: only the steps with an id greater than this one are returned (keyset pagination).
+        :param limit: the maximum number of steps returned, None to return all of them.
+        :param fields: if provided, only these fields (and the id) of each step are returned.
+        :return: the list of steps.
+        """
+        return [element for chunk in cls.iter_public(step, after_id, limit, fields) for element in chunk]
+
+    @classmethod
+    def iter_public(cls, step, after_id: int = 0, limit: int = None, fields: list = None,
+                    chunk_size: int = STREAM_CHUNK_SIZE):
+        """
+        Generator version of list_public. The steps are read from the database and decorated in chunks, so the whole
+        listing is never in memory at once.
+        :param chunk_size: the number of steps of each chunk.
+        :return: a generator of lists of steps.
+        """
         table = get_step_table(step)
-        result = table.query.filter_by(is_public=True).all()
 
-        result = [cls.filter_description_fields(merge_extra_fields(element.as_dict())) for element in result]
-        return result
+        # When a projection is requested, only the needed columns are read from the database
+        if fields is not None:
+            source_fields = projection_source_fields(fields)
+            columns = [column for column in table.__table__.columns if column.name in source_fields]
+        else:
+            columns = list(table.__table__.columns)
+
+        stmt = select(*columns).where(table.is_public == True).where(table.id > after_id).order_by(table.id)
+        if limit is not None:
+            stmt = stmt.limit(limit)
+
+        with DatabaseInstance.get().new_session() as session:
+            result = session.execute(stmt.execution_options(yield_per=chunk_size))
+            for rows in result.partitions():
+                yield cls.filter_description_fields_list(
+                    step, [merge_extra_fields(dict(row._mapping)) for row in rows], fields)
 
     @classmethod
     def make_public(cls, step, step_id, owner):
@@ -365,6 +661,7 @@ class SampleController:
                     raise Exception("User is not the owner of the {step} with id {step_id}}")
 
                 setattr(item, 'is_public', 1)
+                AccessController.make_public(session, step, step_id)
 
                 session.commit()
             except Exception as e:
@@ -393,6 +690,11 @@ class SampleController:
                 else:
                     setattr(shared_step, 'access_mode', 'readwrite' if readwrite else 'read')
 
+                if type == 'user':
+                    AccessController.share_user(session, step, step_id, user_group_id, shared_step.access_mode)
+                else:
+                    AccessController.share_group(session, step, step_id, user_group_id, shared_step.access_mode)
+
                 session.commit()
             except Exception as e:
                 session.rollback()
@@ -462,7 +764,10 @@ class SampleController:
                 the_shared_step = shared_table.query.filter_by(shared_id=shared_id, group_id=group_id).first()
 
                 if the_shared_step is not None:
-                    session.delete(shared_table).where(shared_id == shared_id).where(group_id == group_id)
+                    session.execute(delete(shared_table)
+                                    .where(shared_table.shared_id == shared_id)
+                                    .where(shared_table.group_id == group_id))
+                    AccessController.unshare_group(session, step, shared_id, group_id)
                     session.commit()
                 else:
                     session.rollback()
@@ -481,10 +786,10 @@ class SampleController:
                 shared_step = shared_table.query.filter_by(shared_id=step_id, user_id=user_id).first()
                 if shared_step is None:
                     raise Exception(f"User {user_id} doesn't have access to the sequence step {step} with id {step_id}")
-                # TODO: this doesn't work. the database is not updated
-                # session.delete(shared_step)
-                delete(shared_table).where(shared_table.shared_id == step_id).where(shared_table.user_id == user_id)
-                # session.delete(shared_table).where(shared_id=step_id).where(user_id=user_id)
+                session.execute(delete(shared_table)
+                                .where(shared_table.shared_id == step_id)
+                                .where(shared_table.user_id == user_id))
+                AccessController.unshare_user(session, step, step_id, user_id)
                 session.commit()
             except Exception as e:
                 session.rollback()
@@ -535,7 +840,11 @@ class SampleController:
                 step_to_create.user_id = user_id
 
                 session.add(step_to_create)
-                # session.flush()
+                # The id of the new step is needed to register its owner
+                session.flush()
+                AccessController.grant_owner(session, step, step_to_create.id, user_id)
+                if step_to_create.is_public:
+                    AccessController.make_public(session, step, step_to_create.id)
                 result = step_to_create.as_dict()
 
                 session.commit()
@@ -0,0 +1,257 @@
+import datetime
+import io
+import json
+import os
+import re
+import shutil
+import time
+import uuid
+
+from api.config import UPLOADS_DIR, UPLOAD_EXPIRY_HOURS, UPLOAD_COMPLETION_TIMEOUT
+from api.controllers.SampleController import SampleController
+from api.storage import write_stream, receive_parts, sync_directory, discard_file
+
+# The parts of the uploads in progress are kept in a subdirectory of the uploads directory, one directory per upload
+parts_dir = os.path.join(UPLOADS_DIR, '.parts')
+
+# The identifiers of the uploads are generated by the API (uuid4 in hexadecimal)
+upload_id_pattern = re.compile(r'^[0-9a-f]{32}$')
+
+# The checksums declared by the clients
+sha256_pattern = re.compile(r'^[0-9a-f]{64}$')
+
+# Maximum number of parts of an upload
+max_upload_parts = 10000
+
+# Minimum time, in seconds, between two searches of expired uploads in a worker, and time of the next one
+cleanup_interval = 10 * 60
+next_cleanup = 0.0
+
+
+def get_upload_dir(upload_id: str) -> str:
+    return os.path.join(parts_dir, upload_id)
+
+
+def get_part_path(upload_id: str, part: int) -> str:
+    return os.path.join(get_upload_dir(upload_id), f'part-{part:05d}')
+
+
+def is_expired(upload_dir: str) -> bool:
+    """
+    :param upload_dir: the directory of an upload, also while it's being completed.
+    :return: true if the upload was created more than UPLOAD_EXPIRY_HOURS ago. An upload without description (the
+             worker died while creating it) expires the same time after the last change of its directory.
+    """
+    try:
+        with open(os.path.join(upload_dir, 'upload.json')) as fin:
+            created = datetime.datetime.fromisoformat(json.load(fin)['created'])
+        age = (datetime.datetime.now() - created).total_seconds()
+    except (FileNotFoundError, ValueError, KeyError):
+        age = time.time() - os.stat(upload_dir).st_mtime
+    return age > UPLOAD_EXPIRY_HOURS * 60 * 60
+
+
+class UploadController:
+    """
+    Resumable uploads of big files. An upload is initiated for a file field of a sequence step, then its parts are
+    uploaded (in any order, also in parallel, and again if one fails) and finally it's completed: the parts are
+    concatenated into the stored file, that is set in the step. The state of the uploads is kept in the disk, so it's
+    shared by all the workers and survives restarts.
+    """
+
+    @classmethod
+    def create_upload(cls, uid: str, sequence: str, step: str, step_id: int, field: str, filename: str,
+                      sha256: str = None) -> str:
+        """
+        Initiate an upload.
+        :param uid: the user uploading the file, the only one that can upload its parts.
+        :param sequence: the omic sequence.
+        :param step: the sequence step.
+        :param step_id: the identifier of the step.
+        :param field: the file field (rreads, rreads2, treads, assembled, pgenes).
+        :param filename: the original name of the file.
+        :param sha256: the checksum of the file, if the client knows it. The upload fails if the parts don't match it.
+        :return: the identifier of the upload.
+        """
+        SampleController.check_file_field(sequence, step, step_id, field)
+        if sha256 is not None and not sha256_pattern.match(sha256):
+            raise Exception("The checksum has to be a sha256 in hexadecimal")
+        cls.remove_expired_uploads()
+
+        upload_id = uuid.uuid4().hex
+        upload_dir = get_upload_dir(upload_id)
+        os.makedirs(upload_dir)
+
+        description = {'uid': uid, 'sequence': sequence, 'step': step, 'id': step_id, 'field': field,
+                       'filename': filename, 'sha256': sha256, 'created': datetime.datetime.now().isoformat()}
+        write_stream(io.BytesIO(json.dumps(description).encode()), os.path.join(upload_dir, 'upload.json'))
+        return upload_id
+
+    @classmethod
+    def reuse_content(cls, user_id: int, sequence: str, step: str, step_id: int, field: str, filename: str,
+                      sha256: str):
+        """
+        Set in a sequence step a content the user has already uploaded, without uploading it again. The content is
+        shared in the blob store, so it doesn't take more space.
+        :param user_id: the user uploading the file.
+        :param sequence: the omic sequence.
+        :param step: the sequence step.
+        :param step_id: the identifier of the step.
+        :param field: the file field (rreads, rreads2, treads, assembled, pgenes).
+        :param filename: the original name of the file.
+        :param sha256: the checksum of the file.
+        :return: the size of the file, None if the user hasn't uploaded this content (it has to be uploaded).
+        """
+        SampleController.check_file_field(sequence, step, step_id, field)
+        size = SampleController.get_stored_content(user_id, sha256)
+        if size is None:
+            return None
+        SampleController.set_stored_file(sequence, step, step_id, field, filename, sha256, size, user_id)
+        return size
+
+    @classmethod
+    def get_upload(cls, upload_id: str, uid: str):
+        """
+        Get the description of an upload in progress.
+        :param upload_id: the identifier of the upload.
+        :param uid: the user requesting it.
+        :return: the description of the upload, None if it doesn't exist or it belongs to another user.
+        """
+        if not upload_id_pattern.match(upload_id):
+            return None
+        cls.remove_expired_uploads()
+        try:
+            with open(os.path.join(get_upload_dir(upload_id), 'upload.json')) as fin:
+                description = json.load(fin)
+            if is_expired(get_upload_dir(upload_id)):
+                return None
+        except FileNotFoundError:
+            return None
+        return description if description['uid'] == uid else None
+
+    @classmethod
+    def list_parts(cls, upload_id: str) -> list:
+        """
+        :param upload_id: the identifier of the upload.
+        :return: the list of parts already received, as dictionaries with the part number and its size.
+        """
+        parts = []
+        for name in os.listdir(get_upload_dir(upload_id)):
+            if name.startswith('part-'):
+                size = os.path.getsize(os.path.join(get_upload_dir(upload_id), name))
+                parts.append({'part': int(name[len('part-'):]), 'size': size})
+        return sorted(parts, key=lambda part: part['part'])
+
+    @classmethod
+    def store_part(cls, upload_id: str, part: int, stream):
+        """
+        Store a part of an upload, replacing it if it was already received.
+        :param upload_id: the identifier of the upload.
+        :param part: the number of the part, from 1 to max_upload_parts.
+        :param stream: the content of the part.
+        :return: the pair (size, sha256) of the part.
+        """
+        if part < 1 or part > max_upload_parts:
+            raise Exception(f"The part number has to be between 1 and {max_upload_parts}")
+        return write_stream(stream, get_part_path(upload_id, part))
+
+    @classmethod
+    def complete_upload(cls, upload_id: str, description: dict, user_id: int, parts: int = None):
+        """
+        Concatenate the parts of an upload and set the resulting file in the sequence step. The parts have to be
+        numbered from 1 without gaps.
+        :param upload_id: the identifier of the upload.
+        :param description: the description of the upload (see get_upload).
+        :param user_id: the user uploading the file.
+        :param parts: the number of parts expected, if it's provided.
+        :return: the pair (size, sha256) of the file.
+        """
+        received = [part['part'] for part in cls.list_parts(upload_id)]
+        if len(received) == 0:
+            raise Exception("No part has been uploaded")
+        if received != list(range(1, len(received) + 1)):
+            missing = sorted(set(range(1, received[-1] + 1)) - set(received))
+            raise Exception(f"Parts {missing} have not been uploaded")
+        if parts is not None and parts != len(received):
+            raise Exception(f"{len(received)} parts have been uploaded, instead of {parts}")
+
+        # The directory is renamed first, so the upload can't be completed twice at the same time
+        upload_dir = get_upload_dir(upload_id)
+        completing_dir = f'{upload_dir}.completing'
+        try:
+            os.rename(upload_dir, completing_dir)
+        except FileNotFoundError:
+            raise Exception(f"The upload {upload_id} is already being completed")
+        # The modification time of the directory tells when the completion started (see remove_expired_uploads)
+        os.utime(completing_dir)
+
+        try:
+            paths = [os.path.join(completing_dir, os.path.basename(get_part_path(upload_id, part)))
+                     for part in received]
+            temp_path, size, sha256, stats = SampleController.receive_file(receive_parts, paths)
+            expected = description.get('sha256')
+            if expected is not None and expected != sha256:
+                discard_file(temp_path)
+                raise Exception(f"The checksum of the file ({sha256}) doesn't match the expected one ({expected})")
+            SampleController.set_stored_file(description['sequence'], description['step'], description['id'],
+                                             description['field'], description['filename'], sha256, size, user_id,
+                                             temp_path, stats)
+        except Exception:
+            # The parts are kept, so the upload can be completed again
+            os.rename(completing_dir, upload_dir)
+            raise
+
+        shutil.rmtree(completing_dir, ignore_errors=True)
+        sync_directory(parts_dir)
+        return size, sha256
+
+    @classmethod
+    def abort_upload(cls, upload_id: str):
+        """
+        Remove an upload in progress and its parts.
+        :param upload_id: the identifier of the upload.
+        :return:
+        """
+        shutil.rmtree(get_upload_dir(upload_id), ignore_errors=True)
+
+    @classmethod
+    def remove_expired_uploads(cls, force: bool = False) -> int:
+        """
+        Remove the uploads not completed UPLOAD_EXPIRY_HOURS after they were created, with their parts. The completions
+        interrupted (not finished after UPLOAD_COMPLETION_TIMEOUT seconds) are undone, so the upload can be completed
+        again, or removed if the upload has expired. The search is done at most once every cleanup_interval seconds in
+        each worker.
+        :param force: search even if the last search was less than cleanup_interval seconds ago.
+        :return: the number of uploads removed.
+        """
+        global next_cleanup
+        if not force and time.monotonic() < next_cleanup:
+            return 0
+        next_cleanup = time.monotonic() + cleanup_interval
+
+        try:
+            names = os.listdir(parts_dir)
+        except FileNotFoundError:
+            return 0
+
+        removed = 0
+        for name in names:
+            upload_id, _, suffix = name.partition('.')
+            if not upload_id_pattern.match(upload_id) or suffix not in ('', 'completing'):
+                continue
+            path = os.path.join(parts_dir, name)
+            try:
+                if suffix == 'completing':
+                    if time.time() - os.stat(path).st_mtime < UPLOAD_COMPLETION_TIMEOUT:
+                        continue
+                    if not is_expired(path):
+                        os.rename(path, get_upload_dir(upload_id))
+                        continue
+                elif not is_expired(path):
+                    continue
+                shutil.rmtree(path, ignore_errors=True)
+                removed += 1
+            except FileNotFoundError:
+                # Completed, aborted or recovered by another worker meanwhile
+                continue
+        return removed
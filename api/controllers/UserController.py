@@ -1,19 +1,34 @@
 import datetime
+from collections import namedtuple
 
 from sqlalchemy import select
 # from werkzeug.security import generate_password_hash, check_password_hash
 
 import uuid
 
+from api.cache import TimedCache
+from api.config import STREAM_CHUNK_SIZE, IDENTITY_CACHE_TTL
+from api.controllers.AccessController import AccessController
 from api.db.db import DatabaseInstance
 from api.db.models import User, Sample, Author
 from api.field_utils import filter_dict
-from api.main import bcrypt
+from api.passwords import hash_password, check_password
 from api.utils import to_dict
 
+# Immutable summary of a user, enough to authorize most of the requests
+UserIdentity = namedtuple('UserIdentity', ['id', 'uid', 'email', 'verified'])
+
+
+def _load_identity(uid: str):
+    with DatabaseInstance.get().new_session() as session:
+        row = session.execute(select(User.id, User.uid, User.email, User.verified).where(User.uid == uid)).first()
+    return UserIdentity(*row) if row is not None else None
+
 
 class UserController:
 
+    _identities = TimedCache(_load_identity, IDENTITY_CACHE_TTL)
+
     @classmethod
     def list_users(cls):
         """
@@ -22,6 +37,19 @@ class UserController:
         """
         return to_dict(User.query.all())
 
+    @classmethod
+    def iter_users(cls, chunk_size: int = STREAM_CHUNK_SIZE):
+        """
+        Generator version of list_users. The users are read from the database in chunks, so the whole list is never in
+        memory at once.
+        :param chunk_size: the number of users of each chunk.
+        :return: a generator of lists of users.
+        """
+        with DatabaseInstance.get().new_session() as session:
+            result = session.execute(select(User).order_by(User.id).execution_options(yield_per=chunk_size))
+            for users in result.scalars().partitions():
+                yield [user.as_dict() for user in users]
+
     @classmethod
     def get_user(cls, user_id: int):
         """
@@ -41,6 +69,20 @@ class UserController:
         return User.query.filter(User.uid == uid).first()  # .as_dict()
         # return User.get_by_uid(uid)
 
+    @classmethod
+    def get_identity_by_uid(cls, uid: str):
+        """
+        This method returns the identity of a user by its uid, without querying the database if it has been requested
+        recently. Use get_user_by_uid to get the whole user.
+        :param uid: the (unique) uid of the user.
+        :return: the UserIdentity (id, uid, email, verified) if the user exists, None otherwise.
+        """
+        identity = cls._identities.get(uid)
+        if identity is None:
+            # Don't remember the unknown uids
+            cls._identities.invalidate(uid)
+        return identity
+
     @classmethod
     def get_user_by_email(cls, email: str):
         """
@@ -61,7 +103,7 @@ class UserController:
         user = UserController.get_user_by_email(email)
 
         # if not user or not check_password_hash(user.password, passwd):
-        if not user or not bcrypt.check_password_hash(user.password, passwd):
+        if not user or not check_password(user.password, passwd):
             return None
         else:
             return user
@@ -81,7 +123,7 @@ class UserController:
 
         # encrypt the password
         # new_user.password = generate_password_hash(params['password'], method='sha256')
-        new_user.password = bcrypt.generate_password_hash(params['password']).decode('utf-8')
+        new_user.password = hash_password(params['password'])
 
         user_created = None
 
@@ -150,6 +192,7 @@ class UserController:
 
                 session.add(user_to_verify)
                 session.commit()
+                cls._identities.invalidate(uid)
                 return True
             except Exception as e:
                 session.rollback()
@@ -161,9 +204,8 @@ class UserController:
         Method to update the data of a user.
         :param uid: the uid to identify the user to update.
         :param new_data: the data to update.
-        :return:
+        :return: the updated user, without the fields that are not returned.
         """
-        user_to_edit = None
         with DatabaseInstance.get().session() as session:
             try:
                 stmt = select(User).filter_by(uid=uid)
@@ -178,7 +220,7 @@ class UserController:
                 if 'surname' in new_data:
                     user_to_edit.surname = new_data['surname']
                 if 'password' in new_data:
-                    user_to_edit.password = new_data['password']
+                    user_to_edit.password = hash_password(new_data['password'])
                 # uid is an internal identifier, it should not be changed
                 # so this last condition is not really necessary
                 #if 'uid' in new_data:
@@ -199,13 +241,16 @@ class UserController:
                     raise Exception(f'The email "{user_to_edit.email}" is already in use')
 
                 session.add(user_to_edit)
+                session.flush()
+                # The attributes expire with the commit, so the user is converted before it
+                updated_user = filter_dict(user_to_edit.as_dict())
                 session.commit()
+                cls._identities.invalidate(uid)
             except Exception as e:
                 session.rollback()
                 raise e
 
-        # It may be necessary avoid the lazy loading of the user's samples
-        return filter_dict(user_to_edit.as_dict())
+        return updated_user
 
     @classmethod
     def delete_user(cls, uid: str):
@@ -243,8 +288,10 @@ class UserController:
                     author.email = user_to_delete.email
                     session.add(author)
 
+                AccessController.remove_user(session, user_to_delete.id)
                 session.delete(user_to_delete)
                 session.commit()
+                cls._identities.invalidate(uid)
             except Exception as e:
                 session.rollback()
                 raise e
@@ -1,15 +1,24 @@
+import itertools
+import math
+import threading
 import time
-from typing import Self, Optional
+from contextlib import contextmanager
+from typing import Self, Optional, Callable
 
 import MySQLdb
+import MySQLdb.cursors
 
+from flask import g, has_request_context, request
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy import create_engine
+from flask_sqlalchemy.session import Session as FlaskSession
+from itsdangerous import URLSafeTimedSerializer, BadSignature
+from sqlalchemy import create_engine, text
 # ##from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.ext.automap import automap_base
-from sqlalchemy.orm import sessionmaker, scoped_session
+from sqlalchemy.orm import sessionmaker, scoped_session, Session
 
 from api import config, log
+from api.db.schema_cache import load_metadata
 
 DATABASE_USERNAME = config.MYSQL_USER
 DATABASE_PASSWORD = config.MYSQL_PASSWORD
@@ -20,6 +29,12 @@ DATABASE_NAME = config.MYSQL_DATABASE
 SQLALCHEMY_DATABASE_URI = (f"mysql://{DATABASE_USERNAME}:{DATABASE_PASSWORD}"
                            f"@{DATABASE_HOST}:{DATABASE_PORT}/{DATABASE_NAME}")
 
+# The requests with these methods don't modify data, so they can be served by a replica
+read_only_methods = ('GET', 'HEAD', 'OPTIONS')
+
+# Cookie sent to the users that modify data, so every worker knows they have to read from the primary for a while
+last_write_cookie = 'halodb_last_write'
+
 # ##Base = declarative_base()
 Base = automap_base()
 
@@ -28,24 +43,205 @@ def pluralize_collection(base, local_cls, referred_cls, constraint):
     return referred_cls.__name__.lower()
 
 
+def get_replica_uri(host: str) -> str:
+    """
+    :param host: a replica, as host or host:port.
+    :return: the database uri of the replica, with the same credentials and database as the primary.
+    """
+    if ':' not in host:
+        host = f'{host}:{DATABASE_PORT}'
+    return f"mysql://{DATABASE_USERNAME}:{DATABASE_PASSWORD}@{host}/{DATABASE_NAME}"
+
+
+def create_pooled_engine(uri: str = SQLALCHEMY_DATABASE_URI):
+    """
+    Create an engine of the worker, with the pool configured in api.config.
+    :param uri: the database, the primary by default.
+    :return: the engine.
+    """
+    return create_engine(uri,
+                         pool_size=config.DB_POOL_SIZE,
+                         max_overflow=config.DB_MAX_OVERFLOW,
+                         pool_timeout=config.DB_POOL_TIMEOUT,
+                         pool_recycle=config.DB_POOL_RECYCLE,
+                         pool_pre_ping=config.DB_POOL_PRE_PING)
+
+
+class ReplicaRouter:
+    """
+    Chooses the database of each query: the primary, or a replica when the request doesn't modify data. A user that
+    has modified data keeps reading from the primary for some seconds, so the changes are seen even if the replicas
+    are behind. The last write is sent to the user in a signed cookie, that expires with the stickiness, so the
+    requests that reach any other worker read from the primary too. The workers also remember their own last writes,
+    for the clients that don't send the cookies back.
+
+    The choice is made once per request: all the queries of a request read from the same database, so they see the
+    same state of the data even if the replicas are not equally up to date.
+    """
+
+    def __init__(self, replicas: list, sticky_seconds: float, get_signing_key: Callable[[], str] = None):
+        """
+        :param replicas: the engines of the replicas (can be empty).
+        :param sticky_seconds: the time a user keeps reading from the primary after a write.
+        :param get_signing_key: returns the key that signs the cookie of the last write. Without it, the cookie is not
+                                used and only the writes of this worker are remembered.
+        """
+        self._replicas = itertools.cycle(replicas) if len(replicas) > 0 else None
+        self._sticky_seconds = sticky_seconds
+        self._last_writes = {}
+        self._lock = threading.Lock()
+        self.get_signing_key = get_signing_key
+
+    def _get_serializer(self) -> Optional[URLSafeTimedSerializer]:
+        if self.get_signing_key is None:
+            return None
+        # The key is read every time, it changes when the credentials are rotated
+        return URLSafeTimedSerializer(self.get_signing_key(), salt=last_write_cookie)
+
+    def record_write(self, uid: str, response=None):
+        """
+        Remember that a user has modified data.
+        :param uid: the uid of the user.
+        :param response: the response to the request that modified the data, it gets the cookie of the last write.
+        :return:
+        """
+        now = time.monotonic()
+        with self._lock:
+            self._last_writes[uid] = now
+            # Forget the writes that don't matter anymore, so the dictionary doesn't grow
+            if len(self._last_writes) > 1000:
+                self._last_writes = {user: when for user, when in self._last_writes.items()
+                                     if now - when < self._sticky_seconds}
+
+        serializer = self._get_serializer()
+        if response is not None and serializer is not None:
+            response.set_cookie(last_write_cookie, serializer.dumps(uid), max_age=math.ceil(self._sticky_seconds),
+                                httponly=True)
+
+    def _wrote_recently(self, uid: str) -> bool:
+        """
+        :param uid: the uid of the user of the current request.
+        :return: true if the user has modified data during the last sticky seconds, in any worker.
+        """
+        with self._lock:
+            last_write = self._last_writes.get(uid)
+        if last_write is not None and time.monotonic() - last_write < self._sticky_seconds:
+            return True
+
+        cookie = request.cookies.get(last_write_cookie)
+        serializer = self._get_serializer()
+        if cookie is None or serializer is None:
+            return False
+        try:
+            # The signature includes the time of the write, it's rejected once the stickiness has expired
+            return serializer.loads(cookie, max_age=self._sticky_seconds) == uid
+        except BadSignature:
+            return False
+
+    def get_replica(self):
+        """
+        :return: the engine of a replica if the current request can read from it, None if it has to use the primary.
+        """
+        if self._replicas is None or not has_request_context() or request.method not in read_only_methods:
+            return None
+        if 'replica' in g:
+            return g.replica
+
+        uid = g.get('uid')
+        if uid is not None and self._wrote_recently(uid):
+            replica = None
+        else:
+            with self._lock:
+                replica = next(self._replicas)
+        g.replica = replica
+        return replica
+
+
+class RoutingSession(Session):
+    """
+    Session that reads from a replica when the ReplicaRouter allows it. The flushes always go to the primary.
+    """
+    router: ReplicaRouter = None
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        replica = self.router.get_replica() if self.router is not None and not self._flushing else None
+        if replica is not None:
+            return replica
+        return super().get_bind(mapper=mapper, clause=clause, **kwargs)
+
+
+class RoutingFlaskSession(FlaskSession):
+    """
+    The same as RoutingSession, for the Model.query calls of Flask-SQLAlchemy.
+    """
+    router: ReplicaRouter = None
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        replica = self.router.get_replica() if self.router is not None and not self._flushing else None
+        if replica is not None:
+            return replica
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+class SharedEngineSQLAlchemy(SQLAlchemy):
+    """
+    Flask-SQLAlchemy extension that uses the engine of the DatabaseInstance instead of creating its own, so the
+    Model.query calls and the sessions share the same connection pool.
+    """
+
+    def __init__(self, engine, **kwargs):
+        self._shared_engine = engine
+        super().__init__(**kwargs)
+
+    def _make_engine(self, bind_key, options, app):
+        if bind_key is None:
+            return self._shared_engine
+        return super()._make_engine(bind_key, options, app)
+
+
 class DatabaseInstance:
     _instance = None
 
     def __init__(self):
-        self.db = SQLAlchemy(model_class=Base)
-        self.engine = create_engine(SQLALCHEMY_DATABASE_URI)
+        self.engine = create_pooled_engine()
+        self.replicas = [create_pooled_engine(get_replica_uri(host)) for host in config.MYSQL_REPLICA_HOSTS]
+        self.router = ReplicaRouter(self.replicas, config.REPLICA_STICKY_SECONDS)
+        RoutingSession.router = self.router
+        RoutingFlaskSession.router = self.router
 
-        Base.prepare(autoload_with=self.engine,
-                     name_for_collection_relationship=pluralize_collection)
+        self.db = SharedEngineSQLAlchemy(self.engine, model_class=Base,
+                                         session_options={'class_': RoutingFlaskSession})
+
+        # The tables are reflected only if the schema has changed since the last snapshot
+        for table in load_metadata(self.engine, config.SCHEMA_CACHE_DIR).sorted_tables:
+            table.to_metadata(Base.metadata)
+        Base.prepare(name_for_collection_relationship=pluralize_collection)
 
         # self.SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=self.engine)
-        self.session_factory = sessionmaker(bind=self.engine, autoflush=True, autocommit=False, expire_on_commit=True)
+        self.session_factory = sessionmaker(bind=self.engine, class_=RoutingSession,
+                                            autoflush=True, autocommit=False, expire_on_commit=True)
         self.session_scoped = scoped_session(self.session_factory)
 
         # ## self.db.metadata.reflect(self.engine)
         #### Base.metadata.create_all(self.engine)
 
-    def init_app(self, app):
+    def init_app(self, app, get_signing_key: Callable[[], str] = None):
+        """
+        Set up the Flask-SQLAlchemy extension, and the stickiness of the users that modify data to the primary.
+        :param app: the application.
+        :param get_signing_key: returns the key that signs the cookie of the last write (see ReplicaRouter).
+        :return:
+        """
+        self.router.get_signing_key = get_signing_key
+
+        @app.after_request
+        def record_write(response):
+            # The users that modify data keep reading from the primary for a while
+            uid = g.get('uid')
+            if uid is not None and request.method not in read_only_methods:
+                self.router.record_write(uid, response if len(self.replicas) > 0 else None)
+            return response
+
         return self.db.init_app(app)
 
     def session(self):
@@ -53,8 +249,67 @@ class DatabaseInstance:
         return self.session_scoped()
 
 
-    def cursor(self):
-        return self.engine.raw_connection().cursor()
+    def new_session(self):
+        """
+        Get a session independent of the scoped one. Used for reads that can happen while the scoped session of the
+        thread is in use (for instance, while a listing is being streamed), as closing it would close the other one.
+        :return: a new session, to be used in a with statement.
+        """
+        return self.session_factory()
+
+    @contextmanager
+    def cursor(self, streaming: bool = False):
+        """
+        Get a cursor of a pooled connection to the database, used to call the stored procedures. It's a context
+        manager: when the with statement ends, the cursor is closed and the connection is returned to the pool.
+        :param streaming: if true, the rows are read from the server while they are fetched (fetchmany) instead of
+                          being stored in memory when the query is executed.
+        :return: the cursor.
+        """
+        # The stored procedures only read data, they can run in a replica
+        engine = self.router.get_replica() or self.engine
+        connection = engine.raw_connection()
+        try:
+            cursor = connection.cursor(MySQLdb.cursors.SSCursor) if streaming else connection.cursor()
+            try:
+                yield cursor
+            finally:
+                cursor.close()
+        finally:
+            connection.close()
+
+    def warm_up(self, connections: int):
+        """
+        Open some connections of the pools of the primary and the replicas, so the first requests don't have to wait
+        for them to be established.
+        :param connections: the number of connections to open in each pool. They are limited by the pool size.
+        :return:
+        """
+        connections = min(connections, config.DB_POOL_SIZE)
+        for engine in [self.engine] + self.replicas:
+            opened = []
+            try:
+                # The connections are kept open until all of them are checked out, otherwise the pool would return
+                # the same one each time
+                for _ in range(connections):
+                    connection = engine.connect()
+                    opened.append(connection)
+                    connection.execute(text('select 1'))
+            finally:
+                for connection in opened:
+                    connection.close()
+
+    def ping(self) -> bool:
+        """
+        :return: true if a connection of the pool of the primary can be used.
+        """
+        try:
+            with self.engine.connect() as connection:
+                connection.execute(text('select 1'))
+            return True
+        except Exception as e:
+            log.warning(f'The database is not available: {e}')
+            return False
 
     def get_db(self):
         return self.db
@@ -66,7 +321,15 @@ class DatabaseInstance:
         return self.db.metadata.tables[table_name]
 
     @staticmethod
-    def wait_for_connection_and_create_instance(wait_time: int, attempts: int) -> Optional[Self]:
+    def wait_for_connection_and_create_instance(wait_time: float, attempts: int,
+                                                max_wait_time: float = config.DB_WAIT_MAX_SECONDS) -> Optional[Self]:
+        """
+        Wait until the database accepts connections, and then create the global instance.
+        :param wait_time: the time, in seconds, until the second attempt. It is doubled after each failed attempt.
+        :param attempts: the number of attempts, -1 to wait forever.
+        :param max_wait_time: the maximum time between two attempts.
+        :return: the pair (instance, true if it has been created by this call).
+        """
         if DatabaseInstance._instance is not None:
             return DatabaseInstance._instance, False
             # raise RuntimeError('The global instance already exists')
@@ -90,14 +353,17 @@ class DatabaseInstance:
             except MySQLdb.OperationalError as e:
                 (code, message) = e.args
 
-                if code == 2002:  # CR_CONNECTION_ERROR
-                    log.info(f'Could not connect to the DB ({message}). Waiting...')
+                if code in (2002, 2003):  # CR_CONNECTION_ERROR, CR_CONN_HOST_ERROR
+                    log.info(f'Could not connect to the DB ({message}). Waiting {wait_time} seconds...')
                 else:
                     raise
 
             time.sleep(wait_time)
+            wait_time = min(wait_time * 2, max_wait_time)
             attempts -= 1
 
+        return None, False
+
     @staticmethod
     def get() -> Self:
         return DatabaseInstance._instance
@@ -11,6 +11,7 @@ Binning = Base.classes.binning
 Contigs = Base.classes.contigs
 Contigs_Virus = Base.classes.contigs_virus
 Dois = Base.classes.dois
+Effective_Access = Base.classes.effective_access
 Experiment = Base.classes.experiment
 Extraction = Base.classes.extraction
 Fraction = Base.classes.fraction
@@ -30,6 +31,8 @@ Salinity = Base.classes.salinity
 Sample = Base.classes.sample
 Sequencing = Base.classes.sequencing
 Single_Cell = Base.classes.single_cell
+Stored_Blob = Base.classes.stored_blob
+Stored_File = Base.classes.stored_file
 Target = Base.classes.target
 Temperature = Base.classes.temperature
 Trimmed_Reads = Base.classes.trimmed_reads
@@ -83,6 +86,7 @@ class_list = [
     Contigs,
     Contigs_Virus,
     Dois,
+    Effective_Access,
     Experiment,
     Extraction,
     Fraction,
@@ -102,6 +106,8 @@ class_list = [
     Sample,
     Sequencing,
     Single_Cell,
+    Stored_Blob,
+    Stored_File,
     Target,
     Temperature,
     Trimmed_Reads,
@@ -0,0 +1,103 @@
+import hashlib
+import os
+import pickle
+import stat
+import tempfile
+
+import sqlalchemy
+from sqlalchemy import MetaData, text
+
+from api import log
+
+# The description of the tables, columns, keys and indexes of the database. Any change in the schema changes the
+# result of these queries, and thus the fingerprint.
+fingerprint_queries = [
+    """SELECT table_name, column_name, ordinal_position, column_type, is_nullable, column_default, column_key, extra
+         FROM information_schema.columns WHERE table_schema = DATABASE()
+         ORDER BY table_name, ordinal_position""",
+    """SELECT table_name, constraint_name, column_name, ordinal_position, referenced_table_name, referenced_column_name
+         FROM information_schema.key_column_usage WHERE table_schema = DATABASE()
+         ORDER BY table_name, constraint_name, ordinal_position""",
+    """SELECT table_name, index_name, seq_in_index, column_name, non_unique
+         FROM information_schema.statistics WHERE table_schema = DATABASE()
+         ORDER BY table_name, index_name, seq_in_index""",
+]
+
+
+def schema_fingerprint(engine) -> str:
+    """
+    Compute a digest of the schema of the database, with three queries to information_schema instead of the queries
+    for each table that the reflection needs.
+    :param engine: the engine connected to the database.
+    :return: the hexadecimal digest of the schema.
+    """
+    digest = hashlib.sha256(sqlalchemy.__version__.encode())
+    with engine.connect() as connection:
+        for query in fingerprint_queries:
+            for row in connection.execute(text(query)):
+                digest.update(repr(tuple(row)).encode())
+    return digest.hexdigest()
+
+
+def is_private(path: str) -> bool:
+    """
+    Check that a file or directory can only have been written by this process: it belongs to its user and the group and
+    the others can't write it. Loading a pickle runs code, so a snapshot written by anybody else is never loaded.
+    :param path: the file or directory.
+    :return: true if it's private.
+    """
+    info = os.stat(path)
+    return info.st_uid == os.getuid() and not info.st_mode & (stat.S_IWGRP | stat.S_IWOTH)
+
+
+def load_metadata(engine, cache_dir: str) -> MetaData:
+    """
+    Get the metadata of all the tables of the database. The reflected metadata is stored in a file named after the
+    fingerprint of the schema, so the workers only reflect the database again when the schema changes.
+    :param engine: the engine connected to the database.
+    :param cache_dir: the directory of the snapshots, created only accessible to the user if it doesn't exist. If it's
+                      empty, or it or the snapshot are not private (see is_private), the database is always reflected.
+    :return: the metadata of the database.
+    """
+    if cache_dir:
+        try:
+            os.makedirs(cache_dir, mode=0o700, exist_ok=True)
+            if not is_private(cache_dir):
+                log.warning(f'The schema cache directory {cache_dir} can be written by other users, it is not used')
+                cache_dir = None
+        except OSError as e:
+            log.warning(f'The schema cache directory {cache_dir} could not be created: {e}')
+            cache_dir = None
+
+    if not cache_dir:
+        metadata = MetaData()
+        metadata.reflect(engine)
+        return metadata
+
+    fingerprint = schema_fingerprint(engine)
+    snapshot = os.path.join(cache_dir, f'schema-{fingerprint}.pickle')
+
+    if os.path.exists(snapshot) and not is_private(snapshot):
+        log.warning(f'The schema snapshot {snapshot} can be written by other users, reflecting the database')
+    elif os.path.exists(snapshot):
+        try:
+            with open(snapshot, 'rb') as fin:
+                metadata = pickle.load(fin)
+            log.info(f'Schema metadata loaded from {snapshot}')
+            return metadata
+        except Exception as e:
+            log.warning(f'The schema snapshot {snapshot} could not be loaded ({e}), reflecting the database')
+
+    metadata = MetaData()
+    metadata.reflect(engine)
+
+    # The snapshot is written to a temporary file and renamed, so other workers never read a partial file
+    try:
+        with tempfile.NamedTemporaryFile('wb', dir=cache_dir, delete=False) as fout:
+            pickle.dump(metadata, fout)
+        os.replace(fout.name, snapshot)
+        log.info(f'Schema metadata saved to {snapshot}')
+    except OSError as e:
+        log.warning(f'The schema snapshot {snapshot} could not be saved: {e}')
+
+    return metadata
@@ -0,0 +1,183 @@
+from collections import namedtuple
+from itertools import accumulate
+
+# An entry of a .fai index, as samtools faidx writes it: the name of the sequence, its number of bases, the position of
+# its first base in the file, and the number of bases and bytes of each line
+FaiEntry = namedtuple('FaiEntry', ['name', 'length', 'offset', 'linebases', 'linewidth'])
+
+
+class FastaIndexer:
+    """
+    Builder of the .fai index of a FASTA file, computed while the file is received (see receive_stream). The index
+    gives the position of each sequence, so any range of it can be read seeking directly to its bytes.
+
+    As in samtools, all the lines of a sequence but the last one have to be of the same length. If the file doesn't
+    follow it, or it's not an uncompressed FASTA file, no index is built, but the upload doesn't fail.
+    """
+
+    def __init__(self):
+        self.entries = []
+        self._valid = True
+        self._started = False
+        self._carry = b''
+        self._position = 0
+        # The sequence being read: its name, offset, line width (in bytes and in bases) and number of bases, and if its
+        # last line was shorter
+        self._name = None
+        self._offset = 0
+        self._width = None
+        self._linebases = 0
+        self._bases = 0
+        self._short = False
+        self._eol = 1
+
+    def update(self, chunk: bytes):
+        """
+        Feed the next chunk of the file.
+        :param chunk: the data, as it's received.
+        :return:
+        """
+        if not self._valid or len(chunk) == 0:
+            return
+        if not self._started:
+            stripped = (self._carry + chunk).lstrip()
+            if len(stripped) == 0:
+                self._carry += chunk
+                return
+            if stripped[:1] != b'>' or b'\0' in chunk:
+                self._valid = False
+                return
+            self._started = True
+
+        try:
+            lines = (self._carry + chunk).split(b'\n')
+            self._carry = lines.pop()
+            self._parse_lines(lines)
+        except Exception:
+            self._valid = False
+
+    def result(self):
+        """
+        Finish the parsing.
+        :return: the list of entries of the index, None if the file can't be indexed.
+        """
+        if self._valid and len(self._carry) > 0:
+            self._parse_lines([self._carry])
+            self._carry = b''
+        self._end_sequence()
+        if not self._valid or len(self.entries) == 0:
+            return None
+        return self.entries
+
+    def write(self, path: str) -> bool:
+        """
+        Write the .fai index, if the file could be indexed.
+        :param path: the path of the index.
+        :return: true if the index has been written.
+        """
+        entries = self.result()
+        if entries is None:
+            return False
+        with open(path, 'w') as fout:
+            for entry in entries:
+                fout.write('\t'.join(str(value) for value in entry) + '\n')
+        return True
+
+    def _parse_lines(self, lines: list):
+        # The start of the line i in the file is position + sizes[i] + i (the newlines)
+        sizes = list(accumulate(map(len, lines), initial=0))
+        position = self._position
+        self._position += sizes[-1] + len(lines)
+        headers = [i for i, line in enumerate(lines) if line[:1] == b'>']
+
+        first = 0
+        for header in headers + [len(lines)]:
+            self._add_lines(lines[first:header])
+            if header == len(lines):
+                break
+            self._end_sequence()
+            line = lines[header]
+            self._eol = 2 if line.endswith(b'\r') else 1
+            name = line[1:].rstrip(b'\r').split(maxsplit=1)
+            self._name = name[0].decode(errors='replace') if len(name) > 0 else ''
+            self._offset = position + sizes[header + 1] + header + 1
+            first = header + 1
+
+    def _add_lines(self, lines: list):
+        if len(lines) == 0:
+            return
+        lengths = list(map(len, lines))
+        if self._name is None:
+            if any(lengths):
+                # Sequence before the first header
+                self._valid = False
+            return
+        if self._width is None:
+            self._width = lengths[0]
+            self._linebases = lengths[0] - lines[0].endswith(b'\r')
+        # Only the last line of a sequence can be shorter than the others (a blank line is a short line too)
+        full = lengths.count(self._width)
+        if self._short or not (full == len(lengths) or (full == len(lengths) - 1 and lengths[-1] < self._width)):
+            self._valid = False
+            return
+        if lengths[-1] < self._width:
+            self._short = True
+        # The lengths include the carriage returns, but the last line of the file may have no line break at all
+        self._bases += sum(lengths) - sum(line.endswith(b'\r') for line in lines)
+
+    def _end_sequence(self):
+        if self._name is not None and self._valid:
+            self.entries.append(FaiEntry(self._name, self._bases, self._offset, self._linebases,
+                                         self._linebases + self._eol))
+        self._name = None
+        self._width = None
+        self._linebases = 0
+        self._bases = 0
+        self._short = False
+
+
+def find_entry(path: str, name: str):
+    """
+    Find a sequence in a .fai index.
+    :param path: the path of the index.
+    :param name: the name of the sequence.
+    :return: the FaiEntry of the sequence, None if it's not found.
+    """
+    prefix = name + '\t'
+    with open(path) as fin:
+        for line in fin:
+            if line.startswith(prefix):
+                fields = line.rstrip('\n').split('\t')
+                return FaiEntry(fields[0], *(int(field) for field in fields[1:5]))
+    return None
+
+
+def get_base_offset(entry: FaiEntry, position: int) -> int:
+    """
+    :param entry: the sequence.
+    :param position: a position in the sequence, starting at 0.
+    :return: the position of the base in the file.
+    """
+    return entry.offset + (position // entry.linebases) * entry.linewidth + position % entry.linebases
+
+
+def format_region(name: str, start: int, end: int, chunks, width: int = 60):
+    """
+    Format a range of a sequence as a FASTA record, with the header >name:start-end.
+    :param name: the name of the sequence.
+    :param start: the first position of the range, starting at 1.
+    :param end: the last position of the range.
+    :param chunks: the bytes of the range, as they are stored (with line breaks).
+    :param width: the number of bases per line.
+    :return: a generator of the chunks of the record.
+    """
+    yield f'>{name}:{start}-{end}\n'.encode()
+    pending = b''
+    for chunk in chunks:
+        pending += chunk.replace(b'\n', b'').replace(b'\r', b'')
+        full = len(pending) - len(pending) % width
+        if full > 0:
+            yield b''.join(pending[i:i + width] + b'\n' for i in range(0, full, width))
+            pending = pending[full:]
+    if len(pending) > 0:
+        yield pending + b'\n'
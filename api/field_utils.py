@@ -185,7 +185,7 @@ sequence_step_sharings = {
     "CONTIGS VIRUS": {"group": Group_Shared_Contigs_Virus, "user": User_Shared_Contigs_Virus},
     "GENOME": {"group": Group_Shared_Genome, "user": User_Shared_Genome},
     "PEPTIDES": {"group": Group_Shared_Experiment, "user": User_Shared_Experiment},
-    "SINGLE CELL GENOMICS": {"group": Group_Shared_Single_Cell, "user": User_Shared_Single_Cell},
+    "SINGLE CELL GENOME": {"group": Group_Shared_Single_Cell, "user": User_Shared_Single_Cell},
     "PLASMID": {"group": Group_Shared_Plasmid, "user": User_Shared_Plasmid}
 }
 
@@ -246,6 +246,13 @@ file_fields = {
 
 file_fields_names = { "rrname", "rrname2", "trname", "assname", "pgenesname"}
 
+# Columns of the steps filled with the statistics of their files when they are uploaded (see api/sequence_stats.py)
+file_stats_fields = {
+    "rreads": {"count": "rreadsnum", "bases": "rreadsbp"},
+    "treads": {"count": "treadsnum", "bases": "treadsbp"},
+    "assembled": {"count": "contignumber"},
+}
+
 forbidden_files = [
     "created", "updated", "id", "is_public", "source_id", "project_id", "user_id"
 ]
@@ -314,6 +321,43 @@ def merge_extra_fields(element):
     return convert_to_dict(merged_values, merged_keys)
 
 
+def invalid_projection_fields(step: str, fields: list) -> list:
+    """
+    Test the fields requested in a listing of steps. The valid fields are the columns of the table of the step, the
+    extra fields describing the access and the multiple values (keywords, dois, hkgenes).
+    :param step: the kind of step listed.
+    :param fields: the fields requested.
+    :return: the list of fields that are not valid.
+    """
+    table = get_step_table(step)
+    valid = set(table.__table__.columns.keys()) | set(extra_headers) | set(multi_complementaries.keys())
+    return [fld for fld in fields if fld not in valid]
+
+
+def projection_source_fields(fields: list) -> set:
+    """
+    Get the fields needed to build the requested fields of a step: the requested ones, the id (always returned) and
+    the fields from which the classifications (temc, phca, salc) are computed.
+    :param fields: the fields requested.
+    :return: the set of fields to read.
+    """
+    source = set(fields) | {'id'}
+    for key, value in supplementaries.items():
+        if key in source:
+            source.add(value['field'])
+    return source
+
+
+def project_fields(element: dict, fields) -> dict:
+    """
+    Keep only some fields of an element.
+    :param element: the element, as a dictionary.
+    :param fields: the fields to keep.
+    :return: a new dictionary with the fields kept.
+    """
+    return {k: v for k, v in element.items() if k in fields}
+
+
 def get_stored_procedure(step: str):
     return sequence_step_to_table[step]['shared_procedure']
 
@@ -1,5 +1,7 @@
 import json
 import os
+import threading
+import time
 from typing import Optional
 
 from flask import Flask, Response
@@ -12,8 +14,10 @@ from flask_bcrypt import Bcrypt
 import jwt
 
 from api import log
+from api.config import DB_WARM_CONNECTIONS, DB_WAIT_MAX_SECONDS
 from api.db.db import SQLALCHEMY_DATABASE_URI, DatabaseInstance
 from api.decorators import wrap_error, get_params, log_params
+from api.streaming import TOKEN_HEADER
 
 # from api.db.models  # Do not import yet, the database must be initialized first
 
@@ -22,7 +26,8 @@ app = Flask(__name__)
 
 bcrypt = Bcrypt(app)
 
-CORS(app)
+# The browsers only let the clients read the header of the renewed token if it's exposed
+CORS(app, expose_headers=[TOKEN_HEADER])
 RequestID(app)
 limiter = Limiter(get_remote_address, app=app, default_limits=["100/minute"])
 
@@ -41,7 +46,43 @@ mocked_sample_file = 'sample42.json'
 
 log.info('Waiting for the database to be ready')
 
-db, first_instance = DatabaseInstance.wait_for_connection_and_create_instance(wait_time=5, attempts=-1)
+db, first_instance = DatabaseInstance.wait_for_connection_and_create_instance(wait_time=1, attempts=-1)
+
+# The worker is ready when the connections and the lookup tables have been loaded. If the warm-up fails, it's retried
+# by the readiness probe, waiting longer after each failure.
+ready = False
+warm_up_lock = threading.Lock()
+warm_up_delay = 1
+next_warm_up = 0.0
+
+
+def warm_up() -> bool:
+    """
+    Warm up the worker: open some connections of the pools and load the lookup tables. After a failure, the calls do
+    nothing until a delay has passed, which is doubled after each failure up to DB_WAIT_MAX_SECONDS.
+    :return: true if the worker is ready.
+    """
+    global ready, warm_up_delay, next_warm_up
+    if ready or db is None:
+        return ready
+    # Only one thread of the worker warms it up, the others (and the calls during the delay) don't wait for it
+    if time.monotonic() < next_warm_up or not warm_up_lock.acquire(blocking=False):
+        return False
+    try:
+        from api.controllers.LookupController import LookupController
+
+        db.warm_up(DB_WARM_CONNECTIONS)
+        LookupController.preload()
+        ready = True
+        log.info('The worker is ready')
+    except Exception as e:
+        log.exception(f'The worker could not be warmed up, retrying in {warm_up_delay} seconds: {e}')
+        next_warm_up = time.monotonic() + warm_up_delay
+        warm_up_delay = min(warm_up_delay * 2, DB_WAIT_MAX_SECONDS)
+    finally:
+        warm_up_lock.release()
+    return ready
+
 
 if db is not None:
     if not first_instance:
@@ -68,7 +109,11 @@ if db is not None:
         app.register_blueprint(sequence_page)
         app.register_blueprint(general_page)
 
-        db.init_app(app)
+        # The blueprints have loaded api.auth, the cookie of the last write is signed with the key of the tokens
+        from api.auth import get_credentials
+        db.init_app(app, lambda: get_credentials('private_key'))
+
+        warm_up()
 else:
     log.error('The database could not be initialized')
 
@@ -84,6 +129,33 @@ def dummy(params: dict, email: Optional[str] = None, **kwargs):
     return {"message": "OK"}
 
 
+@app.route("/ready")
+@limiter.exempt
+def readiness():
+    """
+    Readiness probe for the load balancers: the worker is ready once it has been warmed up, and while the database
+    is available. The warm-up is retried here until it succeeds.
+    :return: 200 if the worker is ready, 503 otherwise.
+    """
+    if warm_up() and db.ping():
+        return {"status": "ready"}, 200
+    return {"status": "not ready"}, 503
+
+
+@app.route("/stats")
+@limiter.exempt
+def stats():
+    """
+    Statistics of this worker, for the monitoring: the hits, misses and size of the cache of verified tokens. Each
+    worker has its own cache, so they are the ones of the worker that answers.
+    :return: the statistics.
+    """
+    # auth imports the app, it can only be imported once it's created
+    from api.auth import get_token_cache_stats
+
+    return {"token_cache": get_token_cache_stats()}, 200
+
+
 # ######################################################
 # General purposes handling
 # ######################################################
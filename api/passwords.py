@@ -0,0 +1,52 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+from api.config import PASSWORD_HASH_WORKERS, PASSWORD_HASH_QUEUE, PASSWORD_HASH_TIMEOUT
+from api.decorators import AbortError
+from api.main import bcrypt
+
+# Hashing a password with bcrypt takes a long time on purpose. The hashes are computed by a few dedicated threads, so a
+# burst of logins can't take all the threads of a worker, and the requests that exceed the queue are rejected at once.
+executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix='passwords')
+slots = threading.BoundedSemaphore(PASSWORD_HASH_WORKERS + PASSWORD_HASH_QUEUE)
+
+
+def run_limited(func, *args):
+    """
+    Run a password operation in the pool of password threads, waiting for its result.
+    :param func: the operation.
+    :param args: the arguments of the operation.
+    :return: the result of the operation.
+    :raise AbortError: with status 429 if the queue of operations is full, 503 if the result takes too long.
+    """
+    if not slots.acquire(blocking=False):
+        raise AbortError(429, "Too many password operations in progress, try again later")
+
+    try:
+        future = executor.submit(func, *args)
+    except Exception:
+        slots.release()
+        raise
+    future.add_done_callback(lambda _: slots.release())
+
+    try:
+        return future.result(timeout=PASSWORD_HASH_TIMEOUT)
+    except TimeoutError:
+        raise AbortError(503, "The password service is busy, try again later")
+
+
+def hash_password(password: str) -> str:
+    """
+    :param password: the password in plain text.
+    :return: the bcrypt hash of the password.
+    """
+    return run_limited(bcrypt.generate_password_hash, password).decode('utf-8')
+
+
+def check_password(password_hash: str, password: str) -> bool:
+    """
+    :param password_hash: the stored hash.
+    :param password: the password in plain text.
+    :return: true if the password matches the hash.
+    """
+    return run_limited(bcrypt.check_password_hash, password_hash, password)
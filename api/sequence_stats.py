@@ -0,0 +1,205 @@
+import math
+import zlib
+from collections import Counter
+
+# Maximum number of bytes decompressed at a time from a gzip upload
+max_decompressed_chunk = 4 * 1024 * 1024
+
+
+class SequenceStats:
+    """
+    Statistics of a FASTA or FASTQ file (number of sequences, bases, N50, GC content and length histogram), computed
+    while the file is received, so it doesn't need to be read again. The file is fed in chunks of any size with update;
+    the gzip files (and BGZF) are decompressed on the fly.
+
+    Only the distinct lengths of the sequences are kept, with their counts, so the memory used doesn't depend on the
+    number of reads. Any parsing error disables the statistics, it never makes the upload fail.
+    """
+
+    def __init__(self, histogram_bins: int = 20):
+        """
+        :param histogram_bins: the maximum number of bins of the length histogram.
+        """
+        self._histogram_bins = histogram_bins
+        self._head = b''
+        self._decompressor = None
+        self.format = None
+        self._failed = False
+
+        self._lengths = Counter()
+        self._bases = {base: 0 for base in b'ACGTNacgtn'}
+
+        # FASTA: the length of the current sequence (None before the first header) and if a header is being read
+        self._current = None
+        self._in_header = False
+        # FASTQ: the incomplete last line and the position of the next line in its record (0 is the header)
+        self._carry = b''
+        self._line = 0
+
+    def update(self, chunk: bytes):
+        """
+        Feed the next chunk of the file.
+        :param chunk: the data, as it's received.
+        :return:
+        """
+        if self._failed or len(chunk) == 0:
+            return
+        try:
+            if self._decompressor is None and self.format is None:
+                chunk = self._detect(chunk)
+                if chunk is None:
+                    return
+            if self._decompressor is not None:
+                self._decompress(chunk)
+            else:
+                self._parse(chunk)
+        except Exception:
+            self._failed = True
+
+    def result(self):
+        """
+        Finish the parsing and compute the statistics.
+        :return: a dictionary with the format (fasta or fastq), count, bases, min_length, max_length, mean_length, n50,
+                 gc (percentage over the A, C, G and T bases, None for proteins) and histogram (list of bins with from,
+                 to and count). None if the file is not a FASTA or FASTQ file or it couldn't be parsed.
+        """
+        if self._failed or self.format is None:
+            return None
+        if self.format == 'fasta':
+            self._end_fasta_record()
+        elif len(self._carry) > 0:
+            self._parse_fastq_lines([self._carry])
+            self._carry = b''
+
+        count = sum(self._lengths.values())
+        if count == 0:
+            return None
+        bases = sum(length * times for length, times in self._lengths.items())
+
+        # N50: the length such that the sequences at least as long contain half of the bases
+        n50 = 0
+        accumulated = 0
+        for length in sorted(self._lengths, reverse=True):
+            accumulated += length * self._lengths[length]
+            if accumulated * 2 >= bases:
+                n50 = length
+                break
+
+        gc_bases = sum(self._bases[base] for base in b'GCgc')
+        acgt_bases = sum(self._bases[base] for base in b'ACGTacgt')
+        nucleotides = acgt_bases + sum(self._bases[base] for base in b'Nn')
+        # The protein files (predicted genes) have no GC content
+        gc = round(100 * gc_bases / acgt_bases, 2) if acgt_bases > 0 and nucleotides >= 0.9 * bases else None
+
+        return {'format': self.format,
+                'count': count,
+                'bases': bases,
+                'min_length': min(self._lengths),
+                'max_length': max(self._lengths),
+                'mean_length': round(bases / count, 2),
+                'n50': n50,
+                'gc': gc,
+                'histogram': self._histogram()}
+
+    def _histogram(self) -> list:
+        shortest = min(self._lengths)
+        longest = max(self._lengths)
+        width = max(1, math.ceil((longest - shortest + 1) / self._histogram_bins))
+        counts = Counter()
+        for length, times in self._lengths.items():
+            counts[(length - shortest) // width] += times
+        return [{'from': shortest + i * width, 'to': shortest + (i + 1) * width - 1, 'count': counts[i]}
+                for i in range(max(counts) + 1)]
+
+    def _detect(self, chunk: bytes):
+        # The format is decided by the first bytes that are not blank, which can arrive in several chunks
+        data = self._head + chunk
+        if len(data) < 2:
+            self._head = data
+            return None
+        self._head = b''
+        if self._decompressor is None and data[:2] == b'\x1f\x8b':
+            self._decompressor = zlib.decompressobj(31)
+            return data
+        stripped = data.lstrip()
+        if len(stripped) == 0:
+            return None
+        if stripped[:1] == b'>':
+            self.format = 'fasta'
+        elif stripped[:1] == b'@':
+            self.format = 'fastq'
+        else:
+            self._failed = True
+            return None
+        return stripped
+
+    def _decompress(self, data: bytes):
+        # The members of a multi-member gzip file (as BGZF) are decompressed one after the other
+        while len(data) > 0:
+            output = self._decompressor.decompress(data, max_decompressed_chunk)
+            if len(output) > 0:
+                if self.format is None:
+                    output = self._detect(output)
+                    if output is None:
+                        if self._failed:
+                            return
+                        output = b''
+                self._parse(output)
+            if self._decompressor.eof:
+                data = self._decompressor.unused_data
+                self._decompressor = zlib.decompressobj(31)
+            else:
+                data = self._decompressor.unconsumed_tail
+
+    def _parse(self, data: bytes):
+        if len(data) == 0 or self.format is None:
+            return
+        if self.format == 'fasta':
+            self._parse_fasta(data)
+        else:
+            lines = (self._carry + data).split(b'\n')
+            self._carry = lines.pop()
+            self._parse_fastq_lines(lines)
+
+    def _count_bases(self, sequence: bytes):
+        for base in self._bases:
+            self._bases[base] += sequence.count(base)
+
+    def _parse_fasta(self, data: bytes):
+        # The sequences are scanned between headers, not line by line
+        position = 0
+        while position < len(data):
+            if self._in_header:
+                end = data.find(b'\n', position)
+                if end < 0:
+                    return
+                self._in_header = False
+                position = end + 1
+                continue
+
+            header = data.find(b'>', position)
+            end = header if header >= 0 else len(data)
+            if self._current is not None:
+                segment = data[position:end]
+                self._current += len(segment) - segment.count(b'\n') - segment.count(b'\r') - segment.count(b' ')
+                self._count_bases(segment)
+            if header < 0:
+                return
+            self._end_fasta_record()
+            self._current = 0
+            self._in_header = True
+            position = header + 1
+
+    def _end_fasta_record(self):
+        if self._current is not None:
+            self._lengths[self._current] += 1
+            self._current = None
+
+    def _parse_fastq_lines(self, lines: list):
+        # Records of 4 lines: header, sequence, separator and qualities
+        sequences = lines[(1 - self._line) % 4::4]
+        self._line = (self._line + len(lines)) % 4
+        if len(sequences) > 0 and sequences[0].endswith(b'\r'):
+            sequences = [sequence.rstrip(b'\r') for sequence in sequences]
+        self._lengths.update(map(len, sequences))
+        self._count_bases(b''.join(sequences))
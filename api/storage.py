@@ -0,0 +1,368 @@
+import gzip
+import hashlib
+import os
+import tempfile
+import uuid
+
+from api.bgzf import BgzfWriter, read_index, read_range
+from api.config import UPLOADS_DIR, UPLOAD_CHUNK_SIZE, STORAGE_COMPRESSION, STORAGE_COMPRESSION_LEVEL
+
+
+# The content of the uploaded files, see get_blob_path
+blobs_dir = os.path.join(UPLOADS_DIR, 'blobs')
+
+# The indexes kept next to a file, with the same name and these extensions: the FASTA index (see FastaIndexer) and the
+# index of the blocks of the BGZF files (see BgzfWriter). They are moved and removed along with the file.
+index_extensions = ['.fai', '.gzi']
+
+
+def get_path(file_uuid: str) -> str:
+    """
+    :param file_uuid: the identifier of a file stored before the blob store existed.
+    :return: the path of the file in the uploads directory.
+    """
+    return os.path.join(UPLOADS_DIR, file_uuid)
+
+
+def sync_directory(directory: str):
+    """
+    Flush the entries of a directory to the disk, so a renamed file survives a crash.
+    :param directory: the directory.
+    :return:
+    """
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def write_stream(stream, path: str, chunk_size: int = UPLOAD_CHUNK_SIZE):
+    """
+    Write a stream into a file, computing its size and checksum while it's written. The data is written into a
+    temporary file of the same directory, flushed to the disk and then renamed, so the file either exists complete or
+    doesn't exist at all.
+    :param stream: a binary stream (the body of the request, or an uploaded file).
+    :param path: the path of the file.
+    :param chunk_size: the number of bytes read at a time.
+    :return: the pair (size, sha256) of the file.
+    """
+    directory = os.path.dirname(path)
+    checksum = hashlib.sha256()
+    size = 0
+
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.upload-')
+    try:
+        with os.fdopen(fd, 'wb') as fout:
+            while True:
+                chunk = stream.read(chunk_size)
+                if not chunk:
+                    break
+                fout.write(chunk)
+                checksum.update(chunk)
+                size += len(chunk)
+            fout.flush()
+            os.fsync(fout.fileno())
+        os.replace(temp_path, path)
+        sync_directory(directory)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+    return size, checksum.hexdigest()
+
+
+def receive_stream(stream, chunk_size: int = UPLOAD_CHUNK_SIZE, observers: list = ()):
+    """
+    Write a stream into a temporary file of the uploads directory, flushed to the disk, computing its size and
+    checksum while it's written. The file is then moved to the blob store with place_blob.
+    :param stream: a binary stream (the body of the request, or an uploaded file).
+    :param chunk_size: the number of bytes read at a time.
+    :param observers: functions called with each chunk written, to process the file in the same pass (see
+                      SampleController.receive_file).
+    :return: the tuple (temporary path, size, sha256).
+    """
+    os.makedirs(UPLOADS_DIR, exist_ok=True)
+    checksum = hashlib.sha256()
+    size = 0
+
+    fd, temp_path = tempfile.mkstemp(dir=UPLOADS_DIR, prefix='.upload-')
+    try:
+        with os.fdopen(fd, 'wb') as fout:
+            while True:
+                chunk = stream.read(chunk_size)
+                if not chunk:
+                    break
+                fout.write(chunk)
+                checksum.update(chunk)
+                size += len(chunk)
+                for observer in observers:
+                    observer(chunk)
+            fout.flush()
+            os.fsync(fout.fileno())
+    except BaseException:
+        os.remove(temp_path)
+        raise
+
+    return temp_path, size, checksum.hexdigest()
+
+
+def receive_parts(paths: list, chunk_size: int = UPLOAD_CHUNK_SIZE, observers: list = ()):
+    """
+    Concatenate some files into a temporary file of the uploads directory, in a single pass that also computes the
+    checksum. The parts are read with a fixed buffer, so the memory used doesn't depend on their size.
+    :param paths: the files to concatenate, in order.
+    :param chunk_size: the size of the buffer.
+    :param observers: functions called with each chunk written, as in receive_stream.
+    :return: the tuple (temporary path, size, sha256).
+    """
+    os.makedirs(UPLOADS_DIR, exist_ok=True)
+    checksum = hashlib.sha256()
+    size = 0
+    buffer = bytearray(chunk_size)
+    view = memoryview(buffer)
+
+    fd, temp_path = tempfile.mkstemp(dir=UPLOADS_DIR, prefix='.upload-')
+    try:
+        with os.fdopen(fd, 'wb') as fout:
+            for part in paths:
+                with open(part, 'rb') as fin:
+                    while True:
+                        read = fin.readinto(buffer)
+                        if not read:
+                            break
+                        fout.write(view[:read])
+                        checksum.update(view[:read])
+                        size += read
+                        if len(observers) > 0:
+                            chunk = bytes(view[:read])
+                            for observer in observers:
+                                observer(chunk)
+            fout.flush()
+            os.fsync(fout.fileno())
+    except BaseException:
+        os.remove(temp_path)
+        raise
+
+    return temp_path, size, checksum.hexdigest()
+
+
+def get_sequence_format(path: str):
+    """
+    Detect the uncompressed FASTA and FASTQ files from their first bytes.
+    :param path: the file.
+    :return: fasta, fastq or None if the file is not an uncompressed sequence file.
+    """
+    with open(path, 'rb') as fin:
+        head = fin.read(4096)
+    if b'\0' in head:
+        # Binary content, including the gzip and BGZF files
+        return None
+    head = head.lstrip()
+    if head.startswith(b'>'):
+        return 'fasta'
+    if head.startswith(b'@'):
+        return 'fastq'
+    return None
+
+
+def compress_received(temp_path: str, chunk_size: int = UPLOAD_CHUNK_SIZE):
+    """
+    Compress a received file before it's placed in the blob store, if STORAGE_COMPRESSION is enabled and it's an
+    uncompressed FASTA or FASTQ file. The blob is still named after the checksum of the original content.
+    :param temp_path: the file received.
+    :param chunk_size: the number of bytes read at a time.
+    :return: the tuple (path of the file to place, encoding, stored size). The encoding is identity if the file is kept
+             as it is, or bgzf. The indexes of the received file are moved along, and the .gzi of the blocks is added.
+    """
+    size = os.path.getsize(temp_path)
+    if STORAGE_COMPRESSION != 'bgzf' or get_sequence_format(temp_path) is None:
+        return temp_path, 'identity', size
+
+    fd, compressed_path = tempfile.mkstemp(dir=UPLOADS_DIR, prefix='.upload-')
+    try:
+        with os.fdopen(fd, 'wb') as fout, open(temp_path, 'rb') as fin:
+            writer = BgzfWriter(fout, STORAGE_COMPRESSION_LEVEL)
+            while True:
+                chunk = fin.read(chunk_size)
+                if not chunk:
+                    break
+                writer.write(chunk)
+            writer.close()
+            fout.flush()
+            os.fsync(fout.fileno())
+        if writer.size < size:
+            writer.write_index(compressed_path + '.gzi')
+    except BaseException:
+        discard_file(compressed_path)
+        raise
+
+    if writer.size >= size:
+        os.remove(compressed_path)
+        return temp_path, 'identity', size
+    if os.path.exists(temp_path + '.fai'):
+        os.replace(temp_path + '.fai', compressed_path + '.fai')
+    os.remove(temp_path)
+    return compressed_path, 'bgzf', writer.size
+
+
+def read_decompressed(path: str, chunk_size: int = UPLOAD_CHUNK_SIZE):
+    """
+    Read a compressed blob, decompressing it on the fly.
+    :param path: the path of the blob.
+    :param chunk_size: the number of uncompressed bytes read at a time.
+    :return: a generator of the chunks of the original content.
+    """
+    with gzip.open(path, 'rb') as fin:
+        while True:
+            chunk = fin.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+
+
+def read_blob_range(path: str, encoding: str, offset: int, length: int, chunk_size: int = UPLOAD_CHUNK_SIZE):
+    """
+    Read a range of the original content of a blob, seeking directly to it. The compressed blobs need their .gzi index.
+    :param path: the path of the blob.
+    :param encoding: how the blob is stored, identity or bgzf.
+    :param offset: the position of the range in the original content.
+    :param length: the number of bytes to read.
+    :param chunk_size: the number of bytes read at a time.
+    :return: a generator of the chunks of the range.
+    """
+    if encoding == 'bgzf':
+        yield from read_range(path, read_index(path + '.gzi'), offset, length, chunk_size)
+        return
+
+    with open(path, 'rb') as fin:
+        fin.seek(offset)
+        while length > 0:
+            chunk = fin.read(min(chunk_size, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+def get_blob_path(sha256: str) -> str:
+    """
+    The content of the files is stored once, named after its checksum, in directories sharded by its first bytes so
+    none of them grows too much: blobs/ab/cd/abcd...
+    :param sha256: the checksum of the content.
+    :return: the path of the blob.
+    """
+    return os.path.join(blobs_dir, sha256[0:2], sha256[2:4], sha256)
+
+
+def blob_exists(sha256: str) -> bool:
+    return os.path.exists(get_blob_path(sha256))
+
+
+def place_blob(temp_path: str, sha256: str, replace: bool = False):
+    """
+    Move a received file to the blob store. If the content is already stored, the received file is removed instead,
+    unless replace is true: a blob found without its row was left by a transaction that failed, so its encoding is
+    unknown and the file of the new row takes its place.
+    It has to be called while the row of the blob is locked (see SampleController.set_stored_file).
+    :param temp_path: the file received.
+    :param sha256: its checksum.
+    :param replace: true if the row of the blob has just been inserted.
+    :return: the inode of the placed blob (see remove_placed_blob), None if the received file has been removed.
+    """
+    path = get_blob_path(sha256)
+    if os.path.exists(path) and not replace:
+        # The FASTA index doesn't depend on how the blob is stored, so it's kept if the blob had none
+        if os.path.exists(temp_path + '.fai') and not os.path.exists(path + '.fai'):
+            os.replace(temp_path + '.fai', path + '.fai')
+        discard_file(temp_path)
+        return None
+
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    # The indexes first, so a blob is never found without them. The ones of a replaced blob are removed.
+    for extension in index_extensions:
+        if os.path.exists(temp_path + extension):
+            os.replace(temp_path + extension, path + extension)
+        elif os.path.exists(path + extension):
+            os.remove(path + extension)
+    os.replace(temp_path, path)
+    sync_directory(directory)
+    return os.stat(path).st_ino
+
+
+def remove_placed_blob(sha256: str, inode):
+    """
+    Remove a blob placed by a transaction that has failed, so no blob is left without its row. Nothing is removed if
+    another upload has replaced it meanwhile.
+    :param sha256: the checksum of the blob.
+    :param inode: the value returned by place_blob.
+    :return:
+    """
+    if inode is None:
+        return
+    path = get_blob_path(sha256)
+    try:
+        if os.stat(path).st_ino != inode:
+            return
+    except FileNotFoundError:
+        return
+    discard_file(path)
+
+
+def detach_blob(sha256: str):
+    """
+    Move a blob that is no longer referenced out of the store. It's removed with discard_file once the transaction that
+    removes its row is committed, or put back with restore_blob if the transaction fails.
+    :param sha256: the checksum of the blob.
+    :return: the path of the detached file, None if the blob doesn't exist.
+    """
+    path = get_blob_path(sha256)
+    if not os.path.exists(path):
+        return None
+    detached = os.path.join(UPLOADS_DIR, f'.detached-{sha256}-{uuid.uuid4().hex}')
+    os.replace(path, detached)
+    for extension in index_extensions:
+        if os.path.exists(path + extension):
+            os.replace(path + extension, detached + extension)
+    return detached
+
+
+def restore_blob(detached: str, sha256: str):
+    """
+    Put back a blob detached with detach_blob.
+    :param detached: the path returned by detach_blob.
+    :param sha256: the checksum of the blob.
+    :return:
+    """
+    if detached is None:
+        return
+    path = get_blob_path(sha256)
+    for extension in index_extensions:
+        if os.path.exists(detached + extension):
+            os.replace(detached + extension, path + extension)
+    os.replace(detached, path)
+
+
+def discard_file(path: str):
+    """
+    Remove a temporary or detached file and its indexes, if they exist.
+    :param path: the path of the file.
+    :return:
+    """
+    if path is None:
+        return
+    for file_path in [path] + [path + extension for extension in index_extensions]:
+        if os.path.exists(file_path):
+            os.remove(file_path)
+
+
+def remove_file(file_uuid: str):
+    """
+    Remove a file stored before the blob store existed, named after its uuid, if it exists.
+    :param file_uuid: the identifier of the file.
+    :return:
+    """
+    if file_uuid is not None and os.path.exists(get_path(file_uuid)):
+        os.remove(get_path(file_uuid))
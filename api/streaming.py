@@ -0,0 +1,79 @@
+import json
+from typing import Iterable, Optional
+
+from flask import Response, request, stream_with_context
+
+from api.utils import serialize_datetime
+
+NDJSON_MIMETYPE = 'application/x-ndjson'
+JSON_MIMETYPE = 'application/json'
+
+# The streamed responses have no envelope, so the token (renewed when it's about to expire) is sent in this header
+TOKEN_HEADER = 'X-Token'
+
+stream_formats = ['ndjson', 'json']
+
+
+def get_stream_format(params: dict) -> Optional[str]:
+    """
+    Get the format in which a listing has to be streamed. The format is requested with the parameter 'stream'
+    (ndjson or json), or with an Accept header asking for ndjson.
+    :param params: the parameters of the request.
+    :return: 'ndjson', 'json' or None if the listing doesn't have to be streamed.
+    """
+    stream = params.get('stream')
+    if stream is not None:
+        stream = stream.lower()
+        if stream not in stream_formats:
+            raise ValueError(f"Stream format {stream} not valid, it has to be one of {stream_formats}")
+        return stream
+
+    if request.accept_mimetypes.best == NDJSON_MIMETYPE:
+        return 'ndjson'
+
+    return None
+
+
+def to_json(value) -> str:
+    """
+    Serialize a value as the responses of the API do, with the dates in ISO format (see serialize_datetime). The
+    streamed elements and the messages with the envelope of the tokens use it, so they are serialized in the same way.
+    :param value: the value to serialize.
+    :return: the json document.
+    """
+    return json.dumps(value, default=serialize_datetime)
+
+
+def stream_chunks(chunks: Iterable[list], stream_format: str) -> Response:
+    """
+    Build a response that sends the elements of a listing while they are read, instead of building the whole listing
+    in memory first.
+
+    * ndjson: each element is sent as a json document in its own line.
+    * json: the elements are sent as a single json array.
+
+    The elements are sent without the envelope {'message': ..., 'token': ...}, the token is sent in the header
+    TOKEN_HEADER instead (see not_required_token). The clients have to take it from there to keep the session alive.
+
+    :param chunks: an iterable of lists of elements (usually a generator reading the database with fetchmany).
+    :param stream_format: 'ndjson' or 'json'.
+    :return: the streamed response.
+    """
+    def generate_ndjson():
+        for chunk in chunks:
+            if len(chunk) > 0:
+                yield ''.join(to_json(element) + '\n' for element in chunk)
+
+    def generate_json():
+        yield '['
+        separator = ''
+        for chunk in chunks:
+            if len(chunk) > 0:
+                yield separator + ','.join(to_json(element) for element in chunk)
+                separator = ','
+        yield ']'
+
+    if stream_format == 'ndjson':
+        return Response(stream_with_context(generate_ndjson()), status=200, mimetype=NDJSON_MIMETYPE)
+    else:
+        return Response(stream_with_context(generate_json()), status=200, mimetype=JSON_MIMETYPE)
@@ -84,6 +84,24 @@ def serialize_datetime(value):
 
     # raise TypeError("Type not serializable")
 
+def parse_id(value):
+    """
+    Convert an identifier received from a client into an integer. The identifiers can be integers, integral numbers
+    (2.0) or strings of digits, as they are stored in the database. Any other value (2.7, '2.7', True) is rejected
+    instead of truncated.
+    :param value: the identifier.
+    :return: the integer, None if the value is not an identifier.
+    """
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, int):
+        return value
+    if isinstance(value, float):
+        return int(value) if value.is_integer() else None
+    if isinstance(value, str) and re.fullmatch(r'\s*[+-]?\d+\s*', value):
+        return int(value)
+    return None
+
 def commas_to_dot(value: str):
     """
     Replace commas with dots in a string. Also removes all leading and trailing whitespace.
@@ -1,87 +1,45 @@
 USE `halodb`;
 -- ----------------------------------------------------
+--  The procedures get_*_available return the steps a user can access, sorted by id and paginated by
+--  keyset: only the steps with an id greater than afterId are returned, and no more than maxRows of them.
+--
+--  The accesses are read from the table effective_access (see 15 - accessos_efectius.sql), that keeps a row
+--  for each public step (with user_id 0), each owned step and each step shared with the user, directly or
+--  through a group. Therefore, listing the steps of a user is a range scan of its primary key.
+-- ----------------------------------------------------
+-- ----------------------------------------------------
 --  samples
 -- ----------------------------------------------------
 DROP procedure IF EXISTS `get_samples_available`;
 
 DELIMITER $$
 USE `halodb`$$
-CREATE PROCEDURE `get_samples_available`(IN userId INT)
+CREATE PROCEDURE `get_samples_available`(IN userId INT, IN afterId INT, IN maxRows INT)
 BEGIN
 WITH relations AS (
-SELECT 
-    sa.id,
-    MAX(sa.public) AS public,
-    MAX(sa.owned) AS owned,
-    MAX(sa.shared_by_group) AS shared_by_group,
-    MAX(sa.shared_by_others) AS shared_by_others,
-    MAX(sa.access_mode) AS access_mode, -- This assumes 'readwrite' > 'read'
-    MAX(sa.group_relation) AS group_relation,
-    MAX(sa.group_id) AS group_id,
-    MAX(sa.group_name) AS group_name
-  FROM (
-	SELECT
-		True AS public,
-		False AS owned,
-        False AS shared_by_group,
-        False AS shared_by_others,
-       'read' AS access_mode,
-		NULL AS group_relation,
-		NULL AS group_id, 
-		NULL AS group_name, 
-		s.id
-	FROM sample AS s
-	WHERE is_public=True
-UNION ALL
-	SELECT
-		False AS public,
-		True AS owned,
-        False AS shared_by_group,
-        False AS shared_by_others, 
-		CASE WHEN s.is_public THEN 'read' ELSE 'readwrite' END AS access_mode,
-		NULL AS group_relation,
-		NULL AS group_id,
-		NULL AS group_name,
-		s.id
-	FROM sample AS s
-	WHERE s.user_id = userId
-UNION ALL
-	SELECT
-		False AS public,
-		False AS owned,
-        True AS shared_by_group,
-        False AS shared_by_others,  
-        CASE WHEN s.is_public THEN 'read' WHEN s.user_id = userId THEN 'readwrite' ELSE gs.access_mode END AS access_mode,
-        ug.relation AS group_relation,
-        g.id AS group_id,
-        g.name AS group_name,
-        s.id
-        FROM `halodb`.`group` AS g 
-			JOIN `halodb`.`user_has_group` AS ug ON g.id = ug.group_id 
-			JOIN `halodb`.`group_shared_sample` AS gs ON ug.group_id = gs.group_id
-			JOIN `halodb`.`sample` AS s ON gs.shared_id = s.id
-	WHERE ug.user_id = userId
-UNION ALL
-	SELECT
-		False AS public,
-		False AS owned,
-        False AS shared_by_group,
-        True AS shared_by_others,
-        CASE WHEN s.is_public THEN 'read' WHEN s.user_id = userId THEN 'readwrite' ELSE uss.access_mode END AS access_mode,
-        NULL AS group_relation, 
-        NULL AS group_id, 
-        NULL AS group_name, 
-        s.id
-		FROM sample s
-			JOIN user_shared_sample uss ON s.id = uss.shared_id
-	WHERE uss.user_id = userId
-) AS sa GROUP BY sa.id
+SELECT
+    ea.step_id AS id,
+    MAX(ea.source = 'public') AS public,
+    MAX(ea.source = 'owned') AS owned,
+    MAX(ea.source = 'group') AS shared_by_group,
+    MAX(ea.source = 'user') AS shared_by_others,
+    MAX(ea.access_mode) AS access_mode, -- This assumes 'readwrite' > 'read'
+    MAX(ug.relation) AS group_relation,
+    MAX(g.id) AS group_id,
+    MAX(g.name) AS group_name
+  FROM `halodb`.`effective_access` AS ea
+    LEFT JOIN `halodb`.`group` AS g ON ea.source = 'group' AND g.id = ea.source_id
+    LEFT JOIN `halodb`.`user_has_group` AS ug ON ug.group_id = g.id AND ug.user_id = userId
+  WHERE ea.user_id IN (0, userId) AND ea.step_type = 'sample' AND ea.step_id > afterId
+  GROUP BY ea.step_id
+  ORDER BY ea.step_id
+  LIMIT maxRows
 ) SELECT
 	relations.public,
 	relations.owned,
 	relations.shared_by_group,
 	relations.shared_by_others,
-	relations.access_mode,
+	CASE WHEN sample.is_public THEN 'read' ELSE relations.access_mode END AS access_mode,
 	relations.group_relation,
 	relations.group_id,
 	relations.group_name,
@@ -100,82 +58,32 @@ DROP procedure IF EXISTS `get_experiments_available`;
 
 DELIMITER $$
 USE `halodb`$$
-CREATE PROCEDURE `get_experiments_available`(IN userId INT)
+CREATE PROCEDURE `get_experiments_available`(IN userId INT, IN afterId INT, IN maxRows INT)
 BEGIN
 WITH relations AS (
-SELECT 
-    sa.id,
-    MAX(sa.public) AS public,
-    MAX(sa.owned) AS owned,
-    MAX(sa.shared_by_group) AS shared_by_group,
-    MAX(sa.shared_by_others) AS shared_by_others,
-    MAX(sa.access_mode) AS access_mode, -- This assumes 'readwrite' > 'read'
-    MAX(sa.group_relation) AS group_relation,
-    MAX(sa.group_id) AS group_id,
-    MAX(sa.group_name) AS group_name
-  FROM (
-	SELECT
-		True AS public,
-		False AS owned,
-        False AS shared_by_group,
-        False AS shared_by_others,
-       'read' AS access_mode,
-		NULL AS group_relation,
-		NULL AS group_id, 
-		NULL AS group_name, 
-		s.id
-	FROM experiment AS s
-	WHERE is_public=True
-UNION ALL
-	SELECT
-		False AS public,
-		True AS owned,
-        False AS shared_by_group,
-        False AS shared_by_others, 
-		CASE WHEN s.is_public THEN 'read' ELSE 'readwrite' END AS access_mode,
-		NULL AS group_relation,
-		NULL AS group_id,
-		NULL AS group_name,
-		s.id
-	FROM experiment AS s
-	WHERE s.user_id = userId
-UNION ALL
-	SELECT
-		False AS public,
-		False AS owned,
-        True AS shared_by_group,
-        False AS shared_by_others,  
-        CASE WHEN s.is_public THEN 'read' WHEN s.user_id = userId THEN 'readwrite' ELSE gs.access_mode END AS access_mode,
-        ug.relation AS group_relation,
-        g.id AS group_id,
-        g.name AS group_name,
-        s.id
-        FROM `halodb`.`group` AS g 
-			JOIN `halodb`.`user_has_group` AS ug ON g.id = ug.group_id 
-			JOIN `halodb`.`group_shared_experiment` AS gs ON ug.group_id = gs.group_id
-			JOIN `halodb`.`experiment` AS s ON gs.shared_id = s.id
-	WHERE ug.user_id = userId
-UNION ALL
-	SELECT
-		False AS public,
-		False AS owned,
-        False AS shared_by_group,
-        True AS shared_by_others,
-        CASE WHEN s.is_public THEN 'read' WHEN s.user_id = userId THEN 'readwrite' ELSE uss.access_mode END AS access_mode,
-        NULL AS group_relation, 
-        NULL AS group_id, 
-        NULL AS group_name, 
-        s.id
-		FROM experiment s
-			JOIN user_shared_experiment uss ON s.id = uss.shared_id
-	WHERE uss.user_id = userId
-) AS sa GROUP BY sa.id
+SELECT
+    ea.step_id AS id,
+    MAX(ea.source = 'public') AS public,
+    MAX(ea.source = 'owned') AS owned,
+    MAX(ea.source = 'group') AS shared_by_group,
+    MAX(ea.source = 'user') AS shared_by_others,
+    MAX(ea.access_mode) AS access_mode, -- This assumes 'readwrite' > 'read'
+    MAX(ug.relation) AS group_relation,
+    MAX(g.id) AS group_id,
+    MAX(g.name) AS group_name
+  FROM `halodb`.`effective_access` AS ea
+    LEFT JOIN `halodb`.`group` AS g ON ea.source = 'group' AND g.id = ea.source_id
+    LEFT JOIN `halodb`.`user_has_group` AS ug ON ug.group_id = g.id AND ug.user_id = userId
+  WHERE ea.user_id IN (0, userId) AND ea.step_type = 'experiment' AND ea.step_id > afterId
+  GROUP BY ea.step_id
+  ORDER BY ea.step_id
+  LIMIT maxRows
 ) SELECT
 	relations.public,
 	relations.owned,
 	relations.shared_by_group,
 	relations.shared_by_others,
-	relations.access_mode,
+	CASE WHEN experiment.is_public THEN 'read' ELSE relations.access_mode END AS access_mode,
 	relations.group_relation,
 	relations.group_id,
 	relations.group_name,
@@ -194,82 +102,32 @@ DROP procedure IF EXISTS `get_trimmed_reads_available`;
 
 DELIMITER $$
 USE `halodb`$$
-CREATE PROCEDURE `get_trimmed_reads_available`(IN userId INT)
+CREATE PROCEDURE `get_trimmed_reads_available`(IN userId INT, IN afterId INT, IN maxRows INT)
 BEGIN
 WITH relations AS (
-SELECT 
-    sa.id,
-    MAX(sa.public) AS public,
-    MAX(sa.owned) AS owned,
-    MAX(sa.shared_by_group) AS shared_by_group,
-    MAX(sa.shared_by_others) AS shared_by_others,
-    MAX(sa.access_mode) AS access_mode, -- This assumes 'readwrite' > 'read'
-    MAX(sa.group_relation) AS group_relation,
-    MAX(sa.group_id) AS group_id,
-    MAX(sa.group_name) AS group_name
-  FROM (
-	SELECT
-		True AS public,
-		False AS owned,
-        False AS shared_by_group,
-        False AS shared_by_others,
-       'read' AS access_mode,
-		NULL AS group_relation,
-		NULL AS group_id, 
-		NULL AS group_name, 
-		s.id
-	FROM trimmed_reads AS s
-	WHERE is_public=True
-UNION ALL
-	SELECT
-		False AS public,
-		True AS owned,
-        False AS shared_by_group,
-        False AS shared_by_others, 
-		CASE WHEN s.is_public THEN 'read' ELSE 'readwrite' END AS access_mode,
-		NULL AS group_relation,
-		NULL AS group_id,
-		NULL AS group_name,
-		s.id
-	FROM trimmed_reads AS s
-	WHERE s.user_id = userId
-UNION ALL
-	SELECT
-		False AS public,
-		False AS owned,
-        True AS shared_by_group,
-        False AS shared_by_others,  
-        CASE WHEN s.is_public THEN 'read' WHEN s.user_id = userId THEN 'readwrite' ELSE gs.access_mode END AS access_mode,
-        ug.relation AS group_relation,
-        g.id AS group_id,
-        g.name AS group_name,
-        s.id
-        FROM `halodb`.`group` AS g 
-			JOIN `halodb`.`user_has_group` AS ug ON g.id = ug.group_id 
-			JOIN `halodb`.`group_shared_trimmed_reads` AS gs ON ug.group_id = gs.group_id
-			JOIN `halodb`.`trimmed_reads` AS s ON gs.shared_id = s.id
-	WHERE ug.user_id = userId
-UNION ALL
-	SELECT
-		False AS public,
-		False AS owned,
-        False AS shared_by_group,
-        True AS shared_by_others,
-        CASE WHEN s.is_public THEN 'read' WHEN s.user_id = userId THEN 'readwrite' ELSE uss.access_mode END AS access_mode,
-        NULL AS group_relation, 
-        NULL AS group_id, 
-        NULL AS group_name, 
-        s.id
-		FROM trimmed_reads s
-			JOIN user_shared_trimmed_reads uss ON s.id = uss.shared_id
-	WHERE uss.user_id = userId
-) AS sa GROUP BY sa.id
+SELECT
+    ea.step_id AS id,
+    MAX(ea.source = 'public') AS public,
+    MAX(ea.source = 'owned') AS owned,
+    MAX(ea.source = 'group') AS shared_by_group,
+    MAX(ea.source = 'user') AS shared_by_others,
+    MAX(ea.access_mode) AS access_mode, -- This assumes 'readwrite' > 'read'
+    MAX(ug.relation) AS group_relation,
+    MAX(g.id) AS group_id,
+    MAX(g.name) AS group_name
+  FROM `halodb`.`effective_access` AS ea
+    LEFT JOIN `halodb`.`group` AS g ON ea.source = 'group' AND g.id = ea.source_id
+    LEFT JOIN `halodb`.`user_has_group` AS ug ON ug.group_id = g.id AND ug.user_id = userId
+  WHERE ea.user_id IN (0, userId) AND ea.step_type = 'trimmed_reads' AND ea.step_id > afterId
+  GROUP BY ea.step_id
+  ORDER BY ea.step_id
+  LIMIT maxRows
 ) SELECT
 	relations.public,
 	relations.owned,
 	relations.shared_by_group,
 	relations.shared_by_others,
-	relations.access_mode,
+	CASE WHEN trimmed_reads.is_public THEN 'read' ELSE relations.access_mode END AS access_mode,
 	relations.group_relation,
 	relations.group_id,
 	relations.group_name,
@@ -288,82 +146,32 @@ DROP procedure IF EXISTS `get_contigs_available`;
 
 DELIMITER $$
 USE `halodb`$$
-CREATE PROCEDURE `get_contigs_available`(IN userId INT)
+CREATE PROCEDURE `get_contigs_available`(IN userId INT, IN afterId INT, IN maxRows INT)
 BEGIN
 WITH relations AS (
-SELECT 
-    sa.id,
-    MAX(sa.public) AS public,
-    MAX(sa.owned) AS owned,
-    MAX(sa.shared_by_group) AS shared_by_group,
-    MAX(sa.shared_by_others) AS shared_by_others,
-    MAX(sa.access_mode) AS access_mode, -- This assumes 'readwrite' > 'read'
-    MAX(sa.group_relation) AS group_relation,
-    MAX(sa.group_id) AS group_id,
-    MAX(sa.group_name) AS group_name
-  FROM (
-	SELECT
-		True AS public,
-		False AS owned,
-        False AS shared_by_group,
-        False AS shared_by_others,
-       'read' AS access_mode,
-		NULL AS group_relation,
-		NULL AS group_id, 
-		NULL AS group_name, 
-		s.id
-	FROM contigs AS s
-	WHERE is_public=True
-UNION ALL
-	SELECT
-		False AS public,
-		True AS owned,
-        False AS shared_by_group,
-        False AS shared_by_others, 
-		CASE WHEN s.is_public THEN 'read' ELSE 'readwrite' END AS access_mode,
-		NULL AS group_relation,
-		NULL AS group_id,
-		NULL AS group_name,
-		s.id
-	FROM contigs AS s
-	WHERE s.user_id = userId
-UNION ALL
-	SELECT
-		False AS public,
-		False AS owned,
-        True AS shared_by_group,
-        False AS shared_by_others,  
-        CASE WHEN s.is_public THEN 'read' WHEN s.user_id = userId THEN 'readwrite' ELSE gs.access_mode END AS access_mode,
-        ug.relation AS group_relation,
-        g.id AS group_id,
-        g.name AS group_name,
-        s.id
-        FROM `halodb`.`group` AS g 
-			JOIN `halodb`.`user_has_group` AS ug ON g.id = ug.group_id 
-			JOIN `halodb`.`group_shared_contigs` AS gs ON ug.group_id = gs.group_id
-			JOIN `halodb`.`contigs` AS s ON gs.shared_id = s.id
-	WHERE ug.user_id = userId
-UNION ALL
-	SELECT
-		False AS public,
-		False AS owned,
-        False AS shared_by_group,
-        True AS shared_by_others,
-        CASE WHEN s.is_public THEN 'read' WHEN s.user_id = userId THEN 'readwrite' ELSE uss.access_mode END AS access_mode,
-        NULL AS group_relation, 
-        NULL AS group_id, 
-        NULL AS group_name, 
-        s.id
-		FROM contigs s
-			JOIN user_shared_contigs uss ON s.id = uss.shared_id
-	WHERE uss.user_id = userId
-) AS sa GROUP BY sa.id
+SELECT
+    ea.step_id AS id,
+    MAX(ea.source = 'public') AS public,
+    MAX(ea.source = 'owned') AS owned,
+    MAX(ea.source = 'group') AS shared_by_group,
+    MAX(ea.source = 'user') AS shared_by_others,
+    MAX(ea.access_mode) AS access_mode, -- This assumes 'readwrite' > 'read'
+    MAX(ug.relation) AS group_relation,
+    MAX(g.id) AS group_id,
+    MAX(g.name) AS group_name
+  FROM `halodb`.`effective_access` AS ea
+    LEFT JOIN `halodb`.`group` AS g ON ea.source = 'group' AND g.id = ea.source_id
+    LEFT JOIN `halodb`.`user_has_group` AS ug ON ug.group_id = g.id AND ug.user_id = userId
+  WHERE ea.user_id IN (0, userId) AND ea.step_type = 'contigs' AND ea.step_id > afterId
+  GROUP BY ea.step_id
+  ORDER BY ea.step_id
+  LIMIT maxRows
 ) SELECT
 	relations.public,
 	relations.owned,
 	relations.shared_by_group,
 	relations.shared_by_others,
-	relations.access_mode,
+	CASE WHEN contigs.is_public THEN 'read' ELSE relations.access_mode END AS access_mode,
 	relations.group_relation,
 	relations.group_id,
 	relations.group_name,
@@ -382,82 +190,32 @@ DROP procedure IF EXISTS `get_predicted_genes_available`;
 
 DELIMITER $$
 USE `halodb`$$
-CREATE PROCEDURE `get_predicted_genes_available`(IN userId INT)
+CREATE PROCEDURE `get_predicted_genes_available`(IN userId INT, IN afterId INT, IN maxRows INT)
 BEGIN
 WITH relations AS (
-SELECT 
-    sa.id,
-    MAX(sa.public) AS public,
-    MAX(sa.owned) AS owned,
-    MAX(sa.shared_by_group) AS shared_by_group,
-    MAX(sa.shared_by_others) AS shared_by_others,
-    MAX(sa.access_mode) AS access_mode, -- This assumes 'readwrite' > 'read'
-    MAX(sa.group_relation) AS group_relation,
-    MAX(sa.group_id) AS group_id,
-    MAX(sa.group_name) AS group_name
-  FROM (
-	SELECT
-		True AS public,
-		False AS owned,
-        False AS shared_by_group,
-        False AS shared_by_others,
-       'read' AS access_mode,
-		NULL AS group_relation,
-		NULL AS group_id, 
-		NULL AS group_name, 
-		s.id
-	FROM predicted_genes AS s
-	WHERE is_public=True
-UNION ALL
-	SELECT
-		False AS public,
-		True AS owned,
-        False AS shared_by_group,
-        False AS shared_by_others, 
-		CASE WHEN s.is_public THEN 'read' ELSE 'readwrite' END AS access_mode,
-		NULL AS group_relation,
-		NULL AS group_id,
-		NULL AS group_name,
-		s.id
-	FROM predicted_genes AS s
-	WHERE s.user_id = userId
-UNION ALL
-	SELECT
-		False AS public,
-		False AS owned,
-        True AS shared_by_group,
-        False AS shared_by_others,  
-        CASE WHEN s.is_public THEN 'read' WHEN s.user_id = userId THEN 'readwrite' ELSE gs.access_mode END AS access_mode,
-        ug.relation AS group_relation,
-        g.id AS group_id,
-        g.name AS group_name,
-        s.id
-        FROM `halodb`.`group` AS g 
-			JOIN `halodb`.`user_has_group` AS ug ON g.id = ug.group_id 
-			JOIN `halodb`.`group_shared_predicted_genes` AS gs ON ug.group_id = gs.group_id
-			JOIN `halodb`.`predicted_genes` AS s ON gs.shared_id = s.id
-	WHERE ug.user_id = userId
-UNION ALL
-	SELECT
-		False AS public,
-		False AS owned,
-        False AS shared_by_group,
-        True AS shared_by_others,
-        CASE WHEN s.is_public THEN 'read' WHEN s.user_id = userId THEN 'readwrite' ELSE uss.access_mode END AS access_mode,
-        NULL AS group_relation, 
-        NULL AS group_id, 
-        NULL AS group_name, 
-        s.id
-		FROM predicted_genes s
-			JOIN user_shared_predicted_genes uss ON s.id = uss.shared_id
-	WHERE uss.user_id = userId
-) AS sa GROUP BY sa.id
+SELECT
+    ea.step_id AS id,
+    MAX(ea.source = 'public') AS public,
+    MAX(ea.source = 'owned') AS owned,
+    MAX(ea.source = 'group') AS shared_by_group,
+    MAX(ea.source = 'user') AS shared_by_others,
+    MAX(ea.access_mode) AS access_mode, -- This assumes 'readwrite' > 'read'
+    MAX(ug.relation) AS group_relation,
+    MAX(g.id) AS group_id,
+    MAX(g.name) AS group_name
+  FROM `halodb`.`effective_access` AS ea
+    LEFT JOIN `halodb`.`group` AS g ON ea.source = 'group' AND g.id = ea.source_id
+    LEFT JOIN `halodb`.`user_has_group` AS ug ON ug.group_id = g.id AND ug.user_id = userId
+  WHERE ea.user_id IN (0, userId) AND ea.step_type = 'predicted_genes' AND ea.step_id > afterId
+  GROUP BY ea.step_id
+  ORDER BY ea.step_id
+  LIMIT maxRows
 ) SELECT
 	relations.public,
 	relations.owned,
 	relations.shared_by_group,
 	relations.shared_by_others,
-	relations.access_mode,
+	CASE WHEN predicted_genes.is_public THEN 'read' ELSE relations.access_mode END AS access_mode,
 	relations.group_relation,
 	relations.group_id,
 	relations.group_name,
@@ -476,82 +234,32 @@ DROP procedure IF EXISTS `get_mags_available`;
 
 DELIMITER $$
 USE `halodb`$$
-CREATE PROCEDURE `get_mags_available`(IN userId INT)
+CREATE PROCEDURE `get_mags_available`(IN userId INT, IN afterId INT, IN maxRows INT)
 BEGIN
 WITH relations AS (
-SELECT 
-    sa.id,
-    MAX(sa.public) AS public,
-    MAX(sa.owned) AS owned,
-    MAX(sa.shared_by_group) AS shared_by_group,
-    MAX(sa.shared_by_others) AS shared_by_others,
-    MAX(sa.access_mode) AS access_mode, -- This assumes 'readwrite' > 'read'
-    MAX(sa.group_relation) AS group_relation,
-    MAX(sa.group_id) AS group_id,
-    MAX(sa.group_name) AS group_name
-  FROM (
-	SELECT
-		True AS public,
-		False AS owned,
-        False AS shared_by_group,
-        False AS shared_by_others,
-       'read' AS access_mode,
-		NULL AS group_relation,
-		NULL AS group_id, 
-		NULL AS group_name, 
-		s.id
-	FROM mags AS s
-	WHERE is_public=True
-UNION ALL
-	SELECT
-		False AS public,
-		True AS owned,
-        False AS shared_by_group,
-        False AS shared_by_others, 
-		CASE WHEN s.is_public THEN 'read' ELSE 'readwrite' END AS access_mode,
-		NULL AS group_relation,
-		NULL AS group_id,
-		NULL AS group_name,
-		s.id
-	FROM mags AS s
-	WHERE s.user_id = userId
-UNION ALL
-	SELECT
-		False AS public,
-		False AS owned,
-        True AS shared_by_group,
-        False AS shared_by_others,  
-        CASE WHEN s.is_public THEN 'read' WHEN s.user_id = userId THEN 'readwrite' ELSE gs.access_mode END AS access_mode,
-        ug.relation AS group_relation,
-        g.id AS group_id,
-        g.name AS group_name,
-        s.id
-        FROM `halodb`.`group` AS g 
-			JOIN `halodb`.`user_has_group` AS ug ON g.id = ug.group_id 
-			JOIN `halodb`.`group_shared_mags` AS gs ON ug.group_id = gs.group_id
-			JOIN `halodb`.`mags` AS s ON gs.shared_id = s.id
-	WHERE ug.user_id = userId
-UNION ALL
-	SELECT
-		False AS public,
-		False AS owned,
-        False AS shared_by_group,
-        True AS shared_by_others,
-        CASE WHEN s.is_public THEN 'read' WHEN s.user_id = userId THEN 'readwrite' ELSE uss.access_mode END AS access_mode,
-        NULL AS group_relation, 
-        NULL AS group_id, 
-        NULL AS group_name, 
-        s.id
-		FROM mags s
-			JOIN user_shared_mags uss ON s.id = uss.shared_id
-	WHERE uss.user_id = userId
-) AS sa GROUP BY sa.id
+SELECT
+    ea.step_id AS id,
+    MAX(ea.source = 'public') AS public,
+    MAX(ea.source = 'owned') AS owned,
+    MAX(ea.source = 'group') AS shared_by_group,
+    MAX(ea.source = 'user') AS shared_by_others,
+    MAX(ea.access_mode) AS access_mode, -- This assumes 'readwrite' > 'read'
+    MAX(ug.relation) AS group_relation,
+    MAX(g.id) AS group_id,
+    MAX(g.name) AS group_name
+  FROM `halodb`.`effective_access` AS ea
+    LEFT JOIN `halodb`.`group` AS g ON ea.source = 'group' AND g.id = ea.source_id
+    LEFT JOIN `halodb`.`user_has_group` AS ug ON ug.group_id = g.id AND ug.user_id = userId
+  WHERE ea.user_id IN (0, userId) AND ea.step_type = 'mags' AND ea.step_id > afterId
+  GROUP BY ea.step_id
+  ORDER BY ea.step_id
+  LIMIT maxRows
 ) SELECT
 	relations.public,
 	relations.owned,
 	relations.shared_by_group,
 	relations.shared_by_others,
-	relations.access_mode,
+	CASE WHEN mags.is_public THEN 'read' ELSE relations.access_mode END AS access_mode,
 	relations.group_relation,
 	relations.group_id,
 	relations.group_name,
@@ -570,82 +278,32 @@ DROP procedure IF EXISTS `get_contigs_virus_available`;
 
 DELIMITER $$
 USE `halodb`$$
-CREATE PROCEDURE `get_contigs_virus_available`(IN userId INT)
+CREATE PROCEDURE `get_contigs_virus_available`(IN userId INT, IN afterId INT, IN maxRows INT)
 BEGIN
 WITH relations AS (
-SELECT 
-    sa.id,
-    MAX(sa.public) AS public,
-    MAX(sa.owned) AS owned,
-    MAX(sa.shared_by_group) AS shared_by_group,
-    MAX(sa.shared_by_others) AS shared_by_others,
-    MAX(sa.access_mode) AS access_mode, -- This assumes 'readwrite' > 'read'
-    MAX(sa.group_relation) AS group_relation,
-    MAX(sa.group_id) AS group_id,
-    MAX(sa.group_name) AS group_name
-  FROM (
-	SELECT
-		True AS public,
-		False AS owned,
-        False AS shared_by_group,
-        False AS shared_by_others,
-       'read' AS access_mode,
-		NULL AS group_relation,
-		NULL AS group_id, 
-		NULL AS group_name, 
-		s.id
-	FROM contigs_virus AS s
-	WHERE is_public=True
-UNION ALL
-	SELECT
-		False AS public,
-		True AS owned,
-        False AS shared_by_group,
-        False AS shared_by_others, 
-		CASE WHEN s.is_public THEN 'read' ELSE 'readwrite' END AS access_mode,
-		NULL AS group_relation,
-		NULL AS group_id,
-		NULL AS group_name,
-		s.id
-	FROM contigs_virus AS s
-	WHERE s.user_id = userId
-UNION ALL
-	SELECT
-		False AS public,
-		False AS owned,
-        True AS shared_by_group,
-        False AS shared_by_others,  
-        CASE WHEN s.is_public THEN 'read' WHEN s.user_id = userId THEN 'readwrite' ELSE gs.access_mode END AS access_mode,
-        ug.relation AS group_relation,
-        g.id AS group_id,
-        g.name AS group_name,
-        s.id
-        FROM `halodb`.`group` AS g 
-			JOIN `halodb`.`user_has_group` AS ug ON g.id = ug.group_id 
-			JOIN `halodb`.`group_shared_contigs_virus` AS gs ON ug.group_id = gs.group_id
-			JOIN `halodb`.`contigs_virus` AS s ON gs.shared_id = s.id
-	WHERE ug.user_id = userId
-UNION ALL
-	SELECT
-		False AS public,
-		False AS owned,
-        False AS shared_by_group,
-        True AS shared_by_others,
-        CASE WHEN s.is_public THEN 'read' WHEN s.user_id = userId THEN 'readwrite' ELSE uss.access_mode END AS access_mode,
-        NULL AS group_relation, 
-        NULL AS group_id, 
-        NULL AS group_name, 
-        s.id
-		FROM contigs_virus s
-			JOIN user_shared_contigs_virus uss ON s.id = uss.shared_id
-	WHERE uss.user_id = userId
-) AS sa GROUP BY sa.id
+SELECT
+    ea.step_id AS id,
+    MAX(ea.source = 'public') AS public,
+    MAX(ea.source = 'owned') AS owned,
+    MAX(ea.source = 'group') AS shared_by_group,
+    MAX(ea.source = 'user') AS shared_by_others,
+    MAX(ea.access_mode) AS access_mode, -- This assumes 'readwrite' > 'read'
+    MAX(ug.relation) AS group_relation,
+    MAX(g.id) AS group_id,
+    MAX(g.name) AS group_name
+  FROM `halodb`.`effective_access` AS ea
+    LEFT JOIN `halodb`.`group` AS g ON ea.source = 'group' AND g.id = ea.source_id
+    LEFT JOIN `halodb`.`user_has_group` AS ug ON ug.group_id = g.id AND ug.user_id = userId
+  WHERE ea.user_id IN (0, userId) AND ea.step_type = 'contigs_virus' AND ea.step_id > afterId
+  GROUP BY ea.step_id
+  ORDER BY ea.step_id
+  LIMIT maxRows
 ) SELECT
 	relations.public,
 	relations.owned,
 	relations.shared_by_group,
 	relations.shared_by_others,
-	relations.access_mode,
+	CASE WHEN contigs_virus.is_public THEN 'read' ELSE relations.access_mode END AS access_mode,
 	relations.group_relation,
 	relations.group_id,
 	relations.group_name,
@@ -664,82 +322,32 @@ DROP procedure IF EXISTS `get_genomes_available`;
 
 DELIMITER $$
 USE `halodb`$$
-CREATE PROCEDURE `get_genomes_available`(IN userId INT)
+CREATE PROCEDURE `get_genomes_available`(IN userId INT, IN afterId INT, IN maxRows INT)
 BEGIN
 WITH relations AS (
-SELECT 
-    sa.id,
-    MAX(sa.public) AS public,
-    MAX(sa.owned) AS owned,
-    MAX(sa.shared_by_group) AS shared_by_group,
-    MAX(sa.shared_by_others) AS shared_by_others,
-    MAX(sa.access_mode) AS access_mode, -- This assumes 'readwrite' > 'read'
-    MAX(sa.group_relation) AS group_relation,
-    MAX(sa.group_id) AS group_id,
-    MAX(sa.group_name) AS group_name
-  FROM (
-	SELECT
-		True AS public,
-		False AS owned,
-        False AS shared_by_group,
-        False AS shared_by_others,
-       'read' AS access_mode,
-		NULL AS group_relation,
-		NULL AS group_id, 
-		NULL AS group_name, 
-		s.id
-	FROM genome AS s
-	WHERE is_public=True
-UNION ALL
-	SELECT
-		False AS public,
-		True AS owned,
-        False AS shared_by_group,
-        False AS shared_by_others, 
-		CASE WHEN s.is_public THEN 'read' ELSE 'readwrite' END AS access_mode,
-		NULL AS group_relation,
-		NULL AS group_id,
-		NULL AS group_name,
-		s.id
-	FROM genome AS s
-	WHERE s.user_id = userId
-UNION ALL
-	SELECT
-		False AS public,
-		False AS owned,
-        True AS shared_by_group,
-        False AS shared_by_others,  
-        CASE WHEN s.is_public THEN 'read' WHEN s.user_id = userId THEN 'readwrite' ELSE gs.access_mode END AS access_mode,
-        ug.relation AS group_relation,
-        g.id AS group_id,
-        g.name AS group_name,
-        s.id
-        FROM `halodb`.`group` AS g 
-			JOIN `halodb`.`user_has_group` AS ug ON g.id = ug.group_id 
-			JOIN `halodb`.`group_shared_genome` AS gs ON ug.group_id = gs.group_id
-			JOIN `halodb`.`genome` AS s ON gs.shared_id = s.id
-	WHERE ug.user_id = userId
-UNION ALL
-	SELECT
-		False AS public,
-		False AS owned,
-        False AS shared_by_group,
-        True AS shared_by_others,
-        CASE WHEN s.is_public THEN 'read' WHEN s.user_id = userId THEN 'readwrite' ELSE uss.access_mode END AS access_mode,
-        NULL AS group_relation, 
-        NULL AS group_id, 
-        NULL AS group_name, 
-        s.id
-		FROM genome s
-			JOIN user_shared_genome uss ON s.id = uss.shared_id
-	WHERE uss.user_id = userId
-) AS sa GROUP BY sa.id
+SELECT
+    ea.step_id AS id,
+    MAX(ea.source = 'public') AS public,
+    MAX(ea.source = 'owned') AS owned,
+    MAX(ea.source = 'group') AS shared_by_group,
+    MAX(ea.source = 'user') AS shared_by_others,
+    MAX(ea.access_mode) AS access_mode, -- This assumes 'readwrite' > 'read'
+    MAX(ug.relation) AS group_relation,
+    MAX(g.id) AS group_id,
+    MAX(g.name) AS group_name
+  FROM `halodb`.`effective_access` AS ea
+    LEFT JOIN `halodb`.`group` AS g ON ea.source = 'group' AND g.id = ea.source_id
+    LEFT JOIN `halodb`.`user_has_group` AS ug ON ug.group_id = g.id AND ug.user_id = userId
+  WHERE ea.user_id IN (0, userId) AND ea.step_type = 'genome' AND ea.step_id > afterId
+  GROUP BY ea.step_id
+  ORDER BY ea.step_id
+  LIMIT maxRows
 ) SELECT
 	relations.public,
 	relations.owned,
 	relations.shared_by_group,
 	relations.shared_by_others,
-	relations.access_mode,
+	CASE WHEN genome.is_public THEN 'read' ELSE relations.access_mode END AS access_mode,
 	relations.group_relation,
 	relations.group_id,
 	relations.group_name,
@@ -758,82 +366,32 @@ DROP procedure IF EXISTS `get_single_cells_available`;
 
 DELIMITER $$
 USE `halodb`$$
-CREATE PROCEDURE `get_single_cells_available`(IN userId INT)
+CREATE PROCEDURE `get_single_cells_available`(IN userId INT, IN afterId INT, IN maxRows INT)
 BEGIN
 WITH relations AS (
-SELECT 
-    sa.id,
-    MAX(sa.public) AS public,
-    MAX(sa.owned) AS owned,
-    MAX(sa.shared_by_group) AS shared_by_group,
-    MAX(sa.shared_by_others) AS shared_by_others,
-    MAX(sa.access_mode) AS access_mode, -- This assumes 'readwrite' > 'read'
-    MAX(sa.group_relation) AS group_relation,
-    MAX(sa.group_id) AS group_id,
-    MAX(sa.group_name) AS group_name
-  FROM (
-	SELECT
-		True AS public,
-		False AS owned,
-        False AS shared_by_group,
-        False AS shared_by_others,
-       'read' AS access_mode,
-		NULL AS group_relation,
-		NULL AS group_id, 
-		NULL AS group_name, 
-		s.id
-	FROM single_cell AS s
-	WHERE is_public=True
-UNION ALL
-	SELECT
-		False AS public,
-		True AS owned,
-        False AS shared_by_group,
-        False AS shared_by_others, 
-		CASE WHEN s.is_public THEN 'read' ELSE 'readwrite' END AS access_mode,
-		NULL AS group_relation,
-		NULL AS group_id,
-		NULL AS group_name,
-		s.id
-	FROM single_cell AS s
-	WHERE s.user_id = userId
-UNION ALL
-	SELECT
-		False AS public,
-		False AS owned,
-        True AS shared_by_group,
-        False AS shared_by_others,  
-        CASE WHEN s.is_public THEN 'read' WHEN s.user_id = userId THEN 'readwrite' ELSE gs.access_mode END AS access_mode,
-        ug.relation AS group_relation,
-        g.id AS group_id,
-        g.name AS group_name,
-        s.id
-        FROM `halodb`.`group` AS g 
-			JOIN `halodb`.`user_has_group` AS ug ON g.id = ug.group_id 
-			JOIN `halodb`.`group_shared_single_cell` AS gs ON ug.group_id = gs.group_id
-			JOIN `halodb`.`single_cell` AS s ON gs.shared_id = s.id
-	WHERE ug.user_id = userId
-UNION ALL
-	SELECT
-		False AS public,
-		False AS owned,
-        False AS shared_by_group,
-        True AS shared_by_others,
-        CASE WHEN s.is_public THEN 'read' WHEN s.user_id = userId THEN 'readwrite' ELSE uss.access_mode END AS access_mode,
-        NULL AS group_relation, 
-        NULL AS group_id, 
-        NULL AS group_name, 
-        s.id
-		FROM single_cell s
-			JOIN user_shared_single_cell uss ON s.id = uss.shared_id
-	WHERE uss.user_id = userId
-) AS sa GROUP BY sa.id
+SELECT
+    ea.step_id AS id,
+    MAX(ea.source = 'public') AS public,
+    MAX(ea.source = 'owned') AS owned,
+    MAX(ea.source = 'group') AS shared_by_group,
+    MAX(ea.source = 'user') AS shared_by_others,
+    MAX(ea.access_mode) AS access_mode, -- This assumes 'readwrite' > 'read'
+    MAX(ug.relation) AS group_relation,
+    MAX(g.id) AS group_id,
+    MAX(g.name) AS group_name
+  FROM `halodb`.`effective_access` AS ea
+    LEFT JOIN `halodb`.`group` AS g ON ea.source = 'group' AND g.id = ea.source_id
+    LEFT JOIN `halodb`.`user_has_group` AS ug ON ug.group_id = g.id AND ug.user_id = userId
+  WHERE ea.user_id IN (0, userId) AND ea.step_type = 'single_cell' AND ea.step_id > afterId
+  GROUP BY ea.step_id
+  ORDER BY ea.step_id
+  LIMIT maxRows
 ) SELECT
 	relations.public,
 	relations.owned,
 	relations.shared_by_group,
 	relations.shared_by_others,
-	relations.access_mode,
+	CASE WHEN single_cell.is_public THEN 'read' ELSE relations.access_mode END AS access_mode,
 	relations.group_relation,
 	relations.group_id,
 	relations.group_name,
@@ -852,82 +410,32 @@ DROP procedure IF EXISTS `get_plasmids_available`;
 
 DELIMITER $$
 USE `halodb`$$
-CREATE PROCEDURE `get_plasmids_available`(IN userId INT)
+CREATE PROCEDURE `get_plasmids_available`(IN userId INT, IN afterId INT, IN maxRows INT)
 BEGIN
 WITH relations AS (
-SELECT 
-    sa.id,
-    MAX(sa.public) AS public,
-    MAX(sa.owned) AS owned,
-    MAX(sa.shared_by_group) AS shared_by_group,
-    MAX(sa.shared_by_others) AS shared_by_others,
-    MAX(sa.access_mode) AS access_mode, -- This assumes 'readwrite' > 'read'
-    MAX(sa.group_relation) AS group_relation,
-    MAX(sa.group_id) AS group_id,
-    MAX(sa.group_name) AS group_name
-  FROM (
-	SELECT
-		True AS public,
-		False AS owned,
-        False AS shared_by_group,
-        False AS shared_by_others,
-       'read' AS access_mode,
-		NULL AS group_relation,
-		NULL AS group_id, 
-		NULL AS group_name, 
-		s.id
-	FROM plasmid AS s
-	WHERE is_public=True
-UNION ALL
-	SELECT
-		False AS public,
-		True AS owned,
-        False AS shared_by_group,
-        False AS shared_by_others, 
-		CASE WHEN s.is_public THEN 'read' ELSE 'readwrite' END AS access_mode,
-		NULL AS group_relation,
-		NULL AS group_id,
-		NULL AS group_name,
-		s.id
-	FROM plasmid AS s
-	WHERE s.user_id = userId
-UNION ALL
-	SELECT
-		False AS public,
-		False AS owned,
-        True AS shared_by_group,
-        False AS shared_by_others,  
-        CASE WHEN s.is_public THEN 'read' WHEN s.user_id = userId THEN 'readwrite' ELSE gs.access_mode END AS access_mode,
-        ug.relation AS group_relation,
-        g.id AS group_id,
-        g.name AS group_name,
-        s.id
-        FROM `halodb`.`group` AS g 
-			JOIN `halodb`.`user_has_group` AS ug ON g.id = ug.group_id 
-			JOIN `halodb`.`group_shared_plasmid` AS gs ON ug.group_id = gs.group_id
-			JOIN `halodb`.`plasmid` AS s ON gs.shared_id = s.id
-	WHERE ug.user_id = userId
-UNION ALL
-	SELECT
-		False AS public,
-		False AS owned,
-        False AS shared_by_group,
-        True AS shared_by_others,
-        CASE WHEN s.is_public THEN 'read' WHEN s.user_id = userId THEN 'readwrite' ELSE uss.access_mode END AS access_mode,
-        NULL AS group_relation, 
-        NULL AS group_id, 
-        NULL AS group_name, 
-        s.id
-		FROM plasmid s
-			JOIN user_shared_plasmid uss ON s.id = uss.shared_id
-	WHERE uss.user_id = userId
-) AS sa GROUP BY sa.id
+SELECT
+    ea.step_id AS id,
+    MAX(ea.source = 'public') AS public,
+    MAX(ea.source = 'owned') AS owned,
+    MAX(ea.source = 'group') AS shared_by_group,
+    MAX(ea.source = 'user') AS shared_by_others,
+    MAX(ea.access_mode) AS access_mode, -- This assumes 'readwrite' > 'read'
+    MAX(ug.relation) AS group_relation,
+    MAX(g.id) AS group_id,
+    MAX(g.name) AS group_name
+  FROM `halodb`.`effective_access` AS ea
+    LEFT JOIN `halodb`.`group` AS g ON ea.source = 'group' AND g.id = ea.source_id
+    LEFT JOIN `halodb`.`user_has_group` AS ug ON ug.group_id = g.id AND ug.user_id = userId
+  WHERE ea.user_id IN (0, userId) AND ea.step_type = 'plasmid' AND ea.step_id > afterId
+  GROUP BY ea.step_id
+  ORDER BY ea.step_id
+  LIMIT maxRows
 ) SELECT
 	relations.public,
 	relations.owned,
 	relations.shared_by_group,
 	relations.shared_by_others,
-	relations.access_mode,
+	CASE WHEN plasmid.is_public THEN 'read' ELSE relations.access_mode END AS access_mode,
 	relations.group_relation,
 	relations.group_id,
 	relations.group_name,
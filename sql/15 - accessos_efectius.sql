@@ -0,0 +1,177 @@
+SET @OLD_UNIQUE_CHECKS=@@UNIQUE_CHECKS, UNIQUE_CHECKS=0;
+SET @OLD_FOREIGN_KEY_CHECKS=@@FOREIGN_KEY_CHECKS, FOREIGN_KEY_CHECKS=0;
+SET @OLD_SQL_MODE=@@SQL_MODE, SQL_MODE='TRADITIONAL,ALLOW_INVALID_DATES';
+
+USE `halodb` ;
+
+-- -----------------------------------------------------
+-- Table `halodb`.`effective_access`
+--
+-- Projection of the accesses of the users to the omic sequence steps: the public steps, the owned ones and the ones
+-- shared with the user or with a group the user is a member of. It is maintained by the API when a step is created,
+-- made public, shared or unshared, and when the members of a group change, so the procedures get_*_available don't
+-- need to compute it on every call.
+-- -----------------------------------------------------
+DROP TABLE IF EXISTS `halodb`.`effective_access` ;
+
+CREATE TABLE IF NOT EXISTS `halodb`.`effective_access` (
+  `user_id` INT NOT NULL COMMENT "User with access to the step. 0 stands for everybody, the step is public.",
+  `step_type` VARCHAR(40) NOT NULL COMMENT "Table of the step: sample, experiment, trimmed_reads, ...",
+  `step_id` INT NOT NULL COMMENT "Identifier of the step in its table",
+  `source` ENUM('public', 'owned', 'group', 'user') NOT NULL COMMENT "Why the user can access the step: it's public, the user is the owner, it's shared with a group of the user or with the user.",
+  `source_id` INT NOT NULL DEFAULT 0 COMMENT "The group sharing the step when the source is 'group', 0 otherwise.",
+  `access_mode` ENUM('read', 'readwrite') NOT NULL DEFAULT 'read' COMMENT "The access mode granted by the source. Public steps can only be read, whatever the other sources grant.",
+  PRIMARY KEY (`user_id`, `step_type`, `step_id`, `source`, `source_id`),
+  INDEX `effective_access_step_idx` (`step_type`, `step_id`),
+  INDEX `effective_access_source_idx` (`source`, `source_id`))
+ENGINE = InnoDB
+DEFAULT CHARACTER SET = utf8mb4
+COLLATE = utf8mb4_0900_ai_ci;
+
+-- -----------------------------------------------------
+-- Fill the table with the accesses of the existing steps
+-- -----------------------------------------------------
+
+-- sample
+INSERT INTO `halodb`.`effective_access` (user_id, step_type, step_id, source, source_id, access_mode)
+    SELECT 0, 'sample', s.id, 'public', 0, 'read' FROM `halodb`.`sample` AS s WHERE s.is_public = True;
+INSERT INTO `halodb`.`effective_access` (user_id, step_type, step_id, source, source_id, access_mode)
+    SELECT s.user_id, 'sample', s.id, 'owned', 0, 'readwrite' FROM `halodb`.`sample` AS s;
+INSERT INTO `halodb`.`effective_access` (user_id, step_type, step_id, source, source_id, access_mode)
+    SELECT us.user_id, 'sample', us.shared_id, 'user', 0, IFNULL(us.access_mode, 'read')
+    FROM `halodb`.`user_shared_sample` AS us;
+INSERT INTO `halodb`.`effective_access` (user_id, step_type, step_id, source, source_id, access_mode)
+    SELECT ug.user_id, 'sample', gs.shared_id, 'group', gs.group_id, IFNULL(gs.access_mode, 'read')
+    FROM `halodb`.`group_shared_sample` AS gs
+        JOIN `halodb`.`user_has_group` AS ug ON ug.group_id = gs.group_id
+    WHERE ug.relation IS NULL OR ug.relation != 'invited';
+
+-- experiment
+INSERT INTO `halodb`.`effective_access` (user_id, step_type, step_id, source, source_id, access_mode)
+    SELECT 0, 'experiment', s.id, 'public', 0, 'read' FROM `halodb`.`experiment` AS s WHERE s.is_public = True;
+INSERT INTO `halodb`.`effective_access` (user_id, step_type, step_id, source, source_id, access_mode)
+    SELECT s.user_id, 'experiment', s.id, 'owned', 0, 'readwrite' FROM `halodb`.`experiment` AS s;
+INSERT INTO `halodb`.`effective_access` (user_id, step_type, step_id, source, source_id, access_mode)
+    SELECT us.user_id, 'experiment', us.shared_id, 'user', 0, IFNULL(us.access_mode, 'read')
+    FROM `halodb`.`user_shared_experiment` AS us;
+INSERT INTO `halodb`.`effective_access` (user_id, step_type, step_id, source, source_id, access_mode)
+    SELECT ug.user_id, 'experiment', gs.shared_id, 'group', gs.group_id, IFNULL(gs.access_mode, 'read')
+    FROM `halodb`.`group_shared_experiment` AS gs
+        JOIN `halodb`.`user_has_group` AS ug ON ug.group_id = gs.group_id
+    WHERE ug.relation IS NULL OR ug.relation != 'invited';
+
+-- trimmed_reads
+INSERT INTO `halodb`.`effective_access` (user_id, step_type, step_id, source, source_id, access_mode)
+    SELECT 0, 'trimmed_reads', s.id, 'public', 0, 'read' FROM `halodb`.`trimmed_reads` AS s WHERE s.is_public = True;
+INSERT INTO `halodb`.`effective_access` (user_id, step_type, step_id, source, source_id, access_mode)
+    SELECT s.user_id, 'trimmed_reads', s.id, 'owned', 0, 'readwrite' FROM `halodb`.`trimmed_reads` AS s;
+INSERT INTO `halodb`.`effective_access` (user_id, step_type, step_id, source, source_id, access_mode)
+    SELECT us.user_id, 'trimmed_reads', us.shared_id, 'user', 0, IFNULL(us.access_mode, 'read')
+    FROM `halodb`.`user_shared_trimmed_reads` AS us;
+INSERT INTO `halodb`.`effective_access` (user_id, step_type, step_id, source, source_id, access_mode)
+    SELECT ug.user_id, 'trimmed_reads', gs.shared_id, 'group', gs.group_id, IFNULL(gs.access_mode, 'read')
+    FROM `halodb`.`group_shared_trimmed_reads` AS gs
+        JOIN `halodb`.`user_has_group` AS ug ON ug.group_id = gs.group_id
+    WHERE ug.relation IS NULL OR ug.relation != 'invited';
+
+-- contigs
+INSERT INTO `halodb`.`effective_access` (user_id, step_type, step_id, source, source_id, access_mode)
+    SELECT 0, 'contigs', s.id, 'public', 0, 'read' FROM `halodb`.`contigs` AS s WHERE s.is_public = True;
+INSERT INTO `halodb`.`effective_access` (user_id, step_type, step_id, source, source_id, access_mode)
+    SELECT s.user_id, 'contigs', s.id, 'owned', 0, 'readwrite' FROM `halodb`.`contigs` AS s;
+INSERT INTO `halodb`.`effective_access` (user_id, step_type, step_id, source, source_id, access_mode)
+    SELECT us.user_id, 'contigs', us.shared_id, 'user', 0, IFNULL(us.access_mode, 'read')
+    FROM `halodb`.`user_shared_contigs` AS us;
+INSERT INTO `halodb`.`effective_access` (user_id, step_type, step_id, source, source_id, access_mode)
+    SELECT ug.user_id, 'contigs', gs.shared_id, 'group', gs.group_id, IFNULL(gs.access_mode, 'read')
+    FROM `halodb`.`group_shared_contigs` AS gs
+        JOIN `halodb`.`user_has_group` AS ug ON ug.group_id = gs.group_id
+    WHERE ug.relation IS NULL OR ug.relation != 'invited';
+
+-- predicted_genes
+INSERT INTO `halodb`.`effective_access` (user_id, step_type, step_id, source, source_id, access_mode)
+    SELECT 0, 'predicted_genes', s.id, 'public', 0, 'read' FROM `halodb`.`predicted_genes` AS s WHERE s.is_public = True;
+INSERT INTO `halodb`.`effective_access` (user_id, step_type, step_id, source, source_id, access_mode)
+    SELECT s.user_id, 'predicted_genes', s.id, 'owned', 0, 'readwrite' FROM `halodb`.`predicted_genes` AS s;
+INSERT INTO `halodb`.`effective_access` (user_id, step_type, step_id, source, source_id, access_mode)
+    SELECT us.user_id, 'predicted_genes', us.shared_id, 'user', 0, IFNULL(us.access_mode, 'read')
+    FROM `halodb`.`user_shared_predicted_genes` AS us;
+INSERT INTO `halodb`.`effective_access` (user_id, step_type, step_id, source, source_id, access_mode)
+    SELECT ug.user_id, 'predicted_genes', gs.shared_id, 'group', gs.group_id, IFNULL(gs.access_mode, 'read')
+    FROM `halodb`.`group_shared_predicted_genes` AS gs
+        JOIN `halodb`.`user_has_group` AS ug ON ug.group_id = gs.group_id
+    WHERE ug.relation IS NULL OR ug.relation != 'invited';
+
+-- mags
+INSERT INTO `halodb`.`effective_access` (user_id, step_type, step_id, source, source_id, access_mode)
+    SELECT 0, 'mags', s.id, 'public', 0, 'read' FROM `halodb`.`mags` AS s WHERE s.is_public = True;
+INSERT INTO `halodb`.`effective_access` (user_id, step_type, step_id, source, source_id, access_mode)
+    SELECT s.user_id, 'mags', s.id, 'owned', 0, 'readwrite' FROM `halodb`.`mags` AS s;
+INSERT INTO `halodb`.`effective_access` (user_id, step_type, step_id, source, source_id, access_mode)
+    SELECT us.user_id, 'mags', us.shared_id, 'user', 0, IFNULL(us.access_mode, 'read')
+    FROM `halodb`.`user_shared_mags` AS us;
+INSERT INTO `halodb`.`effective_access` (user_id, step_type, step_id, source, source_id, access_mode)
+    SELECT ug.user_id, 'mags', gs.shared_id, 'group', gs.group_id, IFNULL(gs.access_mode, 'read')
+    FROM `halodb`.`group_shared_mags` AS gs
+        JOIN `halodb`.`user_has_group` AS ug ON ug.group_id = gs.group_id
+    WHERE ug.relation IS NULL OR ug.relation != 'invited';
+
+-- contigs_virus
+INSERT INTO `halodb`.`effective_access` (user_id, step_type, step_id, source, source_id, access_mode)
+    SELECT 0, 'contigs_virus', s.id, 'public', 0, 'read' FROM `halodb`.`contigs_virus` AS s WHERE s.is_public = True;
+INSERT INTO `halodb`.`effective_access` (user_id, step_type, step_id, source, source_id, access_mode)
+    SELECT s.user_id, 'contigs_virus', s.id, 'owned', 0, 'readwrite' FROM `halodb`.`contigs_virus` AS s;
+INSERT INTO `halodb`.`effective_access` (user_id, step_type, step_id, source, source_id, access_mode)
+    SELECT us.user_id, 'contigs_virus', us.shared_id, 'user', 0, IFNULL(us.access_mode, 'read')
+    FROM `halodb`.`user_shared_contigs_virus` AS us;
+INSERT INTO `halodb`.`effective_access` (user_id, step_type, step_id, source, source_id, access_mode)
+    SELECT ug.user_id, 'contigs_virus', gs.shared_id, 'group', gs.group_id, IFNULL(gs.access_mode, 'read')
+    FROM `halodb`.`group_shared_contigs_virus` AS gs
+        JOIN `halodb`.`user_has_group` AS ug ON ug.group_id = gs.group_id
+    WHERE ug.relation IS NULL OR ug.relation != 'invited';
+
+-- genome
+INSERT INTO `halodb`.`effective_access` (user_id, step_type, step_id, source, source_id, access_mode)
+    SELECT 0, 'genome', s.id, 'public', 0, 'read' FROM `halodb`.`genome` AS s WHERE s.is_public = True;
+INSERT INTO `halodb`.`effective_access` (user_id, step_type, step_id, source, source_id, access_mode)
+    SELECT s.user_id, 'genome', s.id, 'owned', 0, 'readwrite' FROM `halodb`.`genome` AS s;
+INSERT INTO `halodb`.`effective_access` (user_id, step_type, step_id, source, source_id, access_mode)
+    SELECT us.user_id, 'genome', us.shared_id, 'user', 0, IFNULL(us.access_mode, 'read')
+    FROM `halodb`.`user_shared_genome` AS us;
+INSERT INTO `halodb`.`effective_access` (user_id, step_type, step_id, source, source_id, access_mode)
+    SELECT ug.user_id, 'genome', gs.shared_id, 'group', gs.group_id, IFNULL(gs.access_mode, 'read')
+    FROM `halodb`.`group_shared_genome` AS gs
+        JOIN `halodb`.`user_has_group` AS ug ON ug.group_id = gs.group_id
+    WHERE ug.relation IS NULL OR ug.relation != 'invited';
+
+-- single_cell
+INSERT INTO `halodb`.`effective_access` (user_id, step_type, step_id, source, source_id, access_mode)
+    SELECT 0, 'single_cell', s.id, 'public', 0, 'read' FROM `halodb`.`single_cell` AS s WHERE s.is_public = True;
+INSERT INTO `halodb`.`effective_access` (user_id, step_type, step_id, source, source_id, access_mode)
+    SELECT s.user_id, 'single_cell', s.id, 'owned', 0, 'readwrite' FROM `halodb`.`single_cell` AS s;
+INSERT INTO `halodb`.`effective_access` (user_id, step_type, step_id, source, source_id, access_mode)
+    SELECT us.user_id, 'single_cell', us.shared_id, 'user', 0, IFNULL(us.access_mode, 'read')
+    FROM `halodb`.`user_shared_single_cell` AS us;
+INSERT INTO `halodb`.`effective_access` (user_id, step_type, step_id, source, source_id, access_mode)
+    SELECT ug.user_id, 'single_cell', gs.shared_id, 'group', gs.group_id, IFNULL(gs.access_mode, 'read')
+    FROM `halodb`.`group_shared_single_cell` AS gs
+        JOIN `halodb`.`user_has_group` AS ug ON ug.group_id = gs.group_id
+    WHERE ug.relation IS NULL OR ug.relation != 'invited';
+
+-- plasmid
+INSERT INTO `halodb`.`effective_access` (user_id, step_type, step_id, source, source_id, access_mode)
+    SELECT 0, 'plasmid', s.id, 'public', 0, 'read' FROM `halodb`.`plasmid` AS s WHERE s.is_public = True;
+INSERT INTO `halodb`.`effective_access` (user_id, step_type, step_id, source, source_id, access_mode)
+    SELECT s.user_id, 'plasmid', s.id, 'owned', 0, 'readwrite' FROM `halodb`.`plasmid` AS s;
+INSERT INTO `halodb`.`effective_access` (user_id, step_type, step_id, source, source_id, access_mode)
+    SELECT us.user_id, 'plasmid', us.shared_id, 'user', 0, IFNULL(us.access_mode, 'read')
+    FROM `halodb`.`user_shared_plasmid` AS us;
+INSERT INTO `halodb`.`effective_access` (user_id, step_type, step_id, source, source_id, access_mode)
+    SELECT ug.user_id, 'plasmid', gs.shared_id, 'group', gs.group_id, IFNULL(gs.access_mode, 'read')
+    FROM `halodb`.`group_shared_plasmid` AS gs
+        JOIN `halodb`.`user_has_group` AS ug ON ug.group_id = gs.group_id
+    WHERE ug.relation IS NULL OR ug.relation != 'invited';
+
+SET SQL_MODE=@OLD_SQL_MODE;
+SET FOREIGN_KEY_CHECKS=@OLD_FOREIGN_KEY_CHECKS;
+SET UNIQUE_CHECKS=@OLD_UNIQUE_CHECKS;
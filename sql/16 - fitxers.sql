@@ -0,0 +1,28 @@
+SET @OLD_UNIQUE_CHECKS=@@UNIQUE_CHECKS, UNIQUE_CHECKS=0;
+SET @OLD_FOREIGN_KEY_CHECKS=@@FOREIGN_KEY_CHECKS, FOREIGN_KEY_CHECKS=0;
+SET @OLD_SQL_MODE=@@SQL_MODE, SQL_MODE='TRADITIONAL,ALLOW_INVALID_DATES';
+
+USE `halodb` ;
+
+-- -----------------------------------------------------
+-- Table `halodb`.`stored_file`
+--
+-- The files uploaded to the sequence steps (rreads, rreads2, treads, assembled, pgenes). The steps keep the uuid of
+-- the file, that is also its name in the uploads directory.
+-- -----------------------------------------------------
+DROP TABLE IF EXISTS `halodb`.`stored_file` ;
+CREATE TABLE IF NOT EXISTS `halodb`.`stored_file` (
+  `uuid`    VARCHAR (40)    NOT NULL    COMMENT "Identifier of the file, and its name in the uploads directory",
+  `size`    BIGINT      NOT NULL    COMMENT "Size of the file in bytes",
+  `sha256`  CHAR (64)   NOT NULL    COMMENT "SHA-256 checksum of the content of the file, in hexadecimal",
+  `created` DATETIME        NOT NULL DEFAULT CURRENT_TIMESTAMP  COMMENT "Date the file was stored",
+  PRIMARY KEY (`uuid`)
+)
+ENGINE = InnoDB
+DEFAULT CHARACTER SET = utf8mb4
+COLLATE = utf8mb4_0900_ai_ci;
+
+
+SET SQL_MODE=@OLD_SQL_MODE;
+SET FOREIGN_KEY_CHECKS=@OLD_FOREIGN_KEY_CHECKS;
+SET UNIQUE_CHECKS=@OLD_UNIQUE_CHECKS;
@@ -0,0 +1,37 @@
+SET @OLD_UNIQUE_CHECKS=@@UNIQUE_CHECKS, UNIQUE_CHECKS=0;
+SET @OLD_FOREIGN_KEY_CHECKS=@@FOREIGN_KEY_CHECKS, FOREIGN_KEY_CHECKS=0;
+SET @OLD_SQL_MODE=@@SQL_MODE, SQL_MODE='TRADITIONAL,ALLOW_INVALID_DATES';
+
+USE `halodb` ;
+
+-- -----------------------------------------------------
+-- Table `halodb`.`stored_blob`
+--
+-- The content of the uploaded files is stored once, named after its checksum (UPLOADS_DIR/blobs/ab/cd/abcd...).
+-- The refcount is the number of stored files with this content. When it reaches 0, the blob is removed.
+-- -----------------------------------------------------
+DROP TABLE IF EXISTS `halodb`.`stored_blob` ;
+CREATE TABLE IF NOT EXISTS `halodb`.`stored_blob` (
+  `sha256`  CHAR (64)   NOT NULL    COMMENT "SHA-256 checksum of the content, in hexadecimal",
+  `size`    BIGINT      NOT NULL    COMMENT "Size of the content in bytes",
+  `refcount`    INT     NOT NULL DEFAULT 0  COMMENT "Number of stored files with this content",
+  `created` DATETIME        NOT NULL DEFAULT CURRENT_TIMESTAMP  COMMENT "Date the content was stored",
+  PRIMARY KEY (`sha256`)
+)
+ENGINE = InnoDB
+DEFAULT CHARACTER SET = utf8mb4
+COLLATE = utf8mb4_0900_ai_ci;
+
+-- -----------------------------------------------------
+-- The stored files keep the user that uploaded them. An upload whose checksum is declared in advance is skipped if
+-- the same user has already stored that content.
+-- -----------------------------------------------------
+ALTER TABLE `halodb`.`stored_file`
+  ADD COLUMN `user_id`  INT     NULL DEFAULT NULL   COMMENT "User that uploaded the file",
+  ADD INDEX `stored_file_sha256_idx` (`sha256` ASC),
+  ADD INDEX `stored_file_user_sha256_idx` (`user_id` ASC, `sha256` ASC);
+
+
+SET SQL_MODE=@OLD_SQL_MODE;
+SET FOREIGN_KEY_CHECKS=@OLD_FOREIGN_KEY_CHECKS;
+SET UNIQUE_CHECKS=@OLD_UNIQUE_CHECKS;
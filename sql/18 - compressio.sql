@@ -0,0 +1,20 @@
+SET @OLD_UNIQUE_CHECKS=@@UNIQUE_CHECKS, UNIQUE_CHECKS=0;
+SET @OLD_FOREIGN_KEY_CHECKS=@@FOREIGN_KEY_CHECKS, FOREIGN_KEY_CHECKS=0;
+SET @OLD_SQL_MODE=@@SQL_MODE, SQL_MODE='TRADITIONAL,ALLOW_INVALID_DATES';
+
+USE `halodb` ;
+
+-- -----------------------------------------------------
+-- The blobs can be stored compressed (see STORAGE_COMPRESSION). The size and the checksum of the table are the ones
+-- of the original content, stored_size is the size in the disk.
+-- -----------------------------------------------------
+ALTER TABLE `halodb`.`stored_blob`
+  ADD COLUMN `encoding`     ENUM('identity', 'bgzf')    NOT NULL DEFAULT 'identity'     COMMENT "How the content is stored",
+  ADD COLUMN `stored_size`  BIGINT  NULL DEFAULT NULL   COMMENT "Size of the blob in the disk";
+
+UPDATE `halodb`.`stored_blob` SET `stored_size` = `size`;
+
+
+SET SQL_MODE=@OLD_SQL_MODE;
+SET FOREIGN_KEY_CHECKS=@OLD_FOREIGN_KEY_CHECKS;
+SET UNIQUE_CHECKS=@OLD_UNIQUE_CHECKS;
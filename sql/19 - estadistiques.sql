@@ -0,0 +1,26 @@
+SET @OLD_UNIQUE_CHECKS=@@UNIQUE_CHECKS, UNIQUE_CHECKS=0;
+SET @OLD_FOREIGN_KEY_CHECKS=@@FOREIGN_KEY_CHECKS, FOREIGN_KEY_CHECKS=0;
+SET @OLD_SQL_MODE=@@SQL_MODE, SQL_MODE='TRADITIONAL,ALLOW_INVALID_DATES';
+
+USE `halodb` ;
+
+-- -----------------------------------------------------
+-- Statistics of the FASTA and FASTQ files (number of sequences, bases, N50, GC content and length histogram),
+-- computed while they are uploaded. They are kept with the content, so the deduplicated uploads reuse them.
+-- -----------------------------------------------------
+ALTER TABLE `halodb`.`stored_blob`
+  ADD COLUMN `stats`    JSON    NULL DEFAULT NULL   COMMENT "Statistics of the sequences of the content";
+
+-- -----------------------------------------------------
+-- The number of base pairs of the reads is filled from the statistics, and it doesn't fit in an INT
+-- -----------------------------------------------------
+ALTER TABLE `halodb`.`experiment`
+  MODIFY COLUMN `rreadsbp`  BIGINT  NULL DEFAULT NULL   COMMENT "Number of base pairs of raw reads";
+
+ALTER TABLE `halodb`.`trimmed_reads`
+  MODIFY COLUMN `treadsbp`  BIGINT  NULL DEFAULT NULL   COMMENT "Number of base pairs in trimmed reads.";
+
+
+SET SQL_MODE=@OLD_SQL_MODE;
+SET FOREIGN_KEY_CHECKS=@OLD_FOREIGN_KEY_CHECKS;
+SET UNIQUE_CHECKS=@OLD_UNIQUE_CHECKS;
@@ -0,0 +1,64 @@
+import logging
+import os
+import sys
+import uuid
+
+import pytest
+
+# The tests import the modules as the application does (api.xxx), from the root of the repository
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+
+@pytest.fixture(autouse=True)
+def logger(monkeypatch):
+    """
+    The logger of api.log is set up with the application, the modules tested without it log to a plain logger.
+    """
+    from api import log
+    if log.get_logger() is None:
+        monkeypatch.setattr(log, '_logger', logging.getLogger('halodb-api'))
+
+
+@pytest.fixture(scope='session')
+def client():
+    """
+    Test client of the application. It needs a MySQL database with the schema of sql/, configured with the same
+    environment variables as the application (MYSQL_HOST, MYSQL_DATABASE...), so the tests that use it only run when
+    HALODB_TEST_DATABASE is set.
+    """
+    if not os.getenv('HALODB_TEST_DATABASE'):
+        pytest.skip('HALODB_TEST_DATABASE is not set')
+    pytest.importorskip('MySQLdb')
+
+    from api.main import app
+    app.config['TESTING'] = True
+    return app.test_client()
+
+
+@pytest.fixture
+def user(client):
+    """
+    A new user of the test database, removed after the test.
+    """
+    from api.main import app
+    from api.controllers.UserController import UserController
+
+    email = f'test-{uuid.uuid4()}@halodb.test'
+    with app.app_context():
+        created = UserController.create_user({'email': email, 'name': 'Name', 'surname': 'Surname',
+                                              'password': 'password'})
+    yield created
+    with app.app_context():
+        UserController.delete_user(created['uid'])
+
+
+@pytest.fixture
+def token(user):
+    """
+    A valid token of the user.
+    """
+    from api.main import app
+    from api.auth import generate_valid_token
+
+    with app.app_context():
+        return generate_valid_token(user['uid'])
@@ -0,0 +1,79 @@
+import gzip
+import io
+import random
+import struct
+
+import pytest
+
+from api.bgzf import BgzfWriter, eof_block, max_block_data, read_index, read_range
+
+
+@pytest.fixture(scope='module')
+def content() -> bytes:
+    # Not very compressible, so the file has several blocks
+    generator = random.Random(42)
+    return bytes(generator.choice(b'ACGTN\n') for _ in range(3 * max_block_data + 1000))
+
+
+def compress(content: bytes, write_size: int = 10000):
+    fout = io.BytesIO()
+    writer = BgzfWriter(fout)
+    for i in range(0, len(content), write_size):
+        writer.write(content[i:i + write_size])
+    writer.close()
+    return fout.getvalue(), writer
+
+
+def test_any_gzip_reader_decompresses_it(content):
+    data, writer = compress(content)
+
+    assert gzip.decompress(data) == content
+    assert data.endswith(eof_block)
+    assert writer.size == len(data)
+
+
+def test_blocks(content):
+    data, writer = compress(content)
+
+    assert [block[1] for block in writer.blocks] == [0, max_block_data, 2 * max_block_data, 3 * max_block_data]
+    for offset, _ in writer.blocks:
+        # Each block is a gzip member with the extra field BC, whose value is its size minus 1
+        assert data[offset:offset + 4] == b'\x1f\x8b\x08\x04'
+        assert data[offset + 12:offset + 14] == b'BC'
+        block_size = struct.unpack_from('<H', data, offset + 16)[0] + 1
+        assert block_size <= 0x10000
+
+
+def test_empty_file():
+    data, writer = compress(b'')
+    assert data == eof_block
+    assert gzip.decompress(data) == b''
+
+
+def test_index(content, tmp_path):
+    data, writer = compress(content)
+    path = str(tmp_path / 'file.gz')
+    with open(path, 'wb') as fout:
+        fout.write(data)
+    writer.write_index(path + '.gzi')
+
+    assert read_index(path + '.gzi') == writer.blocks
+
+
+@pytest.mark.parametrize('offset, length', [
+    (0, 10),
+    (0, 3 * max_block_data + 1000),
+    # Across the end of a block, at the start of a block, and beyond the end of the file
+    (max_block_data - 5, 10),
+    (max_block_data, 1),
+    (2 * max_block_data + 7, 2 * max_block_data),
+    (100, 0),
+])
+@pytest.mark.parametrize('chunk_size', [100, 1 << 20])
+def test_read_range(content, tmp_path, offset, length, chunk_size):
+    data, writer = compress(content)
+    path = str(tmp_path / 'file.gz')
+    with open(path, 'wb') as fout:
+        fout.write(data)
+
+    assert b''.join(read_range(path, writer.blocks, offset, length, chunk_size)) == content[offset:offset + length]
@@ -0,0 +1,109 @@
+import time
+
+import pytest
+
+from api import cache
+from api.cache import TimedCache, IntervalIndex, ExpiringLRUCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache.time, 'monotonic', clock)
+    return clock
+
+
+class Loader:
+    def __init__(self, tables: dict):
+        self.tables = tables
+        self.loads = 0
+
+    def __call__(self, key):
+        self.loads += 1
+        return dict(self.tables[key])
+
+
+def test_timed_cache_expires(clock):
+    loader = Loader({'method': {1: 'a'}})
+    timed_cache = TimedCache(loader, 60)
+
+    assert timed_cache.get('method') == {1: 'a'}
+    assert timed_cache.get('method') == {1: 'a'}
+    assert loader.loads == 1
+
+    clock.now += 61
+    timed_cache.get('method')
+    assert loader.loads == 2
+
+    timed_cache.invalidate('method')
+    timed_cache.get('method')
+    assert loader.loads == 3
+
+
+def test_lookup_finds_new_items(clock):
+    loader = Loader({'method': {1: 'a'}})
+    timed_cache = TimedCache(loader, 60)
+    assert timed_cache.lookup('method', 1) == 'a'
+
+    loader.tables['method'][2] = 'b'
+    assert timed_cache.lookup('method', 2) == 'b'
+    assert loader.loads == 2
+
+
+def test_lookup_caches_missing_items(clock):
+    loader = Loader({'method': {1: 'a'}})
+    timed_cache = TimedCache(loader, 60)
+
+    assert timed_cache.lookup('method', 2) is None
+    assert loader.loads == 2
+    # The table has already been loaded again for a missing item, it's not loaded until it expires
+    for element_id in [2, 3, 4]:
+        assert timed_cache.lookup('method', element_id) is None
+    assert timed_cache.lookup('method', 1) == 'a'
+    assert loader.loads == 2
+
+    loader.tables['method'][3] = 'c'
+    clock.now += 61
+    assert timed_cache.lookup('method', 3) == 'c'
+    assert loader.loads == 3
+
+
+def test_interval_index():
+    index = IntervalIndex([(0, 10, 'low'), (10, 20, 'high'), (None, 5, 'ignored')])
+
+    assert index.find(0) is None
+    assert index.find(0.5) == 'low'
+    assert index.find(10) == 'low'
+    assert index.find(10.5) == 'high'
+    assert index.find(20) == 'high'
+    assert index.find(21) is None
+    assert index.bounds() == (0, 20)
+    assert IntervalIndex([]).bounds() == (None, None)
+
+
+def test_expiring_lru_cache():
+    lru = ExpiringLRUCache(2)
+    expires = time.time() + 60
+
+    lru.put('a', 1, expires)
+    lru.put('b', 2, expires)
+    assert lru.get('a') == 1
+    # b is the least recently used
+    lru.put('c', 3, expires)
+    assert lru.get('b') is None
+    assert lru.get('c') == 3
+
+    lru.put('d', 4, time.time() - 1)
+    assert lru.get('d') is None
+    assert lru.stats() == {'hits': 2, 'misses': 2, 'size': 1}
+
+    lru.clear()
+    assert lru.get('a') is None
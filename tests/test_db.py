@@ -0,0 +1,58 @@
+import pytest
+from flask import Flask, g
+
+pytest.importorskip('MySQLdb')
+
+from api.db.db import ReplicaRouter
+
+app = Flask(__name__)
+
+
+def test_replica_is_chosen_once_per_request():
+    router = ReplicaRouter(['replica1', 'replica2'], 5)
+
+    with app.test_request_context(method='GET'):
+        assert router.get_replica() == 'replica1'
+        assert router.get_replica() == 'replica1'
+    with app.test_request_context(method='GET'):
+        assert router.get_replica() == 'replica2'
+        assert router.get_replica() == 'replica2'
+
+
+def test_writes_use_the_primary():
+    router = ReplicaRouter(['replica1'], 5)
+
+    with app.test_request_context(method='POST'):
+        assert router.get_replica() is None
+    assert router.get_replica() is None
+
+
+def test_reads_after_a_write_use_the_primary():
+    router = ReplicaRouter(['replica1'], 5)
+    router.record_write('uid')
+
+    with app.test_request_context(method='GET'):
+        g.uid = 'uid'
+        assert router.get_replica() is None
+    with app.test_request_context(method='GET'):
+        g.uid = 'other'
+        assert router.get_replica() == 'replica1'
+
+
+def test_reads_after_a_write_in_another_worker_use_the_primary():
+    writer = ReplicaRouter(['replica1'], 5, lambda: 'key')
+    reader = ReplicaRouter(['replica1'], 5, lambda: 'key')
+    response = app.response_class()
+    writer.record_write('uid', response)
+    cookie = response.headers['Set-Cookie'].split(';')[0]
+
+    with app.test_request_context(method='GET', headers={'Cookie': cookie}):
+        g.uid = 'uid'
+        assert reader.get_replica() is None
+    # The cookie of another user, or signed with another key, is ignored
+    with app.test_request_context(method='GET', headers={'Cookie': cookie}):
+        g.uid = 'other'
+        assert reader.get_replica() == 'replica1'
+    with app.test_request_context(method='GET', headers={'Cookie': cookie}):
+        g.uid = 'uid'
+        assert ReplicaRouter(['replica1'], 5, lambda: 'other key').get_replica() == 'replica1'
@@ -0,0 +1,80 @@
+import pytest
+
+from api.fasta_index import FastaIndexer, FaiEntry, find_entry, get_base_offset, format_region
+
+sequences = {'seq1': 'ACGTACGTAC' * 3 + 'ACG', 'seq2': 'TTGCA' * 2, 'seq3': 'G'}
+
+
+def make_fasta(eol: str, final_eol: bool, width: int = 10) -> bytes:
+    lines = []
+    for name, sequence in sequences.items():
+        lines.append(f'>{name} description')
+        lines.extend(sequence[i:i + width] for i in range(0, len(sequence), width))
+    content = eol.join(lines) + (eol if final_eol else '')
+    return content.encode()
+
+
+def index(data: bytes, chunk_size: int = 1 << 20):
+    indexer = FastaIndexer()
+    for i in range(0, len(data), chunk_size):
+        indexer.update(data[i:i + chunk_size])
+    return indexer.result()
+
+
+def bases(data: bytes, entry: FaiEntry) -> str:
+    return ''.join(chr(data[get_base_offset(entry, position)]) for position in range(entry.length))
+
+
+@pytest.mark.parametrize('eol', ['\n', '\r\n'])
+@pytest.mark.parametrize('final_eol', [True, False])
+@pytest.mark.parametrize('chunk_size', [1, 7, 1 << 20])
+def test_index(eol, final_eol, chunk_size):
+    data = make_fasta(eol, final_eol)
+    entries = index(data, chunk_size)
+
+    assert [entry.name for entry in entries] == list(sequences)
+    for entry in entries:
+        assert entry.length == len(sequences[entry.name])
+        assert entry.linebases == min(10, entry.length)
+        assert entry.linewidth == entry.linebases + len(eol)
+        assert bases(data, entry) == sequences[entry.name]
+
+
+@pytest.mark.parametrize('eol', ['\n', '\r\n'])
+def test_last_line_of_full_width_without_line_break(eol):
+    data = f'>seq{eol}ACGT{eol}ACGT'.encode()
+    assert index(data) == [FaiEntry('seq', 8, 4 + len(eol), 4, 4 + len(eol))]
+
+
+@pytest.mark.parametrize('eol', ['\n', '\r\n'])
+def test_ragged_lines_are_not_indexed(eol):
+    assert index(f'>seq{eol}ACGT{eol}AC{eol}ACGT{eol}'.encode()) is None
+    assert index(f'>seq{eol}ACGT{eol}ACGTA{eol}'.encode()) is None
+
+
+@pytest.mark.parametrize('eol', ['\n', '\r\n'])
+def test_blank_line_is_the_short_last_line(eol):
+    entries = index(f'>seq{eol}ACGT{eol}ACGT{eol}{eol}>seq2{eol}AC{eol}'.encode())
+    assert [(entry.name, entry.length) for entry in entries] == [('seq', 8), ('seq2', 2)]
+    assert index(f'>seq{eol}ACGT{eol}{eol}ACGT{eol}'.encode()) is None
+
+
+def test_not_fasta():
+    assert index(b'@read\nACGT\n+\nIIII\n') is None
+    assert index(b'\x1f\x8b\x08\x00') is None
+    assert index(b'ACGT\n>seq\nACGT\n') is None
+
+
+def test_write_and_find_entry(tmp_path):
+    indexer = FastaIndexer()
+    indexer.update(make_fasta('\n', True))
+    path = str(tmp_path / 'test.fa.fai')
+
+    assert indexer.write(path)
+    assert find_entry(path, 'seq2') == FaiEntry('seq2', 10, 73, 10, 11)
+    assert find_entry(path, 'seq') is None
+
+
+def test_format_region():
+    chunks = [b'ACGTA\r\nCG', b'TACG\r\nTT']
+    assert b''.join(format_region('seq', 3, 18, chunks, width=6)) == b'>seq:3-18\nACGTAC\nGTACGT\nT\n'
@@ -0,0 +1,39 @@
+import pytest
+
+
+@pytest.fixture
+def ranges(client, monkeypatch):
+    from api.cache import TimedCache, IntervalIndex
+    from api.controllers.LookupController import LookupController
+    from api.db.models import Temperature, Ph
+
+    # Two ranges with a gap between them, and an empty table
+    intervals = {Temperature: [(0, 10, 'Cold'), (20, 30, 'Warm')], Ph: []}
+    monkeypatch.setattr(LookupController, '_ranges', TimedCache(lambda table: IntervalIndex(intervals[table]), 60))
+
+
+def test_classify_values(ranges):
+    from api.blueprints.general import classify_values
+    from api.db.models import Temperature
+
+    assert classify_values(Temperature, [5, 25, 15, -1, 0, 31, None]) == \
+           ['Cold', 'Warm', None, 'Less than minimum (0)', 'Less than minimum (0)', 'More than maximum (30)', None]
+
+
+def test_classify_values_of_an_empty_table(ranges):
+    from api.blueprints.general import classify_values
+    from api.db.models import Ph
+
+    assert classify_values(Ph, [7.0, None]) == [None, None]
+
+
+def test_classify_rejects_values_that_are_not_finite(client, ranges):
+    response = client.post('/query/temperature/classify/', json=['5', 'nan'])
+    assert response.status_code == 400
+
+    response = client.post('/query/temperature/classify/', json={'values': ['5', '-inf']})
+    assert response.status_code == 400
+
+    response = client.post('/query/temperature/classify/', json=['5', '25,5', ''])
+    assert response.status_code == 200
+    assert response.get_json()['message'] == ['Cold', 'Warm', None]
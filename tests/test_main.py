@@ -0,0 +1,39 @@
+def test_ready_retries_the_warm_up(client, monkeypatch):
+    from api import main
+
+    def fail(connections):
+        raise ConnectionError('The database is not available')
+
+    monkeypatch.setattr(main, 'ready', False)
+    monkeypatch.setattr(main, 'next_warm_up', 0.0)
+    monkeypatch.setattr(main, 'warm_up_delay', 1)
+    monkeypatch.setattr(main.db, 'warm_up', fail)
+    assert client.get('/ready').status_code == 503
+    # The next attempt waits for the delay
+    assert main.next_warm_up > 0
+    assert main.warm_up_delay == 2
+
+    monkeypatch.undo()
+    monkeypatch.setattr(main, 'ready', False)
+    monkeypatch.setattr(main, 'next_warm_up', 0.0)
+    assert client.get('/ready').status_code == 200
+    assert main.ready
+
+
+def test_stats_counts_the_verified_tokens(client, token):
+    from api.auth import token_cache
+
+    token_cache.clear()
+    before = client.get('/stats').get_json()['token_cache']
+    assert before['size'] == 0
+
+    headers = {'Authorization': f'Bearer {token}'}
+    client.get('/user/list/samples/', headers=headers)
+    client.get('/user/list/samples/', headers=headers)
+
+    response = client.get('/stats')
+    assert response.status_code == 200
+    after = response.get_json()['token_cache']
+    assert after['misses'] - before['misses'] == 1
+    assert after['hits'] - before['hits'] == 1
+    assert after['size'] == 1
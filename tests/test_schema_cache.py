@@ -0,0 +1,49 @@
+import os
+
+import pytest
+from sqlalchemy import create_engine, text
+
+from api.db import schema_cache
+
+
+@pytest.fixture
+def engine(tmp_path, monkeypatch):
+    # The fingerprint needs information_schema, a fixed one is enough to test the snapshots
+    monkeypatch.setattr(schema_cache, 'schema_fingerprint', lambda engine: 'fingerprint')
+    engine = create_engine(f'sqlite:///{tmp_path / "test.db"}')
+    with engine.begin() as connection:
+        connection.execute(text('CREATE TABLE sample (id INTEGER PRIMARY KEY, name TEXT)'))
+    return engine
+
+
+def drop_sample(engine):
+    with engine.begin() as connection:
+        connection.execute(text('DROP TABLE sample'))
+
+
+def test_snapshot_is_reused(engine, tmp_path):
+    cache_dir = str(tmp_path / 'cache')
+    assert 'sample' in schema_cache.load_metadata(engine, cache_dir).tables
+    assert os.stat(cache_dir).st_mode & 0o777 == 0o700
+
+    # The second load doesn't reflect the database
+    drop_sample(engine)
+    assert 'sample' in schema_cache.load_metadata(engine, cache_dir).tables
+
+
+def test_snapshot_writable_by_others_is_not_loaded(engine, tmp_path):
+    cache_dir = str(tmp_path / 'cache')
+    schema_cache.load_metadata(engine, cache_dir)
+    os.chmod(os.path.join(cache_dir, 'schema-fingerprint.pickle'), 0o666)
+
+    drop_sample(engine)
+    assert 'sample' not in schema_cache.load_metadata(engine, cache_dir).tables
+
+
+def test_directory_writable_by_others_is_not_used(engine, tmp_path):
+    cache_dir = tmp_path / 'cache'
+    cache_dir.mkdir()
+    os.chmod(cache_dir, 0o777)
+
+    schema_cache.load_metadata(engine, str(cache_dir))
+    assert os.listdir(cache_dir) == []
@@ -0,0 +1,127 @@
+import json
+
+import pytest
+
+
+@pytest.fixture
+def sample(client, token):
+    from api.main import app
+    from api.controllers.SampleController import SampleController
+
+    response = client.post('/sample/', data=json.dumps({'name': 'Sample'}),
+                           headers={'Authorization': f'Bearer {token}'})
+    assert response.status_code == 200
+    created = response.get_json()['data']['message']['step']
+    yield created
+    with app.app_context():
+        SampleController.delete_sample(created['id'])
+
+
+def test_owner_updates_a_public_step(client, token, sample):
+    headers = {'Authorization': f'Bearer {token}'}
+    response = client.put(f'/sample/{sample["id"]}/share/public/', headers=headers)
+    assert response.status_code == 200
+    assert response.get_json()['data']['message'] == {'message': 'OK'}
+
+    response = client.put(f'/sample/{sample["id"]}/', data=json.dumps({'name': 'New name'}), headers=headers)
+
+    assert response.status_code == 200
+    assert response.get_json()['data']['message']['SAMPLE']['name'] == 'New name'
+
+    # The owner still reads it through the public access
+    response = client.get(f'/sample/{sample["id"]}/', headers=headers)
+    assert response.status_code == 200
+    assert response.get_json()['message']['SAMPLE']['is_public']
+
+
+@pytest.fixture
+def raw_reads(client, token, sample):
+    from api.main import app
+    from api.controllers.AccessController import AccessController
+    from api.db.db import DatabaseInstance
+    from api.field_utils import get_step_table
+
+    response = client.post('/raw%20reads/', data=json.dumps({'sequence': 'METAGENOME', 'source_id': sample['id']}),
+                           headers={'Authorization': f'Bearer {token}'})
+    assert response.status_code == 200
+    created = response.get_json()['data']['message']['step']
+    yield created
+    with app.app_context():
+        with DatabaseInstance.get().session() as session:
+            session.query(get_step_table('RAW READS')).filter_by(id=created['id']).delete()
+            AccessController.remove_step(session, 'RAW READS', created['id'])
+            session.commit()
+
+
+def upload_reads(client, token, raw_reads, reads: bytes = None) -> str:
+    url = f'/raw%20reads/{raw_reads["id"]}/rreads/'
+    response = client.put(f'{url}?sequence=METAGENOME&filename=reads.fastq', data=reads or READS,
+                          content_type='application/octet-stream', headers={'Authorization': f'Bearer {token}'})
+    assert response.status_code == 200
+    assert response.get_json()['data']['message']['status'] == 'success'
+    return url
+
+
+@pytest.fixture
+def reads_url(client, token, raw_reads, monkeypatch):
+    from api import storage
+
+    # Stored as they are received, the ranges are the ones of the file sent
+    monkeypatch.setattr(storage, 'STORAGE_COMPRESSION', 'none')
+    return upload_reads(client, token, raw_reads)
+
+
+READS = b''.join(b'@read%d\nACGTACGTAC\n+\nIIIIIIIIII\n' % i for i in range(100))
+
+
+def test_file_range_is_partial_content(client, token, reads_url):
+    response = client.get(reads_url, headers={'Authorization': f'Bearer {token}', 'Range': 'bytes=0-9'})
+
+    assert response.status_code == 206
+    assert response.headers['Content-Range'] == f'bytes 0-9/{len(READS)}'
+    assert response.data == READS[:10]
+    assert response.headers['X-Token'] == token
+
+
+def test_file_revalidation_is_not_modified(client, token, reads_url):
+    headers = {'Authorization': f'Bearer {token}'}
+    response = client.get(reads_url, headers=headers)
+    assert response.status_code == 200
+    assert response.data == READS
+    etag = response.headers['ETag']
+
+    response = client.get(reads_url, headers={**headers, 'If-None-Match': etag})
+
+    assert response.status_code == 304
+    assert response.data == b''
+
+
+def test_file_if_range(client, token, reads_url):
+    headers = {'Authorization': f'Bearer {token}', 'Range': 'bytes=10-19'}
+    etag = client.get(reads_url, headers={'Authorization': f'Bearer {token}'}).headers['ETag']
+
+    response = client.get(reads_url, headers={**headers, 'If-Range': etag})
+    assert response.status_code == 206
+    assert response.data == READS[10:20]
+
+    # A different version of the file: the whole file is sent
+    response = client.get(reads_url, headers={**headers, 'If-Range': '"other"'})
+    assert response.status_code == 200
+    assert response.data == READS
+
+
+def test_compressed_file_is_sent_by_the_proxy_with_gzip(client, token, raw_reads, monkeypatch):
+    from api import storage
+    from api.blueprints import sequence
+
+    monkeypatch.setattr(storage, 'STORAGE_COMPRESSION', 'bgzf')
+    # Not the content of the other tests, the blobs are shared and that one is stored uncompressed
+    url = upload_reads(client, token, raw_reads, READS.replace(b'ACGT', b'TTGA'))
+    monkeypatch.setattr(sequence, 'FILE_SERVING_MODE', 'x-accel-redirect')
+
+    response = client.get(url, headers={'Authorization': f'Bearer {token}', 'Accept-Encoding': 'gzip'})
+
+    assert response.status_code == 200
+    assert response.headers['X-Accel-Redirect'].startswith(sequence.FILE_SERVING_GZIP_PREFIX + 'blobs/')
+    assert response.data == b''
+    assert 'Accept-Encoding' in response.vary
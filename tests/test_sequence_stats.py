@@ -0,0 +1,88 @@
+import gzip
+import io
+
+import pytest
+
+from api.bgzf import BgzfWriter
+from api.sequence_stats import SequenceStats
+
+fasta = b'>seq1 description\nACGTACGTAC\nGG\n>seq2\nAAAA\n\n>seq3\nNNCCGGTTAA\nCCGGTTAACC\nACGT\n'
+fastq = b'@read1\nACGTAC\n+\nIIIIII\n@read2\nGGCC\n+\nIIII\n@read3\nACGTACGT\n+\nIIIIIIII\n'
+
+
+def compute(data: bytes, chunk_size: int = 1 << 20, **kwargs):
+    stats = SequenceStats(**kwargs)
+    for i in range(0, len(data), chunk_size):
+        stats.update(data[i:i + chunk_size])
+    return stats.result()
+
+
+def bgzf(data: bytes) -> bytes:
+    fout = io.BytesIO()
+    writer = BgzfWriter(fout)
+    writer.write(data)
+    writer.close()
+    return fout.getvalue()
+
+
+@pytest.mark.parametrize('chunk_size', [1, 5, 1 << 20])
+def test_fasta(chunk_size):
+    stats = compute(fasta, chunk_size)
+
+    assert stats['format'] == 'fasta'
+    assert stats['count'] == 3
+    assert stats['bases'] == 12 + 4 + 24
+    assert stats['min_length'] == 4
+    assert stats['max_length'] == 24
+    assert stats['mean_length'] == round(40 / 3, 2)
+    # 24 >= 40 / 2
+    assert stats['n50'] == 24
+    # G and C over the A, C, G and T bases (the N are not counted)
+    assert stats['gc'] == round(100 * 19 / 38, 2)
+    assert sum(bin['count'] for bin in stats['histogram']) == 3
+
+
+@pytest.mark.parametrize('chunk_size', [1, 5, 1 << 20])
+def test_fastq(chunk_size):
+    stats = compute(fastq, chunk_size)
+
+    assert stats['format'] == 'fastq'
+    assert stats['count'] == 3
+    assert stats['bases'] == 18
+    assert (stats['min_length'], stats['max_length'], stats['n50']) == (4, 8, 6)
+    assert stats['gc'] == round(100 * 11 / 18, 2)
+
+
+def test_crlf():
+    assert compute(fasta.replace(b'\n', b'\r\n')) == compute(fasta)
+    assert compute(fastq.replace(b'\n', b'\r\n')) == compute(fastq)
+
+
+def test_without_final_line_break():
+    assert compute(fasta.rstrip(b'\n')) == compute(fasta)
+    assert compute(fastq.rstrip(b'\n')) == compute(fastq)
+
+
+@pytest.mark.parametrize('chunk_size', [1, 7, 1 << 20])
+def test_compressed(chunk_size):
+    assert compute(gzip.compress(fasta), chunk_size) == compute(fasta)
+    assert compute(bgzf(fastq), chunk_size) == compute(fastq)
+
+
+def test_proteins_have_no_gc():
+    assert compute(b'>protein\nMKVLAAGIVGLLLAQ\n')['gc'] is None
+
+
+def test_histogram():
+    data = b''.join(b'>s\n' + b'A' * length + b'\n' for length in range(1, 101))
+    histogram = compute(data, histogram_bins=10)['histogram']
+
+    assert len(histogram) == 10
+    assert histogram[0] == {'from': 1, 'to': 10, 'count': 10}
+    assert histogram[-1] == {'from': 91, 'to': 100, 'count': 10}
+
+
+def test_not_a_sequence_file():
+    assert compute(b'') is None
+    assert compute(b'sample\tvalue\n') is None
+    assert compute(gzip.compress(b'sample\tvalue\n')) is None
@@ -0,0 +1,116 @@
+import os
+
+import pytest
+
+from api import storage
+
+
+@pytest.fixture(autouse=True)
+def blobs_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, 'blobs_dir', str(tmp_path / 'blobs'))
+    return tmp_path
+
+
+def write(path, content: bytes):
+    with open(path, 'wb') as fout:
+        fout.write(content)
+    return str(path)
+
+
+def read(path):
+    with open(path, 'rb') as fin:
+        return fin.read()
+
+
+sha256 = 'ab' * 32
+
+
+def test_place_blob_moves_the_file_and_its_indexes(blobs_dir):
+    received = write(blobs_dir / 'received', b'>s\nACGT\n')
+    write(blobs_dir / 'received.fai', b's\t4\t3\t4\t5\n')
+
+    inode = storage.place_blob(received, sha256)
+
+    path = storage.get_blob_path(sha256)
+    assert inode == os.stat(path).st_ino
+    assert read(path) == b'>s\nACGT\n'
+    assert os.path.exists(path + '.fai')
+    assert not os.path.exists(received)
+
+
+def test_place_blob_keeps_the_stored_blob(blobs_dir):
+    storage.place_blob(write(blobs_dir / 'first', b'stored'), sha256)
+
+    received = write(blobs_dir / 'second', b'received')
+    assert storage.place_blob(received, sha256) is None
+    assert read(storage.get_blob_path(sha256)) == b'stored'
+    assert not os.path.exists(received)
+
+
+def test_place_blob_replaces_a_blob_without_row(blobs_dir):
+    # A compressed blob left by a failed transaction, with its .gzi
+    storage.place_blob(write(blobs_dir / 'orphan', b'compressed'), sha256)
+    write(storage.get_blob_path(sha256) + '.gzi', b'index')
+
+    storage.place_blob(write(blobs_dir / 'received', b'identity'), sha256, replace=True)
+
+    path = storage.get_blob_path(sha256)
+    assert read(path) == b'identity'
+    assert not os.path.exists(path + '.gzi')
+
+
+def test_remove_placed_blob(blobs_dir):
+    received = write(blobs_dir / 'received', b'content')
+    write(blobs_dir / 'received.fai', b'index')
+    inode = storage.place_blob(received, sha256)
+
+    storage.remove_placed_blob(sha256, inode)
+
+    path = storage.get_blob_path(sha256)
+    assert not os.path.exists(path)
+    assert not os.path.exists(path + '.fai')
+
+
+def test_remove_placed_blob_keeps_a_replaced_blob(blobs_dir):
+    inode = storage.place_blob(write(blobs_dir / 'first', b'first'), sha256)
+    storage.place_blob(write(blobs_dir / 'second', b'second'), sha256, replace=True)
+
+    storage.remove_placed_blob(sha256, inode)
+    assert read(storage.get_blob_path(sha256)) == b'second'
+
+
+def test_remove_placed_blob_without_placed_blob(blobs_dir):
+    storage.place_blob(write(blobs_dir / 'stored', b'stored'), sha256)
+
+    storage.remove_placed_blob(sha256, None)
+    assert os.path.exists(storage.get_blob_path(sha256))
+
+
+@pytest.mark.parametrize('compression', ['none', 'bgzf'])
+def test_compress_received_and_read_ranges(blobs_dir, monkeypatch, compression):
+    monkeypatch.setattr(storage, 'UPLOADS_DIR', str(blobs_dir))
+    monkeypatch.setattr(storage, 'STORAGE_COMPRESSION', compression)
+    content = b''.join(b'>seq%d\n' % i + b'ACGTACGTAC\n' * 50 for i in range(200))
+    received = write(blobs_dir / 'received', content)
+    write(blobs_dir / 'received.fai', b'index')
+
+    path, encoding, stored_size = storage.compress_received(received)
+    storage.place_blob(path, sha256)
+
+    blob_path = storage.get_blob_path(sha256)
+    assert encoding == ('bgzf' if compression == 'bgzf' else 'identity')
+    assert stored_size == os.path.getsize(blob_path)
+    assert os.path.exists(blob_path + '.fai')
+    assert os.path.exists(blob_path + '.gzi') == (encoding == 'bgzf')
+    for offset, length in [(0, 100), (70000, 5000), (len(content) - 10, 100)]:
+        chunks = storage.read_blob_range(blob_path, encoding, offset, length, chunk_size=1000)
+        assert b''.join(chunks) == content[offset:offset + length]
+
+
+def test_compress_received_keeps_other_files(blobs_dir, monkeypatch):
+    monkeypatch.setattr(storage, 'UPLOADS_DIR', str(blobs_dir))
+    monkeypatch.setattr(storage, 'STORAGE_COMPRESSION', 'bgzf')
+    content = b'\x1f\x8b\x08\x00 already compressed'
+    received = write(blobs_dir / 'received', content)
+
+    assert storage.compress_received(received) == (received, 'identity', len(content))
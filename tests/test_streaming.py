@@ -0,0 +1,49 @@
+import datetime
+import decimal
+import json
+
+import pytest
+from flask import Flask
+
+from api.streaming import get_stream_format, stream_chunks, to_json
+
+app = Flask(__name__)
+
+chunks = [[{'id': 1, 'date': datetime.date(2024, 5, 17)}], [], [{'id': 2, 'ph': decimal.Decimal('7.5')}]]
+
+
+def read(response) -> str:
+    return response.get_data(as_text=True)
+
+
+def test_to_json():
+    assert to_json({'time': datetime.datetime(2024, 5, 17, 10, 30), 'ph': decimal.Decimal('7.5')}) == \
+           '{"time": "2024-05-17T10:30:00", "ph": "7.5"}'
+
+
+def test_stream_ndjson():
+    with app.test_request_context():
+        response = stream_chunks(iter(chunks), 'ndjson')
+        lines = read(response).splitlines()
+    assert response.mimetype == 'application/x-ndjson'
+    assert [json.loads(line) for line in lines] == [{'id': 1, 'date': '2024-05-17'}, {'id': 2, 'ph': '7.5'}]
+
+
+def test_stream_json():
+    with app.test_request_context():
+        response = stream_chunks(iter(chunks), 'json')
+        content = read(response)
+    assert json.loads(content) == [{'id': 1, 'date': '2024-05-17'}, {'id': 2, 'ph': '7.5'}]
+
+    with app.test_request_context():
+        assert read(stream_chunks(iter([]), 'json')) == '[]'
+
+
+def test_get_stream_format():
+    with app.test_request_context(headers={'Accept': 'application/x-ndjson'}):
+        assert get_stream_format({}) == 'ndjson'
+        assert get_stream_format({'stream': 'JSON'}) == 'json'
+    with app.test_request_context():
+        assert get_stream_format({}) is None
+        with pytest.raises(ValueError):
+            get_stream_format({'stream': 'xml'})
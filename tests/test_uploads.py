@@ -0,0 +1,56 @@
+import datetime
+import json
+import os
+import time
+
+import pytest
+
+
+@pytest.fixture
+def uploads(client, tmp_path, monkeypatch):
+    from api.controllers import UploadController as uploads
+
+    monkeypatch.setattr(uploads, 'parts_dir', str(tmp_path))
+    return uploads
+
+
+def make_upload(uploads, upload_id: str, hours_ago: float, completing: bool = False):
+    created = datetime.datetime.now() - datetime.timedelta(hours=hours_ago)
+    upload_dir = uploads.get_upload_dir(upload_id)
+    os.makedirs(upload_dir)
+    with open(os.path.join(upload_dir, 'upload.json'), 'w') as fout:
+        json.dump({'uid': 'uid', 'created': created.isoformat()}, fout)
+    if completing:
+        os.rename(upload_dir, f'{upload_dir}.completing')
+        return f'{upload_dir}.completing'
+    return upload_dir
+
+
+def test_expired_uploads_are_removed(uploads):
+    expired = make_upload(uploads, 'a' * 32, uploads.UPLOAD_EXPIRY_HOURS + 1)
+    current = make_upload(uploads, 'b' * 32, 1)
+
+    assert uploads.UploadController.remove_expired_uploads(force=True) == 1
+    assert not os.path.exists(expired)
+    assert os.path.exists(current)
+    assert uploads.UploadController.get_upload('b' * 32, 'uid') is not None
+
+
+def test_expired_upload_is_not_returned(uploads, monkeypatch):
+    monkeypatch.setattr(uploads, 'next_cleanup', time.monotonic() + 60)
+    make_upload(uploads, 'a' * 32, uploads.UPLOAD_EXPIRY_HOURS + 1)
+    assert uploads.UploadController.get_upload('a' * 32, 'uid') is None
+
+
+def test_interrupted_completions_are_recovered(uploads):
+    old = time.time() - uploads.UPLOAD_COMPLETION_TIMEOUT - 60
+    interrupted = make_upload(uploads, 'a' * 32, 1, completing=True)
+    os.utime(interrupted, (old, old))
+    expired = make_upload(uploads, 'b' * 32, uploads.UPLOAD_EXPIRY_HOURS + 1, completing=True)
+    os.utime(expired, (old, old))
+    running = make_upload(uploads, 'c' * 32, uploads.UPLOAD_EXPIRY_HOURS + 1, completing=True)
+
+    assert uploads.UploadController.remove_expired_uploads(force=True) == 1
+    assert os.path.exists(uploads.get_upload_dir('a' * 32))
+    assert not os.path.exists(expired)
+    assert os.path.exists(running)
@@ -0,0 +1,36 @@
+import json
+
+
+def test_update_user_returns_the_updated_fields(client, user, token):
+    response = client.put('/user/', data=json.dumps({'name': 'New name', 'surname': 'New surname'}),
+                          headers={'Authorization': f'Bearer {token}'})
+
+    assert response.status_code == 200
+    updated = response.get_json()['data']['message']['user']
+    assert updated['id'] == user['id']
+    assert updated['uid'] == user['uid']
+    assert updated['email'] == user['email']
+    assert updated['name'] == 'New name'
+    assert updated['surname'] == 'New surname'
+    assert 'password' not in updated
+
+
+def test_streamed_listing_sends_the_token_in_a_header(client, token):
+    response = client.get('/user/list/samples/?stream=ndjson', headers={'Authorization': f'Bearer {token}'})
+
+    assert response.status_code == 200
+    assert response.mimetype == 'application/x-ndjson'
+    assert response.headers['X-Token'] == token
+
+
+def test_access_modes_reject_the_ids_that_are_not_integers(client, token):
+    headers = {'Authorization': f'Bearer {token}'}
+    response = client.post('/user/access/', data=json.dumps([{'step': 'sample', 'id': 2.7}]), headers=headers)
+    assert response.status_code == 400
+
+    # The step names are normalized and the ids can be strings of digits
+    response = client.post('/user/access/', data=json.dumps([{'step': 'raw_reads', 'id': '999999999'}]),
+                           headers=headers)
+    assert response.status_code == 200
+    assert response.get_json()['data']['message']['access'] == \
+           [{'step': 'RAW READS', 'id': 999999999, 'access_mode': None}]
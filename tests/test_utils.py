@@ -0,0 +1,11 @@
+import pytest
+
+from api.utils import parse_id
+
+
+@pytest.mark.parametrize('value, expected', [
+    (2, 2), ('2', 2), (' 2 ', 2), ('-1', -1), (2.0, 2),
+    (2.7, None), ('2.7', None), ('2a', None), ('', None), (True, None), (None, None), ([2], None),
+])
+def test_parse_id(value, expected):
+    assert parse_id(value) == expected